@@ -0,0 +1,131 @@
+REASONING_OPEN, REASONING_CLOSE = "<reasoning>", "</reasoning>"
+ANSWER_OPEN, ANSWER_CLOSE = "<answer>", "</answer>"
+_LONGEST_TAG = len(REASONING_CLOSE)
+
+
+class AnswerParser:
+    """
+    Incrementally extracts the `<reasoning>` and `<answer>` elements from GRPOtuned output.
+
+    Text is fed in as it is generated. Each call only searches the newly added text (plus a few
+    characters of overlap, since a tag can be split across chunks), so parsing a long reasoning
+    trace chunk by chunk costs about the same as parsing it once at the end.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._text = ""
+        # Unsearched tail of the text, starting at absolute offset `_window_start`.
+        self._window = ""
+        self._window_start = 0
+        self._reasoning_start = self._reasoning_end = None
+        self._answer_start = self._answer_end = None
+
+    @property
+    def text(self):
+        """All text fed so far."""
+        if self._chunks:
+            self._text += "".join(self._chunks)
+            self._chunks = []
+        return self._text
+
+    def _find(self, tag):
+        position = self._window.find(tag)
+        return None if position == -1 else self._window_start + position
+
+    def _skip_to(self, offset):
+        self._window = self._window[offset - self._window_start:]
+        self._window_start = offset
+
+    def feed(self, chunk):
+        """
+        Adds `chunk` to the parsed text.
+
+        Returns:
+            bool: True once the answer element has been closed.
+        """
+        self._chunks.append(chunk)
+        if self.complete:
+            return True
+        self._window += chunk
+        while not self.complete:
+            if self._answer_start is not None:
+                position = self._find(ANSWER_CLOSE)
+                if position is None:
+                    break
+                self._answer_end = position
+            elif self._reasoning_start is not None and self._reasoning_end is None:
+                position = self._find(REASONING_CLOSE)
+                if position is None:
+                    break
+                self._reasoning_end = position
+                self._skip_to(position + len(REASONING_CLOSE))
+            else:
+                # The reasoning element is optional: take whichever opening tag comes first.
+                answer = self._find(ANSWER_OPEN)
+                reasoning = self._find(REASONING_OPEN) if self._reasoning_start is None else None
+                if reasoning is not None and (answer is None or reasoning < answer):
+                    self._reasoning_start = reasoning + len(REASONING_OPEN)
+                    self._skip_to(self._reasoning_start)
+                elif answer is not None:
+                    self._answer_start = answer + len(ANSWER_OPEN)
+                    self._skip_to(self._answer_start)
+                else:
+                    break
+        if not self.complete and len(self._window) >= _LONGEST_TAG:
+            # Keep just enough overlap to find a tag that is split across chunks.
+            self._skip_to(self._window_start + len(self._window) - _LONGEST_TAG + 1)
+        return self.complete
+
+    @property
+    def complete(self):
+        return self._answer_end is not None
+
+    @property
+    def reasoning(self):
+        """The reasoning text, or None if the reasoning element has not been closed."""
+        if self._reasoning_start is None or self._reasoning_end is None:
+            return None
+        return self.text[self._reasoning_start:self._reasoning_end].strip()
+
+    @property
+    def answer(self):
+        """The answer text, or None if the answer element has not been closed."""
+        if self._answer_end is None:
+            return None
+        return self.text[self._answer_start:self._answer_end].strip()
+
+
+def parse_answer(text):
+    """
+    Extracts the reasoning and answer from a complete GRPOtuned output.
+
+    Returns:
+        dict: `reasoning` and `answer` strings, each None when the element is missing.
+    """
+    parser = AnswerParser()
+    parser.feed(text)
+    return {"reasoning": parser.reasoning, "answer": parser.answer}
+
+
+def result_record(prompt, completion, **extra):
+    """
+    Builds a compact math result record from a prompt and the model's completion.
+
+    The completion is stored as parsed `reasoning`/`answer` fields instead of the raw text with
+    the prompt echoed in front of it. When no answer element can be found, the raw completion is
+    kept under `completion` so nothing is lost.
+
+    Args:
+        prompt (str): The math problem prompt.
+        completion (str): The generated text, without the prompt.
+        **extra: Additional fields to store (e.g. `id`, `backend`).
+
+    Returns:
+        dict: The record to append to a results JSONL file.
+    """
+    record = {"prompt": prompt, **extra}
+    record.update(parse_answer(completion))
+    if record["answer"] is None:
+        record["completion"] = completion
+    return record
@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import aiohttp
+from answer_parser import ANSWER_CLOSE, result_record
+
+
+class CheckpointWriter:
+    """
+    Appends JSONL result records with batched durability.
+
+    Records go through the normal file buffer and are flushed and fsync'ed every `fsync_every`
+    records or `fsync_interval` seconds, whichever comes first, instead of once per record.
+    A crash can lose at most that window, and `load_completed_ids` repairs a torn final line.
+    """
+
+    def __init__(self, path, fsync_every=32, fsync_interval=2.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._file = open(path, "a", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+def load_completed_ids(path):
+    """
+    Returns the ids of successful records already in `path`, so a rerun can skip them.
+
+    Records with an `error` are not counted, so failed problems are retried. If the file ends in
+    a partial line (the process died mid-write), that line is cut off so new records start clean.
+    """
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    for line in data.decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if "id" in record and not record.get("error"):
+            completed.add(str(record["id"]))
+    return completed
+
+
+def iter_problems(path):
+    """
+    Streams `(id, prompt)` pairs from an input JSONL file without loading it whole. Each line needs
+    a `prompt` (or `problem`) field; the line number is used when there is no `id`. Lines that are
+    not JSON objects are reported on stderr and skipped, so one bad line does not stop the run.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                print(f"Skipping line {line_number}: invalid JSON ({e})", file=sys.stderr)
+                continue
+            if not isinstance(record, dict):
+                print(f"Skipping line {line_number}: not a JSON object", file=sys.stderr)
+                continue
+            prompt = record.get("prompt") or record.get("problem")
+            if prompt is None:
+                print(f"Skipping line {line_number}: no 'prompt' field", file=sys.stderr)
+                continue
+            yield str(record.get("id", line_number)), prompt
+
+
+class LocalBackend:
+    """Runs the GRPOtuned model in-process, micro-batching concurrent problems."""
+
+    name = "local"
+
+    def __init__(self, max_new_tokens, temperature, max_batch_size=8, max_wait_ms=50):
+        from grpotuned_model import generate_batch
+        from micro_batcher import MicroBatcher
+        self._batcher = MicroBatcher(generate_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+
+    async def solve(self, prompt):
+        completion = await self._batcher.submit(
+            prompt, max_new_tokens=self.max_new_tokens, temperature=self.temperature, stop_at_answer=True
+        )
+        return completion["text"]
+
+    async def aclose(self):
+        await self._batcher.aclose()
+
+
+class VLLMBackend:
+    """Calls an OpenAI-compatible chat completions endpoint (vLLM or grpotuned_server.py)."""
+
+    name = "vllm"
+
+    def __init__(self, endpoint, max_new_tokens, temperature, model="HarleyCooper/GRPOtuned"):
+        self.endpoint = endpoint
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.model = model
+        self._session = None
+
+    async def solve(self, prompt):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=600))
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": self.max_new_tokens,
+            "temperature": self.temperature,
+            # vLLM stops at the stop string; keep it in the output so the answer element parses.
+            "stop": [ANSWER_CLOSE],
+            "include_stop_str_in_output": True,
+        }
+        async with self._session.post(self.endpoint, json=payload) as response:
+            response.raise_for_status()
+            body = await response.json()
+        return body["choices"][0]["message"]["content"]
+
+    async def aclose(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+class ProviderBackend:
+    """Routes problems through a Hugging Face Inference Provider (see inference_providers_demo.py)."""
+
+    name = "provider"
+
+    def __init__(self, provider, max_new_tokens):
+        from inference_providers_demo import generate_with_provider
+        self._generate = generate_with_provider
+        self.provider = provider
+        self.max_new_tokens = max_new_tokens
+
+    async def solve(self, prompt):
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(None, self._generate, prompt, self.provider, self.max_new_tokens)
+        return response["choices"][0]["message"]["content"]
+
+    async def aclose(self):
+        pass
+
+
+async def run_batch(input_path, output_path, backend, concurrency=8, fsync_every=32, fsync_interval=2.0):
+    """
+    Solves every problem in `input_path` that does not already have a successful record in
+    `output_path`, with at most `concurrency` problems in flight. `backend.solve(prompt)` returns
+    the completion text, which is stored as parsed `reasoning`/`answer` fields.
+
+    Returns:
+      dict: Counts of `skipped` (already done), `succeeded` and `failed` problems.
+    """
+    completed = load_completed_ids(output_path)
+    writer = CheckpointWriter(output_path, fsync_every=fsync_every, fsync_interval=fsync_interval)
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"skipped": 0, "succeeded": 0, "failed": 0}
+    tasks = set()
+
+    async def solve_one(problem_id, prompt):
+        try:
+            record = result_record(prompt, await backend.solve(prompt), id=problem_id, backend=backend.name)
+            counts["succeeded"] += 1
+        except Exception as e:
+            record = {"id": problem_id, "prompt": prompt, "backend": backend.name, "error": f"{type(e).__name__}: {e}"}
+            counts["failed"] += 1
+        finally:
+            semaphore.release()
+        writer.write(record)
+
+    try:
+        for problem_id, prompt in iter_problems(input_path):
+            if problem_id in completed:
+                counts["skipped"] += 1
+                continue
+            # Acquire before creating the task, so at most `concurrency` problems are ever read ahead.
+            await semaphore.acquire()
+            task = asyncio.create_task(solve_one(problem_id, prompt))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        writer.close()
+    return counts
+
+
+def build_backend(args):
+    if args.backend == "local":
+        return LocalBackend(args.max_new_tokens, args.temperature, max_batch_size=args.batch_size)
+    if args.backend == "vllm":
+        return VLLMBackend(args.endpoint, args.max_new_tokens, args.temperature)
+    return ProviderBackend(args.provider, args.max_new_tokens)
+
+
+async def main(args):
+    backend = build_backend(args)
+    try:
+        counts = await run_batch(args.input, args.output, backend, args.concurrency, args.fsync_every, args.fsync_interval)
+    finally:
+        await backend.aclose()
+    print(f"Done: {counts['succeeded']} solved, {counts['failed']} failed, {counts['skipped']} already done. "
+          f"Results in {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a JSONL file of math problems with a GRPOtuned backend, resumably.")
+    parser.add_argument("input", help="JSONL file with one {\"id\": ..., \"prompt\": ...} object per line.")
+    parser.add_argument("--output", default="math_results.jsonl")
+    parser.add_argument("--backend", choices=["local", "vllm", "provider"], default="local")
+    parser.add_argument("--concurrency", type=int, default=8, help="Problems in flight at once.")
+    parser.add_argument("--endpoint", default="http://127.0.0.1:8000/v1/chat/completions", help="Chat completions URL for --backend vllm.")
+    parser.add_argument("--provider", default="sambanova", help="Inference provider for --backend provider.")
+    parser.add_argument("--max-new-tokens", type=int, default=12000)
+    parser.add_argument("--temperature", type=float, default=1.5)
+    parser.add_argument("--batch-size", type=int, default=8, help="Micro-batch size for --backend local.")
+    parser.add_argument("--fsync-every", type=int, default=32, help="fsync the output after this many records.")
+    parser.add_argument("--fsync-interval", type=float, default=2.0, help="...or after this many seconds.")
+    asyncio.run(main(parser.parse_args()))
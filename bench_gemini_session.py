@@ -0,0 +1,85 @@
+import time
+import asyncio
+import argparse
+import aiohttp
+from aiohttp import web
+from gemini_api import GeminiAPIWrapper
+
+STUB_RESPONSE = {"candidates": [{"content": {"parts": [{"text": "ok"}], "role": "model"}}]}
+
+
+async def start_stub_server(host="127.0.0.1", port=0):
+    """
+    Starts a local stub of the Gemini `generateContent` endpoint that answers every request
+    with a fixed response. Returns the runner (for cleanup) and the base URL to point the wrapper at.
+    """
+    async def generate_content(request):
+        await request.read()
+        return web.json_response(STUB_RESPONSE)
+
+    app = web.Application()
+    app.router.add_post("/v1beta/models/{model_action}", generate_content)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}/v1beta"
+
+
+async def run_per_request_sessions(api_url, payload, total, concurrency):
+    """Baseline: the previous behaviour, one new ClientSession (and connection) per request."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(api_url, json=payload) as response:
+                    response.raise_for_status()
+                    return await response.json()
+
+    await asyncio.gather(*(one() for _ in range(total)))
+
+
+async def run_pooled_session(wrapper, payload, total, concurrency):
+    """Pooled: every request goes through the wrapper's long-lived session."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await wrapper._make_api_request(payload)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+
+
+async def main(total, concurrency):
+    runner, base_url = await start_stub_server()
+    payload = {"contents": [{"parts": [{"text": "ping"}]}]}
+    try:
+        async with GeminiAPIWrapper(api_key="bench", base_url=base_url) as wrapper:
+            # Warm up both paths so import/first-connection costs are not measured.
+            await run_per_request_sessions(wrapper.api_url, payload, concurrency, concurrency)
+            await run_pooled_session(wrapper, payload, concurrency, concurrency)
+
+            start = time.perf_counter()
+            await run_per_request_sessions(wrapper.api_url, payload, total, concurrency)
+            per_request = time.perf_counter() - start
+
+            start = time.perf_counter()
+            await run_pooled_session(wrapper, payload, total, concurrency)
+            pooled = time.perf_counter() - start
+    finally:
+        await runner.cleanup()
+
+    print(f"requests={total} concurrency={concurrency}")
+    print(f"session per request: {total / per_request:10.1f} req/s")
+    print(f"pooled session:      {total / pooled:10.1f} req/s  ({per_request / pooled:.2f}x)")
+    print("Note: the stub speaks plain HTTP, so TLS handshake savings against the real API are not included.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-request vs pooled aiohttp sessions against a local stub.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubInferenceHandler(BaseHTTPRequestHandler):
+    """Answers every Inference API call immediately, so only client-side overhead is measured."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps([{"generated_text": "stub"}]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_subprocess_calls(calls, env):
+    """Baseline: the previous implementation, one interpreter per call."""
+    for _ in range(calls):
+        process = subprocess.run([sys.executable, "huggingface_inference.py", "hello"],
+                                 capture_output=True, text=True, timeout=60, env=env)
+        process.check_returncode()
+
+
+def run_in_process_calls(calls):
+    from tools import huggingface_tool
+    for _ in range(calls):
+        result = huggingface_tool("hello")
+        assert result == "stub", result
+
+
+def main(subprocess_calls, in_process_calls):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubInferenceHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Point both implementations at the stub before huggingface_inference is first imported.
+    os.environ["HF_API_BASE"] = f"http://127.0.0.1:{server.server_address[1]}/models"
+    os.environ.setdefault("HUGGINGFACE_TOKEN", "bench")
+    # Measure the call path itself, not the client-side quota (see rate_limiter.DEFAULT_LIMITS).
+    os.environ["HUGGINGFACE_RPM"] = ""
+    try:
+        start = time.perf_counter()
+        run_subprocess_calls(subprocess_calls, dict(os.environ))
+        per_subprocess = (time.perf_counter() - start) / subprocess_calls
+
+        run_in_process_calls(1)  # warm-up: module import and first connection
+        start = time.perf_counter()
+        run_in_process_calls(in_process_calls)
+        per_in_process = (time.perf_counter() - start) / in_process_calls
+    finally:
+        server.shutdown()
+
+    print(f"subprocess per call: {per_subprocess * 1000:8.2f} ms  ({subprocess_calls} calls)")
+    print(f"in-process per call: {per_in_process * 1000:8.2f} ms  ({in_process_calls} calls)")
+    print(f"overhead removed:    {(per_subprocess - per_in_process) * 1000:8.2f} ms per call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure per-call overhead of huggingface_tool against a local stub.")
+    parser.add_argument("--subprocess-calls", type=int, default=10)
+    parser.add_argument("--in-process-calls", type=int, default=500)
+    args = parser.parse_args()
+    main(args.subprocess_calls, args.in_process_calls)
@@ -0,0 +1,92 @@
+import os
+import glob
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from bs4 import BeautifulSoup
+from html_extract import HtmlTextExtractor, DEFAULT_BACKEND, _lxml_etree
+
+
+def write_fixtures(directory, sizes_kb, seed=0):
+    """
+    Writes synthetic article pages of roughly the given sizes: navigation, inline scripts and
+    styles, and many paragraphs, like a typical news or documentation page.
+    """
+    rng = random.Random(seed)
+    words = ("model reasoning answer token gradient policy reward tensor batch cache latency "
+             "server request stream parser budget document").split()
+    paths = []
+    for size_kb in sizes_kb:
+        parts = ["<html><head><title>Fixture</title><style>body{margin:0}.nav{color:red}</style>",
+                 "<script>" + "var x = 1;" * 2000 + "</script></head><body>",
+                 "<nav>" + "".join(f"<a href='/{i}'>Link {i}</a>" for i in range(200)) + "</nav><article>"]
+        size = sum(len(p) for p in parts)
+        while size < size_kb * 1024:
+            paragraph = "<p>" + " ".join(rng.choice(words) for _ in range(80)) + " <b>bold</b> &amp; more.</p>\n"
+            parts.append(paragraph)
+            size += len(paragraph)
+        parts.append("</article><footer>Footer</footer></body></html>")
+        path = os.path.join(directory, f"page_{size_kb}kb.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("".join(parts))
+        paths.append(path)
+    return paths
+
+
+def old_extract(html):
+    """Baseline: the previous web_scraper extraction."""
+    soup = BeautifulSoup(html, "html.parser")
+    return " ".join(soup.stripped_strings)
+
+
+def new_extract(html, backend, max_chars, chunk_size=64 * 1024):
+    """Feeds the page in network-sized chunks and stops at the budget, like web_scraper does."""
+    extractor = HtmlTextExtractor(max_chars=max_chars, backend=backend)
+    for start in range(0, len(html), chunk_size):
+        if extractor.feed(html[start:start + chunk_size]):
+            break
+    return extractor.close()
+
+
+def measure(function, repeats):
+    """Returns mean seconds per run, peak traced memory of one separate run, and output length."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        text = function()
+    elapsed = (time.perf_counter() - start) / repeats
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(text)
+
+
+def main(paths, max_chars, repeats):
+    backends = ["html.parser"] + (["lxml"] if _lxml_etree is not None else [])
+    print(f"default backend: {DEFAULT_BACKEND}; budget: {max_chars} chars; {repeats} repeats")
+    print(f"{'fixture':<22}{'method':<28}{'ms':>10}{'peak MB':>10}{'chars':>10}")
+    for path in paths:
+        with open(path, "rb") as f:
+            html = f.read()
+        name = os.path.basename(path)
+        rows = [("bs4 html.parser (old)", lambda: old_extract(html))]
+        for backend in backends:
+            rows.append((f"stream {backend} (new)", lambda backend=backend: new_extract(html, backend, max_chars)))
+        for label, function in rows:
+            elapsed, peak, chars = measure(function, repeats)
+            print(f"{name:<22}{label:<28}{elapsed * 1000:10.1f}{peak / 2**20:10.1f}{chars:10d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the old and streaming HTML text extraction of web_scraper.")
+    parser.add_argument("fixtures", nargs="*", help="Saved HTML files or globs (default: generated 100 KB - 4 MB pages).")
+    parser.add_argument("--max-chars", type=int, default=20_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    if args.fixtures:
+        main([p for pattern in args.fixtures for p in sorted(glob.glob(pattern))], args.max_chars, args.repeats)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            main(write_fixtures(directory, [100, 1024, 4096]), args.max_chars, args.repeats)
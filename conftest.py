@@ -0,0 +1,63 @@
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+
+@pytest_asyncio.fixture
+async def stub_server():
+    """
+    Starts local aiohttp servers for a test.
+
+    `base = await stub_server({path: handler, ...})` serves each handler on its route pattern for
+    any method and returns the server's base URL ("http://127.0.0.1:<port>"). Every server started
+    this way is stopped when the test ends.
+    """
+    runners = []
+
+    async def start(routes):
+        app = web.Application()
+        for path, handler in routes.items():
+            app.router.add_route("*", path, handler)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        runners.append(runner)
+        return f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    yield start
+    for runner in runners:
+        await runner.cleanup()
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections open, so clients pool them.
+    body = b"{}"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    do_POST = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def threaded_server():
+    """
+    A keep-alive HTTP server on its own thread, answering every GET and POST with `{}`. Unlike
+    `stub_server` it outlives event loops, for tests that use a client across `asyncio.run` calls.
+    Yields the server's base URL.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,210 @@
+import os
+import json
+import asyncio
+import contextlib
+import aiohttp
+from dotenv import load_dotenv
+from retry_policy import RetryPolicy
+from rate_limiter import limiter as default_rate_limiter, estimate_tokens, RateLimitedCall
+from sse import iter_sse_events
+from http_session import discard_session, close_session
+
+load_dotenv()
+
+DEFAULT_BASE_URL = os.environ.get("DEEPSEEK_API_BASE", "https://api.deepseek.com/v1")
+
+
+class DeepSeekClient:
+    """
+    Async client for DeepSeek's OpenAI-compatible chat completions API.
+
+    Like `GeminiAPIWrapper`, it owns one connection-pooled aiohttp session, created lazily and
+    reused for every call. Streaming responses are parsed incrementally with `SSEParser`; the
+    `content` and `reasoning_content` deltas are collected (and optionally passed to a callback)
+    without printing anything per chunk.
+    """
+
+    def __init__(self, api_key=None, base_url=DEFAULT_BASE_URL, connection_limit=32, keepalive_timeout=60,
+                 connect_timeout=5, read_timeout=60, retry_policy=None, rate_limiter=default_rate_limiter):
+        """
+        Args:
+            api_key (str, optional): DeepSeek API key. Defaults to the 'DeepSeek_API_Key' environment variable.
+            base_url (str, optional): Base URL of the API. Defaults to 'DEEPSEEK_API_BASE' or the public endpoint.
+            connection_limit (int, optional): Pooled connections. Defaults to 32.
+            keepalive_timeout (float, optional): Seconds an idle connection is kept open. Defaults to 60.
+            connect_timeout (float, optional): Seconds allowed to establish a connection. Defaults to 5.
+            read_timeout (float, optional): Longest gap allowed between two reads of the response. There is
+                                            no limit on the total duration, so long reasoning streams are
+                                            not cut off while tokens keep arriving. Defaults to 60.
+            retry_policy (RetryPolicy, optional): Retries for failures before any data has been received.
+            rate_limiter (RateLimiter, optional): Shared limiter calls are admitted through as "deepseek";
+                                                  None disables client-side rate limiting.
+
+        Raises:
+            ValueError: If no API key is given or set in the environment.
+        """
+        self.api_key = api_key or os.environ.get("DeepSeek_API_Key")
+        if not self.api_key:
+            raise ValueError("API key not provided. Set DeepSeek_API_Key environment variable.")
+        self.chat_url = f"{base_url.rstrip('/')}/chat/completions"
+        self.connection_limit = connection_limit
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=3)
+        self.rate_limiter = rate_limiter
+        self._session = None
+        self._session_loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def _get_session(self):
+        """
+        Returns the shared aiohttp session, creating it on first use (or on a new event loop, in
+        which case the old one is closed rather than leaked).
+        Private method.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            discard_session(self._session, self._session_loop)
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def aclose(self):
+        """Closes the pooled session. The client can still be used afterwards; a new session is opened."""
+        await close_session(self._session, self._session_loop)
+        self._session = None
+        self._session_loop = None
+
+    def _rate_limited(self, tokens):
+        """
+        Returns the context manager admitting one call through the rate limiter.
+        Private method.
+        """
+        if self.rate_limiter is None:
+            return contextlib.nullcontext(RateLimitedCall(tokens))
+        return self.rate_limiter.limit("deepseek", tokens=tokens)
+
+    async def _post(self, payload, handle_response):
+        """
+        Sends `payload` under the rate limiter and returns `await handle_response(response, call)`.
+        Connection errors and transient statuses are retried per `self.retry_policy`, but only
+        until a successful response has started arriving; a failure while reading it is raised.
+        Private method.
+        """
+        session = self._get_session()
+        policy = self.retry_policy
+        policy.on_request()
+        tokens = estimate_tokens(json.dumps(payload["messages"])) + payload.get("max_tokens", 0)
+        attempt = 0
+        while True:
+            status = None
+            retry_after = None
+            started = False
+            try:
+                async with self._rate_limited(tokens) as call:
+                    async with session.post(self.chat_url, json=payload) as response:
+                        if response.status >= 400:
+                            status = response.status
+                            retry_after = response.headers.get("Retry-After")
+                        response.raise_for_status()
+                        started = True
+                        return await handle_response(response, call)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                delay = None if started else policy.next_delay(attempt, status=status, retry_after=retry_after, idempotent=True)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _payload(messages, model, temperature, max_tokens, stream, response_format):
+        payload = {"model": model, "messages": messages, "stream": stream, "max_tokens": max_tokens}
+        if temperature is not None:
+            payload["temperature"] = temperature
+        if response_format is not None:
+            payload["response_format"] = response_format
+        return payload
+
+    async def chat(self, messages, model="deepseek-chat", temperature=None, max_tokens=1000, response_format=None):
+        """
+        Makes a non-streaming chat completion call.
+
+        Returns:
+            dict: `content`, `reasoning_content` (None unless the model returns one), `finish_reason` and `usage`.
+        """
+        payload = self._payload(messages, model, temperature, max_tokens, False, response_format)
+
+        async def read(response, call):
+            body = await response.json()
+            usage = body.get("usage") or {}
+            call.actual_tokens = usage.get("total_tokens")
+            choice = body["choices"][0]
+            return {
+                "content": choice["message"].get("content") or "",
+                "reasoning_content": choice["message"].get("reasoning_content"),
+                "finish_reason": choice.get("finish_reason"),
+                "usage": usage or None,
+            }
+
+        return await self._post(payload, read)
+
+    async def stream_chat(self, messages, model="deepseek-chat", temperature=None, max_tokens=1000,
+                          response_format=None, on_delta=None):
+        """
+        Makes a streaming chat completion call and collects the streamed response.
+
+        Args:
+            messages (list): OpenAI-style chat messages.
+            model (str, optional): 'deepseek-chat' or 'deepseek-reasoner'. Defaults to 'deepseek-chat'.
+            temperature (float, optional): Sampling temperature; omitted from the request when None.
+            max_tokens (int, optional): Maximum tokens to generate. Defaults to 1000.
+            response_format (dict, optional): e.g. `{"type": "json_object"}`.
+            on_delta (callable, optional): Called as `on_delta(kind, text)` for every delta, where `kind` is
+                                           "reasoning" or "content".
+
+        Returns:
+            dict: As for `chat`, with the streamed deltas joined.
+        """
+        payload = self._payload(messages, model, temperature, max_tokens, True, response_format)
+        payload["stream_options"] = {"include_usage": True}
+
+        async def read(response, call):
+            content, reasoning = [], []
+            finish_reason = None
+            usage = None
+            async for event in iter_sse_events(response.content):
+                if event["data"] == "[DONE]":
+                    break
+                chunk = json.loads(event["data"])
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                    call.actual_tokens = usage.get("total_tokens")
+                for choice in chunk.get("choices") or []:
+                    delta = choice.get("delta") or {}
+                    if delta.get("reasoning_content"):
+                        reasoning.append(delta["reasoning_content"])
+                        if on_delta is not None:
+                            on_delta("reasoning", delta["reasoning_content"])
+                    if delta.get("content"):
+                        content.append(delta["content"])
+                        if on_delta is not None:
+                            on_delta("content", delta["content"])
+                    finish_reason = choice.get("finish_reason") or finish_reason
+            return {
+                "content": "".join(content),
+                "reasoning_content": "".join(reasoning) or None,
+                "finish_reason": finish_reason,
+                "usage": usage,
+            }
+
+        return await self._post(payload, read)
@@ -15,13 +15,14 @@ load_dotenv()
 #Extend the Agent class to call the function registry
 class GeminiAgent(Agent):
 
-    def __init__(self, llm):
+    def __init__(self, llm, gemini_api=None):
         super().__init__(llm = llm)
+        # Share the wrapper (and its pooled session) behind `llm` instead of opening one per step.
+        self.gemini_api = gemini_api or getattr(llm, '__self__', None) or GeminiAPIWrapper()
 
     #Override the default execution to call external APIs if provided
     async def step(self, objective:str) -> str:
-        gemini_api = GeminiAPIWrapper()
-        action = await gemini_api.call_gemini_api(prompt=f'{objective}\\n what function should I call?  return in JSON format like this:\\n{{\"function_name\": <one of the keys in function registry>, \"params\":{{\"appropriate JSON \"}}}}.\\n if you cannot fulfil objective, function_name = None')
+        action = await self.gemini_api.call_gemini_api(prompt=f'{objective}\\n what function should I call?  return in JSON format like this:\\n{{\"function_name\": <one of the keys in function registry>, \"params\":{{\"appropriate JSON \"}}}}.\\n if you cannot fulfil objective, function_name = None')
         #Use the function name and the dictionary for call!
         try:
             action_json = json.loads(action)
@@ -29,7 +30,7 @@ class GeminiAgent(Agent):
             params = action_json.get('params')
 
             if function_name in registry.functions:
-                result = await registry.call_function(function_name, params)
+                result = await registry.acall_function(function_name, params)
                 #If external API is called, add content here, return to Agent step
                 return f'function call:{function_name}, with the following result: {result}'
             else:
@@ -47,18 +48,18 @@ class GeminiAgent(Agent):
 
 async def main():
     # Create an agent that uses Gemini 2.0 as its LLM backend
-    gemini_api = GeminiAPIWrapper()
-    agent = GeminiAgent(llm = gemini_api.call_gemini_api)
-    #The functions are registered!
-    # Define a task that the agent will attempt to solve
-    task = "I want to travel from New York to Paris with a budget of $3000 for 7 days and with interests on seeing some museums.  Create the itinerary for me and search for travel dates next month. \n    "
-    print("\nUsing smolagent to plan a task...")
-    try:
-        agent_response = await agent.run(task)
-        print("Agent response:")
-        print(agent_response)
-    except Exception as e:
-        print(f"An error occurred while running the agent: {e}")
+    async with GeminiAPIWrapper() as gemini_api:
+        agent = GeminiAgent(llm = gemini_api.call_gemini_api, gemini_api=gemini_api)
+        #The functions are registered!
+        # Define a task that the agent will attempt to solve
+        task = "I want to travel from New York to Paris with a budget of $3000 for 7 days and with interests on seeing some museums.  Create the itinerary for me and search for travel dates next month. \n    "
+        print("\nUsing smolagent to plan a task...")
+        try:
+            agent_response = await agent.run(task)
+            print("Agent response:")
+            print(agent_response)
+        except Exception as e:
+            print(f"An error occurred while running the agent: {e}")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -79,12 +80,13 @@ load_dotenv()
 #Extend the Agent class to call the function registry
 class GeminiAgent(Agent):
 
-    def __init__(self, llm):
+    def __init__(self, llm, gemini_api=None):
         super().__init__(llm=llm)
+        # Share the wrapper (and its pooled session) behind `llm` instead of opening one per step.
+        self.gemini_api = gemini_api or getattr(llm, '__self__', None) or GeminiAPIWrapper()
 
     #Override the default execution to call external APIs if provided
     async def step(self, objective: str) -> str:
-        gemini_api = GeminiAPIWrapper()
         action = await self.llm(f'{objective}\\n what function should I call?  return in JSON format like this:\\n{{\"function_name\": <one of the keys in function registry>, \"params\":{{\"appropriate JSON \"}}}}.\\n if you cannot fulfil objective, function_name = None')
         # Use the function name and the dictionary for call!
         try:
@@ -93,7 +95,7 @@ class GeminiAgent(Agent):
             params = action_json.get('params')
 
             if function_name in registry.functions:
-                result = registry.call_function(function_name, params)
+                result = await registry.acall_function(function_name, params)
                 # If external API is called, add content here, return to Agent step
                 return f'function call:{function_name}, with the following result: {result}'
             else:
@@ -110,18 +112,18 @@ class GeminiAgent(Agent):
 
 async def main():
     # Create an agent that uses Gemini 2.0 as its LLM backend
-    gemini_api = GeminiAPIWrapper()
-    agent = GeminiAgent(llm = gemini_api.call_gemini_api)
-    #The functions are registered!
-    # Define a task that the agent will attempt to solve
-    task = "I want to travel from New York to Paris with a budget of $3000 for 7 days and with interests on seeing some museums.  Create the itinerary for me and search for travel dates next month. \n    "
-    print("\nUsing smolagent to plan a task...")
-    try:
-        agent_response = await agent.run(task)
-        print("Agent response:")
-        print(agent_response)
-    except Exception as e:
-        print(f"An error occurred while running the agent: {e}")
+    async with GeminiAPIWrapper() as gemini_api:
+        agent = GeminiAgent(llm = gemini_api.call_gemini_api, gemini_api=gemini_api)
+        #The functions are registered!
+        # Define a task that the agent will attempt to solve
+        task = "I want to travel from New York to Paris with a budget of $3000 for 7 days and with interests on seeing some museums.  Create the itinerary for me and search for travel dates next month. \n    "
+        print("\nUsing smolagent to plan a task...")
+        try:
+            agent_response = await agent.run(task)
+            print("Agent response:")
+            print(agent_response)
+        except Exception as e:
+            print(f"An error occurred while running the agent: {e}")
 
 if __name__ == "__main__":
     asyncio.run(main())
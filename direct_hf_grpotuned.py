@@ -1,11 +1,13 @@
 import sys
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import json
+from transformers import StoppingCriteriaList
+from grpotuned_model import load_model, generate_batch, stream_completion, AnswerStoppingCriteria
+from answer_parser import result_record
+from log_sink import get_sink
 
-def generate_math_solution_direct(prompt, max_new_tokens=12000, temperature=1.5):
+def generate_math_solution_direct(prompt, max_new_tokens=12000, temperature=1.5, stop_at_answer=True):
     """
     Uses a direct model loading approach to generate a math problem solution using the GRPOtuned model.
+    The model is loaded once per process and reused by later calls.
     
     The GRPOtuned model is expected to output reasoning steps and a final answer in an XML format.
     
@@ -13,39 +15,85 @@ def generate_math_solution_direct(prompt, max_new_tokens=12000, temperature=1.5)
       prompt (str): The input text prompt containing the math problem.
       max_new_tokens (int): Maximum number of tokens to generate. Default is 12000.
       temperature (float): Temperature for generation. Default is 1.5.
+      stop_at_answer (bool): Stop generating right after the closing answer tag. Default is True.
     
     Returns:
       str: The generated output.
     """
     model_name = "HarleyCooper/GRPOtuned"
-    # Load the tokenizer and model directly.
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForCausalLM.from_pretrained(model_name)
+    # Get the tokenizer and model, loading them only on the first call.
+    tokenizer, model = load_model(model_name)
     
     # Tokenize the prompt.
     inputs = tokenizer(prompt, return_tensors="pt")
     
+    generation_kwargs = {}
+    if stop_at_answer:
+        # Without this the model runs on to max_new_tokens after it has answered.
+        prompt_length = inputs["input_ids"].shape[1]
+        generation_kwargs["stopping_criteria"] = StoppingCriteriaList([AnswerStoppingCriteria(tokenizer, prompt_length)])
+
     # Generate output tokens from the model.
-    outputs = model.generate(**inputs, max_new_tokens=max_new_tokens, temperature=temperature)
+    outputs = model.generate(**inputs, max_new_tokens=max_new_tokens, temperature=temperature, **generation_kwargs)
     
     # Decode the tokens to string.
     generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
     return generated_text
 
+def generate_math_solutions_batch(prompts, max_new_tokens=12000, temperature=1.5, batch_size=8, stop_at_answer=True):
+    """
+    Generates solutions for many math problems, `batch_size` prompts per `model.generate` call.
+    With `stop_at_answer`, each solution ends at its closing answer tag.
+
+    Parameters:
+      prompts (list of str): The math problem prompts.
+      max_new_tokens (int): Maximum number of tokens to generate per prompt. Default is 12000.
+      temperature (float): Temperature for generation. Default is 1.5.
+      batch_size (int): Number of prompts generated together. Default is 8.
+      stop_at_answer (bool): Stop each solution after the closing answer tag. Default is True.
+
+    Returns:
+      list of str: The generated outputs (prompt followed by the completion), in input order.
+    """
+    solutions = []
+    for start in range(0, len(prompts), batch_size):
+        chunk = prompts[start:start + batch_size]
+        completions = generate_batch(chunk, max_new_tokens=max_new_tokens, temperature=temperature, stop_at_answer=stop_at_answer)
+        solutions.extend(prompt + completion["text"] for prompt, completion in zip(chunk, completions))
+    return solutions
+
+def stream_math_solution(prompt, max_new_tokens=12000, temperature=1.5, stop_at_answer=True):
+    """
+    Streams a solution for a math problem, yielding decoded text as the model produces it.
+
+    With `stop_at_answer`, generation stops as soon as the closing answer tag has been emitted
+    rather than running on for the rest of `max_new_tokens`.
+
+    Parameters:
+      prompt (str): The input text prompt containing the math problem.
+      max_new_tokens (int): Maximum number of tokens to generate. Default is 12000.
+      temperature (float): Temperature for generation. Default is 1.5.
+      stop_at_answer (bool): Stop after the closing answer tag. Default is True.
+
+    Returns:
+      CompletionStream: Iterable of text chunks (the completion only, without the prompt).
+    """
+    return stream_completion(prompt, max_new_tokens=max_new_tokens, temperature=temperature, stop_at_answer=stop_at_answer)
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         prompt = " ".join(sys.argv[1:])
     else:
         prompt = input("Enter a math problem: ")
-    solution = generate_math_solution_direct(prompt)
     print("Generated Output:")
-    print(solution)
+    print(prompt, end="", flush=True)
+    chunks = []
+    for chunk in stream_math_solution(prompt):
+        print(chunk, end="", flush=True)
+        chunks.append(chunk)
+    print()
     
-    # Save the prompt and solution to math_results.jsonl, preserving all reasoning and answer
-    result = {
-        "prompt": prompt,
-        "generated_output": solution
-    }
-    with open("math_results.jsonl", "a", encoding="utf-8") as f:
-        f.write(json.dumps(result) + "\n")
+    # Save the prompt with the parsed reasoning and answer to math_results.jsonl
+    result = result_record(prompt, "".join(chunks))
+    get_sink("math_results.jsonl").write(result)
     print("Result saved to math_results.jsonl")
@@ -0,0 +1,309 @@
+import ast
+import math
+import time
+import operator
+import functools
+import numpy as np
+
+# Limits that keep a single expression from pinning a core or exhausting memory.
+MAX_EXPRESSION_CHARS = 2000
+MAX_NODES = 500
+MAX_EXPONENT = 10_000
+MAX_INT_BITS = 4096
+DEFAULT_TIMEOUT = 1.0
+
+CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+# name: (scalar implementation, vectorized implementation, number of arguments)
+FUNCTIONS = {
+    "abs": (abs, np.abs, 1),
+    "sqrt": (math.sqrt, np.sqrt, 1),
+    "exp": (math.exp, np.exp, 1),
+    "log": (math.log, np.log, 1),
+    "log2": (math.log2, np.log2, 1),
+    "log10": (math.log10, np.log10, 1),
+    "sin": (math.sin, np.sin, 1),
+    "cos": (math.cos, np.cos, 1),
+    "tan": (math.tan, np.tan, 1),
+    "asin": (math.asin, np.arcsin, 1),
+    "acos": (math.acos, np.arccos, 1),
+    "atan": (math.atan, np.arctan, 1),
+    "floor": (math.floor, np.floor, 1),
+    "ceil": (math.ceil, np.ceil, 1),
+    "round": (round, np.round, 1),
+    "min": (min, np.minimum, 2),
+    "max": (max, np.maximum, 2),
+}
+
+
+class ExpressionError(ValueError):
+    """Raised for expressions that are invalid, unsupported, or exceed the evaluation limits."""
+
+
+def _check(value):
+    """
+    Rejects results beyond the magnitude limit. Arrays are left alone: their elements are
+    fixed-size floats, and overflow there becomes inf for that element only.
+    Private function.
+    """
+    kind = type(value)
+    if kind is int:
+        if value.bit_length() > MAX_INT_BITS:
+            raise ExpressionError(f"Result exceeds {MAX_INT_BITS} bits")
+    elif kind is float:
+        if math.isinf(value):
+            raise ExpressionError("Result is too large")
+    elif kind is complex:
+        raise ExpressionError("Result is not a real number")
+    return value
+
+
+def _pow(base, exponent):
+    """
+    `base ** exponent` that refuses integer powers too large to compute quickly.
+    Private function.
+    """
+    if type(base) is int and type(exponent) is int:
+        if abs(exponent) > MAX_EXPONENT:
+            raise ExpressionError(f"Exponent {exponent} exceeds the limit of {MAX_EXPONENT}")
+        if abs(base) > 1 and exponent * (abs(base).bit_length() - 1) > MAX_INT_BITS:
+            raise ExpressionError(f"Result exceeds {MAX_INT_BITS} bits")
+    return base ** exponent
+
+
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _pow,
+}
+
+_UNARY = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+_COMPARE = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+
+def _timed_out():
+    raise ExpressionError("Evaluation timed out")
+
+
+def _compile(node, variables):
+    """
+    Turns a validated AST node into a closure `f(scope, deadline)`, collecting variable names.
+    Private function.
+    """
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if type(value) not in (int, float):
+            raise ExpressionError(f"Unsupported constant: {value!r}")
+        return lambda scope, deadline: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in CONSTANTS:
+            value = CONSTANTS[name]
+            return lambda scope, deadline: value
+        variables.add(name)
+        return lambda scope, deadline: scope[name]
+
+    if isinstance(node, ast.BinOp):
+        op = _BINARY.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        left, right = _compile(node.left, variables), _compile(node.right, variables)
+
+        def binary(scope, deadline):
+            result = _check(op(left(scope, deadline), right(scope, deadline)))
+            if time.monotonic() > deadline:
+                _timed_out()
+            return result
+        return binary
+
+    if isinstance(node, ast.UnaryOp):
+        op = _UNARY.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"Unsupported unary operator: {type(node.op).__name__}")
+        operand = _compile(node.operand, variables)
+        return lambda scope, deadline: op(operand(scope, deadline))
+
+    if isinstance(node, ast.Compare):
+        ops = []
+        for op_node in node.ops:
+            op = _COMPARE.get(type(op_node))
+            if op is None:
+                raise ExpressionError(f"Unsupported comparison: {type(op_node).__name__}")
+            ops.append(op)
+        operands = [_compile(operand, variables) for operand in [node.left, *node.comparators]]
+
+        def compare(scope, deadline):
+            values = [operand(scope, deadline) for operand in operands]
+            result = ops[0](values[0], values[1])
+            # `&` rather than `and`, so chained comparisons also work element-wise on arrays.
+            for op, left, right in zip(ops[1:], values[1:], values[2:]):
+                result = result & op(left, right)
+            return result
+        return compare
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise ExpressionError(f"Unsupported function: {ast.unparse(node.func)}")
+        if node.keywords:
+            raise ExpressionError(f"{node.func.id}() takes no keyword arguments")
+        scalar, vectorized, arity = FUNCTIONS[node.func.id]
+        if len(node.args) != arity:
+            raise ExpressionError(f"{node.func.id}() takes {arity} argument{'s' if arity > 1 else ''}")
+        arguments = [_compile(argument, variables) for argument in node.args]
+
+        def call(scope, deadline):
+            values = [argument(scope, deadline) for argument in arguments]
+            function = vectorized if any(isinstance(value, np.ndarray) for value in values) else scalar
+            result = _check(function(*values))
+            if time.monotonic() > deadline:
+                _timed_out()
+            return result
+        return call
+
+    raise ExpressionError(f"Unsupported expression type: {type(node).__name__}")
+
+
+class CompiledExpression:
+    """
+    A validated expression compiled into nested closures, ready to be evaluated many times.
+    Use `compile_expression` to get one; it caches them by source text.
+    """
+
+    def __init__(self, source, function, variables):
+        self.source = source
+        self.variables = variables
+        self._function = function
+
+    def _deadline(self, timeout):
+        return time.monotonic() + timeout if timeout is not None else math.inf
+
+    def _check_variables(self, names):
+        missing = self.variables - set(names)
+        if missing:
+            raise ExpressionError(f"Unknown name{'s' if len(missing) > 1 else ''}: {', '.join(sorted(missing))}")
+
+    def _columns(self, rows):
+        """
+        Turns a list of per-evaluation variable dicts into one list of values per variable.
+        Private method.
+        """
+        columns = {name: [] for name in self.variables}
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                raise ExpressionError(f"Binding {index} is not a dict of variable values")
+            missing = self.variables - row.keys()
+            if missing:
+                raise ExpressionError(
+                    f"Unknown name{'s' if len(missing) > 1 else ''}: {', '.join(sorted(missing))} in binding {index}"
+                )
+            for name, values in columns.items():
+                values.append(row[name])
+        return columns
+
+    def evaluate(self, variables=None, timeout=DEFAULT_TIMEOUT):
+        """
+        Evaluates the expression once.
+
+        Args:
+            variables (dict, optional): Values for the expression's variables.
+            timeout (float, optional): Seconds allowed; None for no limit. Defaults to DEFAULT_TIMEOUT.
+
+        Returns:
+            int | float | bool: The result. Integer arithmetic stays exact.
+
+        Raises:
+            ExpressionError: On unknown names, math errors (division by zero, domain errors) and
+                             results or exponents beyond the limits.
+        """
+        scope = variables or {}
+        self._check_variables(scope)
+        try:
+            return _check(self._function(scope, self._deadline(timeout)))
+        except ExpressionError:
+            raise
+        except OverflowError as e:
+            raise ExpressionError("Result is too large") from e
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise ExpressionError(str(e) or type(e).__name__) from e
+
+    def evaluate_many(self, bindings, timeout=DEFAULT_TIMEOUT):
+        """
+        Evaluates the expression over many variable bindings at once with NumPy, e.g. to check a
+        batch of candidate answers.
+
+        Values are converted to float64 arrays and combined with broadcasting. Math errors affect
+        only the elements they occur in (division by zero gives inf, domain errors give nan).
+
+        Args:
+            bindings (dict | list[dict]): Either a mapping of variable name to a sequence of values,
+                                          or a list of per-evaluation variable dicts.
+            timeout (float, optional): Seconds allowed; None for no limit. Defaults to DEFAULT_TIMEOUT.
+
+        Returns:
+            np.ndarray: One result per binding (booleans for comparisons).
+
+        Raises:
+            ExpressionError: If a binding lacks one of the expression's variables or a value is not
+                             a number.
+        """
+        if not isinstance(bindings, dict):
+            bindings = self._columns(list(bindings))
+        self._check_variables(bindings)
+        try:
+            arrays = {name: np.asarray(values, dtype=np.float64) for name, values in bindings.items()}
+            shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+            with np.errstate(all="ignore"):
+                result = self._function(arrays, self._deadline(timeout))
+        except ExpressionError:
+            raise
+        except OverflowError as e:
+            raise ExpressionError("Result is too large") from e
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise ExpressionError(str(e) or type(e).__name__) from e
+        return np.broadcast_to(result, shape)
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_expression(expression):
+    """
+    Parses, validates and compiles `expression`; results are cached by expression text, so
+    repeated expressions skip parsing entirely.
+
+    Supported: int and float literals, + - * / // % **, unary -/+, comparisons (also chained),
+    the constants in CONSTANTS, the functions in FUNCTIONS, and any other name as a variable.
+
+    Raises:
+        ExpressionError: If the expression is malformed, too large, or uses anything else.
+    """
+    if len(expression) > MAX_EXPRESSION_CHARS:
+        raise ExpressionError(f"Expression is longer than {MAX_EXPRESSION_CHARS} characters")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except (SyntaxError, RecursionError, MemoryError) as e:
+        raise ExpressionError(f"Invalid expression: {getattr(e, 'msg', None) or type(e).__name__}") from e
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise ExpressionError(f"Expression has more than {MAX_NODES} nodes")
+    variables = set()
+    function = _compile(tree.body, variables)
+    return CompiledExpression(expression, function, frozenset(variables))
+
+
+def evaluate(expression, variables=None, timeout=DEFAULT_TIMEOUT):
+    """Compiles (or fetches from the cache) and evaluates `expression`; see `CompiledExpression.evaluate`."""
+    return compile_expression(expression).evaluate(variables, timeout)
@@ -1,43 +1,204 @@
-from typing import Callable, Dict, Any
+import re
+import json
+import math
+import asyncio
+import functools
+import inspect
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Any, Iterable, List, Optional, Tuple, Union
 from tools import web_search, calculate, web_scraper, summarize_text, deepseek_chat, huggingface_tool  # Import your tool functions here
+from summarizer import STOPWORDS
+from tool_schema import ToolSchema, ToolArgumentError
+
+FunctionType = Callable[..., Union[str, Awaitable[str]]]
+
+_WORD = re.compile(r"[^\W_]+")
+
+# Words are matched on this many leading characters, so "search"/"searches" and
+# "summarise"/"summarizes" count as the same term.
+_TERM_PREFIX = 5
+
+
+def _relevance_terms(text: str) -> set:
+    """Lower-cased, prefix-truncated content words of `text`, for tool selection."""
+    return {word[:_TERM_PREFIX] for word in _WORD.findall(text.lower()) if word not in STOPWORDS}
+
+
+class ToolDeclarations(list):
+    """
+    The Gemini `tools` list for a set of registered functions: a single tool object holding all
+    of their `functionDeclarations`.
+
+    It is an ordinary list, so it can be used anywhere a `tools` list is expected, and it also
+    carries `serialized`, its compact JSON encoding, made once so request bodies can embed it
+    without encoding the schemas again.
+    """
+
+    def __init__(self, declarations: List[Dict[str, Any]]):
+        super().__init__([{"functionDeclarations": declarations}] if declarations else [])
+        self.names = [declaration["name"] for declaration in declarations]
+        self.serialized = json.dumps(self, separators=(",", ":"))
 
-FunctionType = Callable[[Dict[str, Any]], str]
 
 class FunctionRegistry:
-    def __init__(self):
+    def __init__(self, max_workers: int = 8):
         self.functions: Dict[str, FunctionType] = {}
+        # Sync tools run here so they never block the event loop of the caller.
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="registry-tool")
+        # Built lazily and dropped whenever a function is registered.
+        self.schemas: Dict[str, ToolSchema] = {}
+        self._declarations: Dict[Optional[tuple], ToolDeclarations] = {}
+        self._relevance_index: Optional[Dict[str, Counter]] = None
 
-    def register_function(self, name: str, func: FunctionType, description: str, parameters: Dict[str, str]) -> None:
+    def register_function(self, name: str, func: FunctionType, description: str,
+                          parameters: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> None:
+        """
+        Register a tool. `func` may be a plain function or an `async def` coroutine function.
+        `timeout` bounds how long `acall_function` waits for it (None waits indefinitely).
+
+        The parameter schema is generated from `func`'s signature and type hints (see
+        `tool_schema.ToolSchema`); `parameters` maps parameter names to their descriptions.
+        """
+        schema = ToolSchema(func, parameters)
         self.functions[name] = func
+        self.schemas[name] = schema
         func.__description__ = description  # type: ignore
         func.__parameters__ = parameters  # type: ignore
+        func.__timeout__ = timeout  # type: ignore
+        self._declarations.clear()
+        self._relevance_index = None
 
-    def call_function(self, name: str, args: Dict[str, Any]) -> str:
+    def _declaration(self, name: str) -> Dict[str, Any]:
+        """The Gemini function declaration of one registered function."""
+        return {
+            "name": name,
+            "description": getattr(self.functions[name], '__description__', ''),
+            "parameters": self.schemas[name].parameters,
+        }
+
+    def tool_declarations(self, names: Optional[Iterable[str]] = None) -> ToolDeclarations:
+        """
+        Return the declarations of all registered functions, or of `names` only, as one tool.
+
+        Results are cached (with their serialized JSON) until the next `register_function`, so
+        repeated requests reuse the same object instead of rebuilding the schemas.
+        """
+        key = None if names is None else tuple(name for name in self.functions if name in set(names))
+        declarations = self._declarations.get(key)
+        if declarations is None:
+            selected = self.functions if key is None else key
+            declarations = self._declarations[key] = ToolDeclarations([self._declaration(name) for name in selected])
+        return declarations
+
+    def select_tools(self, text: str, max_tools: Optional[int] = None) -> List[str]:
+        """
+        Rank registered functions by relevance to `text` (typically the user's request).
+
+        Each function is scored by the words it shares with `text` in its name, description and
+        parameter descriptions, weighted by how few functions use each word. Functions sharing no
+        words are left out; if none match at all, every function is returned so the model is
+        never left without tools.
+
+        Args:
+            text: The text to match against.
+            max_tools: Most names returned when some match. Defaults to no limit.
+
+        Returns:
+            Function names, most relevant first.
+        """
+        if self._relevance_index is None:
+            self._relevance_index = {
+                name: _relevance_terms(" ".join([name.replace("_", " "), getattr(func, '__description__', ''),
+                                                 *(getattr(func, '__parameters__', None) or {}).values()]))
+                for name, func in self.functions.items()
+            }
+        index = self._relevance_index
+        document_frequency = Counter(term for terms in index.values() for term in terms)
+        wanted = _relevance_terms(text)
+        scores = {
+            name: sum(math.log(1 + len(index) / document_frequency[term]) for term in wanted & terms)
+            for name, terms in index.items()
+        }
+        ranked = [name for name in sorted(scores, key=scores.get, reverse=True) if scores[name] > 0]
+        if not ranked:
+            return list(self.functions)
+        return ranked[:max_tools] if max_tools is not None else ranked
+
+    def _check_call(self, name: str, args: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Validate `args` for `name` against its schema before dispatch.
+        Return `(coerced_args, None)`, or `(None, error_message)` if the call cannot be made.
+        """
+        args = args or {}
         if name not in self.functions:
-            return f"Error: Function '{name}' not found in the registry."
+            return None, f"Error: Function '{name}' not found in the registry."
         try:
-            func = self.functions[name]
-            # Check if the incoming args match the parameters definition.
-            expected_params = getattr(func, '__parameters__', {})
-            # check for missing parameters:
-            missing_params = set(expected_params.keys()) - set(args.keys())
-
-            if missing_params:
-                return f"Error: Missing required parameters: {', '.join(missing_params)} for function {name}"
+            return self.schemas[name].validate(args), None
+        except ToolArgumentError as e:
+            return None, f"Error: {e} for function {name}"
 
+    def call_function(self, name: str, args: Dict[str, Any]) -> str:
+        """
+        Call a tool synchronously. Async tools are run to completion on a private event loop,
+        so this must not be called from inside a running loop for them; use `acall_function` there.
+        """
+        args, error = self._check_call(name, args)
+        if error:
+            return error
+        try:
+            func = self.functions[name]
             # Call the function
+            if inspect.iscoroutinefunction(func):
+                return asyncio.run(func(**args))
             return func(**args)
         except Exception as e:
             return f"Error: An error occurred while calling function '{name}': {e}"
 
+    async def acall_function(self, name: str, args: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """
+        Call a tool without blocking the event loop.
+
+        Async tools are awaited directly; sync tools are offloaded to the registry's thread pool.
+        The call is bounded by the tool's registered timeout, or by `timeout` if that is shorter.
+        On timeout the awaiting side is cancelled and an error string is returned; a sync tool
+        that is already running in a worker thread finishes in the background, since threads
+        cannot be interrupted. Cancelling the caller cancels the tool call the same way.
+        """
+        args, error = self._check_call(name, args)
+        if error:
+            return error
+        func = self.functions[name]
+        timeouts = [t for t in (getattr(func, '__timeout__', None), timeout) if t is not None]
+        effective_timeout = min(timeouts) if timeouts else None
+        loop = asyncio.get_running_loop()
+        try:
+            if inspect.iscoroutinefunction(func):
+                call = func(**args)
+            else:
+                call = loop.run_in_executor(self._executor, functools.partial(func, **args))
+            if effective_timeout is None:
+                return await call
+            deadline = loop.time() + effective_timeout
+            try:
+                return await asyncio.wait_for(call, effective_timeout)
+            except asyncio.TimeoutError:
+                if loop.time() < deadline:
+                    raise  # Raised by the tool itself (e.g. a socket timeout), not by our deadline.
+                return f"Error: Function '{name}' timed out after {effective_timeout:g}s."
+        except Exception as e:
+            return f"Error: An error occurred while calling function '{name}': {e}"
+
 # Create a global function registry instance
 registry = FunctionRegistry()
 
 # Register the tool functions (replace examples with real descriptions and parameters)
-registry.register_function("web_search", web_search, description="Searches the web for information.", parameters={"query": "The search query"})
-registry.register_function("calculate", calculate, description="Calculates a mathematical expression.", parameters={"expression": "The mathematical expression to calculate"})
-registry.register_function("web_scraper", web_scraper, description="Scrapes the content of a webpage.", parameters={"url": "The URL of the webpage to scrape"})
-registry.register_function("summarize_text", summarize_text, description="Summarizes the given text.", parameters={"text": "The text to be summarized"})
+# Descriptions also drive SmolAgent's optional relevance-based tool selection, so they use the
+# words requests for each tool tend to contain.
+registry.register_function("web_search", web_search, description="Searches the web to find information, facts and the latest news.", parameters={"query": "The search query"}, timeout=15)
+registry.register_function("calculate", calculate, description="Calculates (computes) a mathematical expression: arithmetic, powers, square roots, logarithms, trigonometry.", parameters={"expression": "The mathematical expression to calculate"}, timeout=5)
+registry.register_function("web_scraper", web_scraper, description="Scrapes and reads the text content of a webpage, site or link.", parameters={"url": "The URL (http or https address) of the webpage to scrape"}, timeout=30)
+registry.register_function("summarize_text", summarize_text, description="Summarizes the given text.", parameters={"text": "The text to be summarized", "max_tokens": "Approximate length of the summary in tokens"}, timeout=10)
 registry.register_function(
     "deepseek_chat",
     deepseek_chat,
@@ -45,7 +206,8 @@ registry.register_function(
     parameters={
         "prompt": "The text prompt to send to DeepSeek",
         "model": "The model to use ('deepseek-chat' for V3 or 'deepseek-reasoner' for R1)"
-    }
+    },
+    timeout=180
 )
 registry.register_function(
     "huggingface_tool",
@@ -53,5 +215,6 @@ registry.register_function(
     description="Runs inference using a Hugging Face model.",
     parameters={
         "prompt": "The prompt to send to the Hugging Face model"
-    }
+    },
+    timeout=60
 )
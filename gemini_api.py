@@ -1,11 +1,19 @@
 import os
 import json
 import asyncio
+import contextlib
 import aiohttp
 from dotenv import load_dotenv
+from retry_policy import RetryPolicy
+from rate_limiter import limiter as default_rate_limiter, estimate_tokens, RateLimitedCall
+from response_cache import make_cache_key
+from sse import iter_sse_events
+from http_session import discard_session, close_session
 
 load_dotenv()  # Load environment variables from .env file
 
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
 
 class GeminiAPIWrapper:
     """
@@ -15,15 +23,41 @@ class GeminiAPIWrapper:
     Optimized for Gemini 2 Flash through parameter defaults and specific prompt engineering guidance.
     """
 
-    def __init__(self, api_key=None, model_name="gemini-2.0-flash", max_retries=3):
+    def __init__(self, api_key=None, model_name="gemini-2.0-flash", max_retries=3, base_url=DEFAULT_BASE_URL,
+                 connection_limit=100, connection_limit_per_host=20, keepalive_timeout=30, dns_cache_ttl=300,
+                 retry_policy=None, timeout=None, rate_limiter=default_rate_limiter, priority=0, cache=None,
+                 stream_timeout=None):
         """
         Initializes the GeminiAPIWrapper.
 
+        The wrapper owns a single connection-pooled aiohttp session that is created lazily on the
+        first request and reused for every call afterwards, so TCP/TLS handshakes are paid once per
+        pooled connection rather than once per request.  Close it with `aclose()` or use the wrapper
+        as an async context manager.
+
         Args:
             api_key (str, optional): The API key for the Gemini API. Defaults to the
                                        'GEMINI_API_KEY' environment variable.
             model_name (str, optional): The name of the Gemini model to use. Defaults to "gemini-2.0-flash".
-            max_retries (int, optional): Maximum number of retries for API calls. Defaults to 3.
+            max_retries (int, optional): Maximum number of attempts for API calls. Defaults to 3.
+                                         Ignored when `retry_policy` is given.
+            base_url (str, optional): Base URL of the Gemini REST API. Override to point at a proxy or local stub.
+            connection_limit (int, optional): Total number of pooled connections. Defaults to 100.
+            connection_limit_per_host (int, optional): Pooled connections per host. Defaults to 20.
+            keepalive_timeout (float, optional): Seconds an idle connection is kept open. Defaults to 30.
+            dns_cache_ttl (int, optional): Seconds DNS lookups are cached for. Defaults to 300.
+            retry_policy (RetryPolicy, optional): Decides which failures are retried and how long to
+                                                  back off. Defaults to `RetryPolicy(max_attempts=max_retries)`,
+                                                  which shares the process-wide retry budget.
+            timeout (aiohttp.ClientTimeout, optional): Per-attempt timeouts. Defaults to 20s total with a 5s connect timeout.
+            stream_timeout (aiohttp.ClientTimeout, optional): Timeouts for streaming calls. Defaults to no total
+                                                              limit, a 5s connect timeout and 60s between chunks.
+            rate_limiter (RateLimiter, optional): Shared limiter every attempt is admitted through under the
+                                                  "gemini" provider. Defaults to the process-wide limiter;
+                                                  pass None to disable client-side rate limiting.
+            priority (int, optional): Default queueing priority for this wrapper's calls; lower runs first.
+            cache (ResponseCache, optional): Opt-in response cache. Only deterministic requests
+                                             (temperature 0) are looked up and stored. Defaults to None.
 
         Raises:
             ValueError: If API key is not provided and 'GEMINI_API_KEY'
@@ -33,32 +67,306 @@ class GeminiAPIWrapper:
         if not self.api_key:
             raise ValueError("API key not provided. Set GEMINI_API_KEY environment variable.")
         self.model_name = model_name
-        self.api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model_name}:generateContent?key={self.api_key}"
-        self.max_retries = max_retries
+        self.base_url = base_url.rstrip("/")
+        self.api_url = f"{self.base_url}/models/{self.model_name}:generateContent?key={self.api_key}"
+        self.stream_url = f"{self.base_url}/models/{self.model_name}:streamGenerateContent?alt=sse&key={self.api_key}"
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries)
+        self.max_retries = self.retry_policy.max_attempts
+        self.timeout = timeout or aiohttp.ClientTimeout(total=20, sock_connect=5)
+        self.stream_timeout = stream_timeout or aiohttp.ClientTimeout(total=None, sock_connect=5, sock_read=60)
+        self.rate_limiter = rate_limiter
+        self.priority = priority
+        self.cache = cache
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self._session = None
+        self._session_loop = None
 
-    async def _make_api_request(self, payload):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def _get_session(self):
+        """
+        Returns the shared aiohttp session, creating it on first use.
+        Private method.
+
+        A session is bound to the event loop it was created on, so a new one is opened if the
+        wrapper is reused from a different loop (e.g. across separate `asyncio.run` calls); the
+        old one is closed rather than leaked.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            discard_session(self._session, self._session_loop)
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={'Content-Type': 'application/json'},
+                timeout=self.timeout,
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def aclose(self):
+        """
+        Closes the pooled session and releases its connections. Safe to call more than once.
+        """
+        await close_session(self._session, self._session_loop)
+        self._session = None
+        self._session_loop = None
+
+    @staticmethod
+    def _estimate_payload_tokens(payload):
+        """
+        Estimates input plus maximum output tokens of a request for TPM accounting.
+        Private method.
+        """
+        tools = payload.get("tools", [])
+        input_tokens = estimate_tokens(json.dumps(payload.get("contents", [])))
+        input_tokens += estimate_tokens(getattr(tools, "serialized", None) or json.dumps(tools))
+        return input_tokens + payload.get("generationConfig", {}).get("maxOutputTokens", 0)
+
+    @staticmethod
+    def _encode_payload(payload):
+        """
+        Serializes the request body. A `tools` list carrying its own pre-serialized JSON (see
+        `function_registry.ToolDeclarations`) is spliced in as is rather than encoded again.
+        Private method.
+        """
+        tools = payload.get("tools")
+        serialized = getattr(tools, "serialized", None)
+        if serialized is None:
+            return json.dumps(payload).encode("utf-8")
+        rest = json.dumps({key: value for key, value in payload.items() if key != "tools"})
+        separator = ", " if len(rest) > 2 else ""
+        return f'{rest[:-1]}{separator}"tools": {serialized}}}'.encode("utf-8")
+
+    async def _send_request(self, payload, priority=None):
         """
         Makes the API request with retry logic using aiohttp for asynchronous calls.
         Private method.
 
+        Only transient failures (connection errors, timeouts, 408/429/5xx) are retried, after the
+        delay chosen by `self.retry_policy`.  `generateContent` has no side effects, so it is treated
+        as idempotent even though it is a POST.
+
+        Every attempt is admitted through `self.rate_limiter`, so retries count against the quota too.
+        Deterministic requests are served from `self.cache` when it is enabled.
+
         Args:
             payload (dict): The payload to send to the API.
+            priority (int, optional): Queueing priority for the rate limiter. Defaults to `self.priority`.
 
         Returns:
-            dict: The JSON response from the API, or None if the request fails after retries.
+            dict: The JSON response from the API.
+
+        Raises:
+            aiohttp.ClientError | asyncio.TimeoutError: The last error seen if the request is not
+                                                        retried or fails after all attempts.
         """
-        headers = {'Content-Type': 'application/json'}
-        for attempt in range(self.max_retries):
+        cache_key = self._cache_key(payload)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        session = self._get_session()
+        policy = self.retry_policy
+        policy.on_request()
+        priority = self.priority if priority is None else priority
+        estimated_tokens = self._estimate_payload_tokens(payload)
+        body = self._encode_payload(payload)
+        attempt = 0
+        while True:
+            status = None
+            retry_after = None
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(self.api_url, json=payload, timeout=20, headers=headers) as response:
+                async with self._rate_limited(estimated_tokens, priority) as call:
+                    async with session.post(self.api_url, data=body) as response:
+                        if response.status >= 400:
+                            status = response.status
+                            retry_after = response.headers.get("Retry-After")
                         response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-                        return await response.json()
-            except aiohttp.ClientError as e:
-                print(f"API request failed (attempt {attempt + 1}/{self.max_retries}): {e}")
-                if attempt == self.max_retries - 1:
-                    print(f"API request failed after {self.max_retries} retries.")
-                    return None  # Handle retry logic
+                        api_response = await response.json()
+                    usage = api_response.get("usageMetadata") or {}
+                    call.actual_tokens = usage.get("totalTokenCount")
+                if cache_key is not None and api_response.get("candidates"):
+                    self.cache.set(cache_key, api_response)
+                return api_response
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = policy.next_delay(attempt, status=status, retry_after=retry_after, idempotent=True)
+                if delay is None:
+                    print(f"API request failed (attempt {attempt + 1}/{policy.max_attempts}), not retrying: {e!r}")
+                    raise
+                print(f"API request failed (attempt {attempt + 1}/{policy.max_attempts}), retrying in {delay:.2f}s: {e!r}")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _cache_key(self, payload):
+        """
+        Returns the cache key for `payload`, or None if the cache is disabled or the request may be
+        sampled and so must not be served from cache. Only an explicit temperature of 0 counts as
+        deterministic: without one the server samples at its default temperature (1.0).
+        Private method.
+        """
+        if self.cache is None:
+            return None
+        if payload.get("generationConfig", {}).get("temperature") != 0:
+            return None
+        return make_cache_key(self.model_name, payload)
+
+    def _rate_limited(self, estimated_tokens, priority):
+        """
+        Returns the rate-limiter slot for one attempt, or a no-op context if limiting is disabled.
+        Private method.
+        """
+        if self.rate_limiter is None:
+            return contextlib.nullcontext(RateLimitedCall(estimated_tokens))
+        return self.rate_limiter.limit("gemini", tokens=estimated_tokens, priority=priority)
+
+    async def _make_api_request(self, payload):
+        """
+        Same as `_send_request`, but returns None instead of raising once retries are exhausted.
+        Private method.
+
+        Args:
+            payload (dict): The payload to send to the API.
+
+        Returns:
+            dict: The JSON response from the API, or None if the request fails after retries.
+        """
+        try:
+            return await self._send_request(payload)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None  # Handle retry logic
+
+    @staticmethod
+    def _build_payload(prompt, tools=None, temperature=0.0, top_p=1.0, top_k=1, max_output_tokens=200,
+                       tool_config=None):
+        """
+        Builds the `generateContent` request body.
+        Private method.
+
+        Args:
+            prompt (str | list): A single-turn prompt, or a ready-made list of `contents` turns.
+            tool_config (dict, optional): A `toolConfig` object, e.g. to disable further function calls.
+        """
+        contents = [{"parts": [{"text": prompt}]}] if isinstance(prompt, str) else prompt
+        payload = {
+            "contents": contents,
+            "generationConfig": {
+                "temperature": temperature,
+                "topP": top_p,
+                "topK": top_k,
+                "maxOutputTokens": max_output_tokens
+            }
+        }
+
+        if tools:
+            payload["tools"] = tools
+        if tool_config:
+            payload["toolConfig"] = tool_config
+        return payload
+
+    @staticmethod
+    def _first_content(api_response):
+        """
+        Returns the `content` of the first candidate, or None if there is none.
+        Private method.
+        """
+        candidates = api_response.get("candidates")
+        if candidates:
+            content = candidates[0].get("content")
+            if content and content.get("parts"):
+                return content
+        return None
+
+    @staticmethod
+    def extract_function_calls(content):
+        """
+        Returns every `functionCall` in a model `content` turn, in the order the model emitted them.
+
+        Args:
+            content (dict): A content turn as returned by `generate_content`.
+
+        Returns:
+            list[dict]: The `functionCall` objects (each with `name` and `args`).
+        """
+        if not content:
+            return []
+        return [part["functionCall"] for part in content.get("parts", []) if part.get("functionCall")]
+
+    @staticmethod
+    def extract_text(content):
+        """
+        Returns the concatenated text of every text part in a model `content` turn.
+        """
+        if not content:
+            return ""
+        return "".join(part.get("text", "") for part in content.get("parts", []))
+
+    @classmethod
+    def _parse_response(cls, api_response):
+        """
+        Extracts the text or function call from a `generateContent` response.
+        Private method.
+
+        Returns:
+            str | dict: The text of all text parts joined together, the first function call part
+                        if the model asked for one, or None if the response has no usable content.
+                        Use `generate_content` to get every function call of a multi-call turn.
+        """
+        try:
+            # Extract text content, properly handling potentially empty results. Check for tool calls.
+            content = cls._first_content(api_response)
+            if content is None:
+                return None  # No candidate with content, parts, or text.  This should rarely happen, but guard.
+
+            #Check for tool calls and return that if that is what's in content['parts']
+            for part in content["parts"]:
+                if part.get('functionCall'):
+                    return part  #Return the full function call dict
+            return cls.extract_text(content)  # Or empty string if 'text' missing
+        except (KeyError, IndexError, TypeError, AttributeError) as e:
+            print(f"Error parsing API response: {e}")
+            print(f"API Response (for debugging): {api_response}")
+            return None
+
+    async def generate_content(self, contents, tools=None, temperature=0.0, top_p=1.0, top_k=1,
+                               max_output_tokens=200, tool_config=None):
+        """
+        Sends a multi-turn conversation and returns the model's full reply turn.
+
+        Unlike `call_gemini_api`, nothing is dropped: a turn may contain several text parts and
+        several `functionCall` parts, which can be pulled out with `extract_text` and
+        `extract_function_calls`.
+
+        Args:
+            contents (list): The conversation so far as Gemini `contents` turns.
+            tools, temperature, top_p, top_k, max_output_tokens: As for `call_gemini_api`.
+            tool_config (dict, optional): A `toolConfig` object for the request.
+
+        Returns:
+            dict: The reply as a content turn (`{"role": "model", "parts": [...]}`), or None on failure.
+        """
+        payload = self._build_payload(contents, tools, temperature, top_p, top_k, max_output_tokens, tool_config)
+        api_response = await self._make_api_request(payload)
+        if not api_response:
+            return None
+        content = self._first_content(api_response)
+        if content is None:
+            return None
+        return {"role": content.get("role", "model"), "parts": content["parts"]}
 
     async def call_gemini_api(self, prompt, tools=None, temperature=0.0, top_p=1.0, top_k=1, max_output_tokens=200): #tuned for flash. Added tuning parameters
 
@@ -81,41 +389,117 @@ class GeminiAPIWrapper:
                  `candidates[0].content.parts[0].text` if the API call is successful, and
                  `None` otherwise.   Also handles parsing tool calls, if present in the API response.
         """
-        payload = {
-            "contents": [{"parts": [{"text": prompt}]}],
-            "generationConfig": {
-                "temperature": temperature,
-                "topP": top_p,
-                "topK": top_k,
-                "maxOutputTokens": max_output_tokens
-            }
-        }
-
-        if tools:
-            payload["tools"] = tools
+        payload = self._build_payload(prompt, tools, temperature, top_p, top_k, max_output_tokens)
         api_response = await self._make_api_request(payload)
         if not api_response:
             return None  # Indicate failure clearly
+        return self._parse_response(api_response)
 
-        try:
-            # Extract text content, properly handling potentially empty results. Check for tool calls.
-            candidates = api_response.get("candidates")
+    async def call_gemini_api_many(self, prompts, tools=None, temperature=0.0, top_p=1.0, top_k=1,
+                                   max_output_tokens=200, concurrency=16, priority=10):
+        """
+        Calls the Gemini API for many prompts concurrently over the shared session.
+
+        At most `concurrency` requests are in flight at once; the rest wait on a semaphore, so
+        large offline batches do not open thousands of sockets or trip server-side limits.
+        A failure on one prompt never aborts the batch.
+
+        Args:
+            prompts (iterable of str): The prompts to send.
+            tools, temperature, top_p, top_k, max_output_tokens: As for `call_gemini_api`,
+                applied to every prompt.
+            concurrency (int, optional): Maximum number of requests in flight. Defaults to 16.
+            priority (int, optional): Rate-limiter priority for the batch. Defaults to 10, so that
+                                      interactive calls (priority 0) are admitted ahead of bulk work.
 
-            if candidates and len(candidates) > 0:
-                 first_candidate = candidates[0]
-                 content = first_candidate.get("content")
+        Returns:
+            list[dict]: One entry per prompt, in input order, with keys `prompt`, `result`
+                        (what `call_gemini_api` would have returned) and `error` (None on
+                        success, otherwise a description of what went wrong).
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        semaphore = asyncio.Semaphore(concurrency)
 
-                 if content and content.get("parts"):
-                     first_part = content["parts"][0]  # Assuming a single part
+        async def run_one(prompt):
+            payload = self._build_payload(prompt, tools, temperature, top_p, top_k, max_output_tokens)
+            async with semaphore:
+                try:
+                    api_response = await self._send_request(payload, priority=priority)
+                except Exception as e:
+                    return {"prompt": prompt, "result": None, "error": f"{type(e).__name__}: {e}"}
+            result = self._parse_response(api_response)
+            if result is None:
+                return {"prompt": prompt, "result": None, "error": "No usable content in API response"}
+            return {"prompt": prompt, "result": result, "error": None}
 
-                     #Check for tool calls and return that if that is what's in content['parts']
-                     if first_part.get('functionCall'):
-                         return first_part  #Return the full function call dict
-                     else:
-                         return first_part.get("text", "")  # Or empty string if 'text' missing
+        return await asyncio.gather(*(run_one(prompt) for prompt in prompts))
 
-            return None  # No candidate with content, parts, or text.  This should rarely happen, but guard.
-        except (KeyError, IndexError, TypeError) as e:
-            print(f"Error parsing API response: {e}")
-            print(f"API Response (for debugging): {api_response}")
-            return None
+    async def stream_gemini_api(self, prompt, tools=None, temperature=0.0, top_p=1.0, top_k=1, max_output_tokens=200,
+                                tool_config=None):
+        """
+        Streams a response from the Gemini API as it is generated, via `:streamGenerateContent?alt=sse`.
+
+        The SSE body is parsed incrementally, so the first text arrives as soon as the model emits
+        it rather than after the whole response.  Connection errors and transient statuses are
+        retried per `self.retry_policy`, but only before anything has been yielded; a failure
+        mid-stream is raised to the caller.  Streaming responses are never cached.
+
+        Args:
+            prompt (str | list): The prompt, or a list of `contents` turns.
+            tools, temperature, top_p, top_k, max_output_tokens: As for `call_gemini_api`.
+            tool_config (dict, optional): A `toolConfig` object for the request.
+
+        Yields:
+            str | dict: Text deltas as strings, and `functionCall` parts as the full part dict.
+        """
+        payload = self._build_payload(prompt, tools, temperature, top_p, top_k, max_output_tokens, tool_config)
+        session = self._get_session()
+        policy = self.retry_policy
+        policy.on_request()
+        estimated_tokens = self._estimate_payload_tokens(payload)
+        body = self._encode_payload(payload)
+        attempt = 0
+        while True:
+            status = None
+            retry_after = None
+            started = False
+            try:
+                async with self._rate_limited(estimated_tokens, self.priority) as call:
+                    async with session.post(self.stream_url, data=body, timeout=self.stream_timeout) as response:
+                        if response.status >= 400:
+                            status = response.status
+                            retry_after = response.headers.get("Retry-After")
+                        response.raise_for_status()
+                        async for event in iter_sse_events(response.content):
+                            chunk = json.loads(event["data"])
+                            usage = chunk.get("usageMetadata")
+                            if usage:
+                                call.actual_tokens = usage.get("totalTokenCount")
+                            for part in self._iter_parts(chunk):
+                                started = True
+                                if part.get("functionCall"):
+                                    yield part
+                                elif part.get("text"):
+                                    yield part["text"]
+                return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = None if started else policy.next_delay(attempt, status=status, retry_after=retry_after, idempotent=True)
+                if delay is None:
+                    print(f"Streaming API request failed (attempt {attempt + 1}/{policy.max_attempts}), not retrying: {e!r}")
+                    raise
+                print(f"Streaming API request failed (attempt {attempt + 1}/{policy.max_attempts}), retrying in {delay:.2f}s: {e!r}")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _iter_parts(api_response):
+        """
+        Yields the content parts of the first candidate of a (possibly partial) response.
+        Private method.
+        """
+        candidates = api_response.get("candidates") or []
+        if candidates:
+            content = candidates[0].get("content") or {}
+            for part in content.get("parts") or []:
+                yield part
@@ -0,0 +1,263 @@
+import threading
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline, TextIteratorStreamer, StoppingCriteria, StoppingCriteriaList
+
+from answer_parser import ANSWER_CLOSE
+
+DEFAULT_MODEL_NAME = "HarleyCooper/GRPOtuned"
+
+# Loaded models, keyed by (model_name, device). Loading takes seconds to minutes, so every caller
+# in the process shares one warm copy.
+_models = {}
+_pipelines = {}
+_load_lock = threading.Lock()
+
+
+def load_model(model_name=DEFAULT_MODEL_NAME, device="cpu"):
+    """
+    Returns `(tokenizer, model)` for `model_name`, loading them on first use only.
+
+    The model is loaded in float32 and put in eval mode, which is what CPU inference needs; pass a
+    CUDA device to use a GPU when there is one.
+
+    Parameters:
+      model_name (str): Hugging Face model id. Default is "HarleyCooper/GRPOtuned".
+      device (str): Torch device to load the model on. Default is "cpu".
+
+    Returns:
+      tuple: The tokenizer and the model.
+    """
+    key = (model_name, device)
+    if key not in _models:
+        with _load_lock:
+            if key not in _models:
+                tokenizer = AutoTokenizer.from_pretrained(model_name)
+                # Batched generation needs left padding so every prompt ends where generation starts.
+                tokenizer.padding_side = "left"
+                if tokenizer.pad_token is None:
+                    tokenizer.pad_token = tokenizer.eos_token
+                model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float32)
+                model.to(device)
+                model.eval()
+                _models[key] = (tokenizer, model)
+    return _models[key]
+
+
+def load_pipeline(model_name=DEFAULT_MODEL_NAME, device="cpu"):
+    """
+    Returns a cached "text-generation" pipeline for `model_name`, built on first use around the
+    tokenizer and model from `load_model`, so the pipeline and direct generation share one copy of
+    the weights.
+    """
+    key = (model_name, device)
+    if key not in _pipelines:
+        tokenizer, model = load_model(model_name, device)
+        with _load_lock:
+            if key not in _pipelines:
+                _pipelines[key] = pipeline("text-generation", model=model, tokenizer=tokenizer)
+    return _pipelines[key]
+
+
+def build_chat_prompt(tokenizer, messages):
+    """
+    Renders OpenAI-style chat `messages` into a prompt string, using the tokenizer's chat template
+    when it has one and plain "role: content" lines otherwise.
+    """
+    if getattr(tokenizer, "chat_template", None):
+        return tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    lines = [f"{message['role']}: {message['content']}" for message in messages]
+    return "\n".join(lines + ["assistant:"])
+
+
+def _generation_kwargs(tokenizer, max_new_tokens, temperature):
+    """Sampling when `temperature` > 0, greedy decoding otherwise."""
+    generation_kwargs = {"max_new_tokens": max_new_tokens, "pad_token_id": tokenizer.pad_token_id}
+    if temperature and temperature > 0:
+        generation_kwargs.update(do_sample=True, temperature=temperature)
+    else:
+        generation_kwargs.update(do_sample=False)
+    return generation_kwargs
+
+
+class AnswerStoppingCriteria(StoppingCriteria):
+    """
+    Stops each sequence of a batch as soon as the closing answer tag has been generated.
+
+    Only the last `window` generated tokens of each row are decoded per step, so the check costs
+    the same at token 10,000 as at token 10. Rows that already stopped stay stopped while the rest
+    of the batch keeps generating.
+    """
+
+    def __init__(self, tokenizer, prompt_length, window=8):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.window = window
+        self.done = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        tails = self.tokenizer.batch_decode(input_ids[:, self.prompt_length:][:, -self.window:], skip_special_tokens=True)
+        found = torch.tensor([ANSWER_CLOSE in tail for tail in tails], dtype=torch.bool, device=input_ids.device)
+        self.done = found if self.done is None else self.done | found
+        return self.done
+
+
+def _trim_after_answer(text):
+    """Cuts off anything the model generated after the closing answer tag (within the same token)."""
+    position = text.find(ANSWER_CLOSE)
+    return text if position == -1 else text[:position + len(ANSWER_CLOSE)]
+
+
+def generate_completion(prompt, max_new_tokens=512, temperature=0.0, model_name=DEFAULT_MODEL_NAME, device="cpu", stop_at_answer=False):
+    """
+    Generates a completion for `prompt` with the cached model.
+
+    Returns:
+      dict: `text` (the completion only, without the prompt), `prompt_tokens`,
+            `completion_tokens` and `finish_reason` ("stop" or "length").
+    """
+    return generate_batch([prompt], max_new_tokens, temperature, model_name, device, stop_at_answer)[0]
+
+
+def generate_batch(prompts, max_new_tokens=512, temperature=0.0, model_name=DEFAULT_MODEL_NAME, device="cpu", stop_at_answer=False):
+    """
+    Generates completions for several prompts with one batched `model.generate` call.
+
+    Prompts are left-padded to a common length, so all completions start at the same position and
+    can be sliced off the output in one step. Finished sequences are padded until the longest one
+    is done; those pad tokens are not counted or decoded. With `stop_at_answer`, each sequence
+    finishes right after its closing answer tag instead of running on to `max_new_tokens`.
+
+    Returns:
+      list[dict]: One dict per prompt, in order, as described in `generate_completion`.
+    """
+    tokenizer, model = load_model(model_name, device)
+    inputs = tokenizer(list(prompts), return_tensors="pt", padding=True).to(device)
+    input_length = inputs["input_ids"].shape[1]
+    generation_kwargs = _generation_kwargs(tokenizer, max_new_tokens, temperature)
+    if stop_at_answer:
+        generation_kwargs["stopping_criteria"] = StoppingCriteriaList([AnswerStoppingCriteria(tokenizer, input_length)])
+    with torch.inference_mode():
+        outputs = model.generate(**inputs, **generation_kwargs)
+    prompt_lengths = inputs["attention_mask"].sum(dim=1).tolist()
+    results = []
+    for row, prompt_tokens in zip(outputs, prompt_lengths):
+        new_tokens = row[input_length:]
+        completion_tokens = int((new_tokens != tokenizer.pad_token_id).sum())
+        text = tokenizer.decode(new_tokens, skip_special_tokens=True)
+        answered = stop_at_answer and ANSWER_CLOSE in text
+        results.append({
+            "text": _trim_after_answer(text) if answered else text,
+            "prompt_tokens": int(prompt_tokens),
+            "completion_tokens": completion_tokens,
+            "finish_reason": "length" if completion_tokens >= max_new_tokens and not answered else "stop",
+        })
+    return results
+
+
+class _StreamControl(StoppingCriteria):
+    """
+    Lets the consumer of a `CompletionStream` stop generation from another thread, and counts the
+    tokens generated so far.
+    """
+
+    def __init__(self, prompt_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = 0
+        self.stop_requested = threading.Event()
+
+    def __call__(self, input_ids, scores, **kwargs):
+        self.completion_tokens = input_ids.shape[1] - self.prompt_tokens
+        return self.stop_requested.is_set()
+
+
+class CompletionStream:
+    """
+    Iterates over a completion as decoded text chunks while the model is still generating it.
+
+    `model.generate` runs on a background thread and feeds a `TextIteratorStreamer`. With
+    `stop_at_answer`, iteration ends right after the closing answer tag and generation is stopped
+    at the next token instead of running on to `max_new_tokens`. Closing the stream early (for
+    example when an HTTP client disconnects) stops generation the same way. After iteration,
+    `prompt_tokens`, `completion_tokens` and `finish_reason` describe the completion.
+    """
+
+    def __init__(self, prompt, max_new_tokens=512, temperature=0.0, model_name=DEFAULT_MODEL_NAME, device="cpu", stop_at_answer=True):
+        tokenizer, model = load_model(model_name, device)
+        inputs = tokenizer(prompt, return_tensors="pt").to(device)
+        self.prompt_tokens = int(inputs["input_ids"].shape[1])
+        self.max_new_tokens = max_new_tokens
+        self.stop_at_answer = stop_at_answer
+        self.finish_reason = None
+        self._control = _StreamControl(self.prompt_tokens)
+        self._streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self._error = None
+        stopping_criteria = [self._control]
+        if stop_at_answer:
+            # Stops on the very token that closes the answer, without waiting for the consumer.
+            stopping_criteria.append(AnswerStoppingCriteria(tokenizer, self.prompt_tokens))
+        generation_kwargs = dict(
+            inputs,
+            streamer=self._streamer,
+            stopping_criteria=StoppingCriteriaList(stopping_criteria),
+            **_generation_kwargs(tokenizer, max_new_tokens, temperature),
+        )
+        self._worker = threading.Thread(target=self._generate, args=(model, generation_kwargs), daemon=True)
+        self._worker.start()
+
+    def _generate(self, model, generation_kwargs):
+        try:
+            with torch.inference_mode():
+                model.generate(**generation_kwargs)
+        except Exception as e:
+            self._error = e
+            # Unblock the consumer, which would otherwise wait forever for the next chunk.
+            self._streamer.end()
+
+    @property
+    def completion_tokens(self):
+        return self._control.completion_tokens
+
+    def __iter__(self):
+        tag = ANSWER_CLOSE
+        tail = ""
+        try:
+            for chunk in self._streamer:
+                if self.stop_at_answer:
+                    # The tag can be split across chunks, so search the end of the previous chunk too.
+                    window = tail + chunk
+                    position = window.find(tag)
+                    if position != -1:
+                        yield chunk[:position + len(tag) - len(tail)]
+                        self.finish_reason = "stop"
+                        return
+                    tail = window[-(len(tag) - 1):]
+                if chunk:
+                    yield chunk
+            if self._error is not None:
+                raise self._error
+            self.finish_reason = "length" if self.completion_tokens >= self.max_new_tokens else "stop"
+        finally:
+            self.close()
+
+    def close(self):
+        """Stops generation (if still running) and waits for the generation thread to exit."""
+        self._control.stop_requested.set()
+        self._worker.join()
+
+
+def stream_completion(prompt, max_new_tokens=512, temperature=0.0, model_name=DEFAULT_MODEL_NAME, device="cpu", stop_at_answer=True):
+    """
+    Starts generating a completion for `prompt` and returns a `CompletionStream` over its text.
+
+    Parameters:
+      prompt (str): The prompt to complete.
+      max_new_tokens (int): Maximum number of tokens to generate. Default is 512.
+      temperature (float): Sampling temperature; 0 means greedy decoding. Default is 0.0.
+      model_name (str): Hugging Face model id. Default is "HarleyCooper/GRPOtuned".
+      device (str): Torch device. Default is "cpu".
+      stop_at_answer (bool): End the stream after the closing answer tag. Default is True.
+
+    Returns:
+      CompletionStream: Iterable of decoded text chunks (the completion only, without the prompt).
+    """
+    return CompletionStream(prompt, max_new_tokens, temperature, model_name, device, stop_at_answer)
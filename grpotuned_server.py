@@ -0,0 +1,185 @@
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import torch
+from aiohttp import web
+from grpotuned_model import DEFAULT_MODEL_NAME, load_model, build_chat_prompt, generate_completion, generate_batch, stream_completion
+from micro_batcher import MicroBatcher
+
+
+def create_app(model_name=DEFAULT_MODEL_NAME, device="cpu", default_max_tokens=512, max_batch_size=8, max_wait_ms=20, max_streams=4):
+    """
+    Builds the aiohttp application serving the OpenAI-style `/v1/chat/completions` endpoint that
+    `vllm_inference.py` targets, so the same client works against vLLM on a GPU box or against
+    this server on a CPU-only machine. The model is loaded (and warmed up with a one-token
+    generation) during application start-up, before the first request is accepted, and stays
+    resident for the life of the process.
+
+    Concurrent requests with the same sampling parameters are micro-batched into a single
+    `model.generate` call; `/metrics` reports batch sizes, queue waits and throughput. Requests
+    with `"stream": true` are not batched: their tokens are sent as OpenAI-style server-sent
+    events as soon as they are decoded, each on its own generation thread, so at most `max_streams`
+    run at once and further streaming requests get a 503 until one finishes. Either way, generation stops after the closing answer tag
+    unless the request sets `"stop_at_answer": false`.
+
+    Parameters:
+      model_name (str): Hugging Face model id to serve.
+      device (str): Torch device, "cpu" by default.
+      default_max_tokens (int): `max_tokens` used when a request does not specify one.
+      max_batch_size (int): Most requests generated together. 1 disables batching.
+      max_wait_ms (float): Longest a request waits for its batch to fill.
+      max_streams (int): Most streaming requests generated at once.
+    """
+    # Generation runs on the batcher's single worker thread: torch already parallelizes each
+    # forward pass across cores, and it keeps the event loop free to accept and queue requests.
+    batcher = MicroBatcher(
+        lambda prompts, max_new_tokens, temperature, stop_at_answer: generate_batch(
+            prompts, max_new_tokens, temperature, model_name, device, stop_at_answer
+        ),
+        max_batch_size=max_batch_size,
+        max_wait_ms=max_wait_ms,
+    )
+    app = web.Application()
+    app["model_name"] = model_name
+    app["batcher"] = batcher
+    stream_slots = asyncio.Semaphore(max_streams)
+
+    async def load_on_startup(app):
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=1) as loader:
+            await loop.run_in_executor(loader, load_model, model_name, device)
+            await loop.run_in_executor(loader, generate_completion, "Hello", 1, 0.0, model_name, device)
+
+    async def shutdown_batcher(app):
+        await batcher.aclose()
+
+    def bad_request(message):
+        return web.json_response({"error": {"message": message}}, status=400)
+
+    async def chat_completions(request):
+        try:
+            body = await request.json()
+            messages = body["messages"]
+            if not isinstance(messages, list):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            return bad_request("Request body must be a JSON object with a 'messages' list.")
+        try:
+            max_tokens = int(body.get("max_tokens") or default_max_tokens)
+            temperature = float(body.get("temperature", 0.0) or 0.0)
+        except (ValueError, TypeError):
+            return bad_request("'max_tokens' must be an integer and 'temperature' a number.")
+
+        tokenizer, _ = load_model(model_name, device)
+        prompt = build_chat_prompt(tokenizer, messages)
+        stop_at_answer = bool(body.get("stop_at_answer", True))
+        if body.get("stream"):
+            # Streams bypass the batcher, so cap them here rather than queueing generation threads.
+            if stream_slots.locked():
+                return web.json_response(
+                    {"error": {"message": f"Too many concurrent streams (at most {max_streams}); retry later."}},
+                    status=503,
+                    headers={"Retry-After": "1"},
+                )
+            async with stream_slots:
+                return await stream_chat_completion(request, body, prompt, max_tokens, temperature, stop_at_answer)
+        completion = await batcher.submit(
+            prompt, max_new_tokens=max_tokens, temperature=temperature, stop_at_answer=stop_at_answer
+        )
+        return web.json_response({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", model_name),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": completion["text"]},
+                "finish_reason": completion["finish_reason"],
+            }],
+            "usage": {
+                "prompt_tokens": completion["prompt_tokens"],
+                "completion_tokens": completion["completion_tokens"],
+                "total_tokens": completion["prompt_tokens"] + completion["completion_tokens"],
+            },
+        })
+
+    async def stream_chat_completion(request, body, prompt, max_tokens, temperature, stop_at_answer):
+        loop = asyncio.get_running_loop()
+        stream = await loop.run_in_executor(
+            None, functools.partial(stream_completion, prompt, max_tokens, temperature, model_name, device, stop_at_answer)
+        )
+        chunks = iter(stream)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        def event(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model", model_name),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        try:
+            await response.prepare(request)
+            await response.write(event({"role": "assistant"}))
+            while True:
+                # Each chunk is waited for off the event loop, so other requests keep being served.
+                text = await loop.run_in_executor(None, next, chunks, None)
+                if text is None:
+                    break
+                await response.write(event({"content": text}))
+            await response.write(event({}, stream.finish_reason))
+            await response.write(b"data: [DONE]\n\n")
+        finally:
+            # Stops generation if the client went away before the end of the stream. The chunk
+            # generator itself is not closed here: it may still be running on an executor thread.
+            await loop.run_in_executor(None, stream.close)
+        return response
+
+    async def list_models(request):
+        return web.json_response({"object": "list", "data": [{"id": model_name, "object": "model", "owned_by": "local"}]})
+
+    async def health(request):
+        return web.json_response({"status": "ok", "model": model_name})
+
+    async def metrics(request):
+        return web.json_response(batcher.metrics.snapshot())
+
+    app.on_startup.append(load_on_startup)
+    app.on_cleanup.append(shutdown_batcher)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_get("/v1/models", list_models)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the GRPOtuned model over an OpenAI-compatible HTTP API.")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix", help="Listen on this Unix socket path instead of TCP.")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--threads", type=int, help="Torch intra-op threads (defaults to all cores).")
+    parser.add_argument("--max-tokens", type=int, default=512, help="Default max_tokens per request.")
+    parser.add_argument("--max-batch-size", type=int, default=8, help="Most requests generated together (1 disables batching).")
+    parser.add_argument("--max-wait-ms", type=float, default=20, help="Longest a request waits for its batch to fill.")
+    parser.add_argument("--max-streams", type=int, default=4, help="Most streaming requests generated at once; more get a 503.")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    app = create_app(args.model, args.device, args.max_tokens, args.max_batch_size, args.max_wait_ms, args.max_streams)
+    if args.unix:
+        web.run_app(app, path=args.unix)
+    else:
+        web.run_app(app, host=args.host, port=args.port)
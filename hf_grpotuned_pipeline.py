@@ -1,43 +1,51 @@
 import sys
-import json
-from transformers import pipeline
+from transformers import StoppingCriteriaList
+from grpotuned_model import load_pipeline, AnswerStoppingCriteria
+from answer_parser import result_record
+from log_sink import get_sink
 
-def generate_math_solution(prompt, max_new_tokens=12000, temperature=1.2):
+def generate_math_solution(prompt, max_new_tokens=12000, temperature=1.2, stop_at_answer=True):
     """
     Uses a high-level transformers pipeline to generate a math problem solution using the GRPOtuned model.
     
     The GRPOtuned model is expected to output reasoning steps and a final answer in an XML format.
+    The pipeline is built once per process and reused by later calls.
     
     Parameters:
       prompt (str): The input text prompt containing the math problem.
       max_new_tokens (int): Maximum number of tokens to generate. Default is 6000.
       temperature (float): Temperature for generation. Default is 1.2.
+      stop_at_answer (bool): Stop generating right after the closing answer tag. Default is True.
       
     Returns:
       str: The generated output.
     """
-    # Create a text generation pipeline for the GRPOtuned model
-    text_gen_pipe = pipeline("text-generation", model="HarleyCooper/GRPOtuned")
+    # Get the text generation pipeline for the GRPOtuned model (built on first use)
+    text_gen_pipe = load_pipeline("HarleyCooper/GRPOtuned")
+    generation_kwargs = {}
+    if stop_at_answer:
+        # Without this the model runs on to max_new_tokens after it has answered.
+        prompt_length = len(text_gen_pipe.tokenizer(prompt)["input_ids"])
+        generation_kwargs["stopping_criteria"] = StoppingCriteriaList([AnswerStoppingCriteria(text_gen_pipe.tokenizer, prompt_length)])
     # Generate output from the prompt
-    output = text_gen_pipe(prompt, max_new_tokens=max_new_tokens, temperature=temperature)
+    output = text_gen_pipe(prompt, max_new_tokens=max_new_tokens, temperature=temperature, **generation_kwargs)
     # Assuming the output is a list of dicts with the key 'generated_text'
     return output[0]['generated_text']
 
 def save_result_to_jsonl(prompt, generated_output, filename="math_results.jsonl"):
     """
-    Saves the prompt and the generated output to a JSONL file.
+    Saves the prompt with the reasoning and answer parsed from the generated output to a JSONL file.
+    The prompt echoed at the start of the output is not stored a second time. The record is written
+    by the shared background log sink for `filename`, which is flushed at exit.
     
     Parameters:
       prompt (str): The math problem prompt.
       generated_output (str): The full generated output from the model.
       filename (str): The file path to save the JSONL entries. Default is "math_results.jsonl".
     """
-    result = {
-        "prompt": prompt,
-        "generated_output": generated_output
-    }
-    with open(filename, "a", encoding="utf-8") as f:
-        f.write(json.dumps(result) + "\n")
+    completion = generated_output[len(prompt):] if generated_output.startswith(prompt) else generated_output
+    result = result_record(prompt, completion)
+    get_sink(filename).write(result)
 
 if __name__ == "__main__":
     if len(sys.argv) > 1:
@@ -0,0 +1,189 @@
+import codecs
+from html.parser import HTMLParser
+from http_fetch import charset_from_content_type
+
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:  # lxml is optional; the stdlib parser is used without it.
+    _lxml_etree = None
+
+# Subtrees whose text is never wanted: code, styling, navigation and embedded documents.
+SKIPPED_TAGS = frozenset({"script", "style", "nav", "noscript", "template", "svg", "iframe"})
+
+DEFAULT_BACKEND = "lxml" if _lxml_etree is not None else "html.parser"
+
+# Decoded text is fed to the parser in slices of this size, so a large chunk stops being parsed
+# shortly after the character budget is reached.
+_SLICE = 16 * 1024
+
+
+class _TextCollector:
+    """
+    Parser callbacks shared by both backends: collects whitespace-normalized text outside
+    skipped subtrees until `max_chars` characters have been collected.
+    """
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.parts = []
+        self.chars = 0
+        self._pending = []
+        self._skip_depth = 0
+
+    @property
+    def done(self):
+        # `chars` counts a separator after every piece; the joined text is one shorter.
+        return self.max_chars is not None and self.chars > self.max_chars
+
+    def start(self, tag):
+        self.flush()
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def end(self, tag):
+        self.flush()
+        if tag in SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def data(self, text):
+        if not self._skip_depth and not self.done:
+            self._pending.append(text)
+
+    def flush(self):
+        """Turns the text seen since the last tag into one normalized piece."""
+        if self._pending:
+            piece = " ".join("".join(self._pending).split())
+            self._pending = []
+            if piece:
+                self.parts.append(piece)
+                self.chars += len(piece) + 1
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.collector.start(tag)
+        self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+class _LxmlTarget:
+    """lxml parser target forwarding events to a `_TextCollector`."""
+
+    def __init__(self, collector):
+        self.collector = collector
+
+    def start(self, tag, attrib):
+        self.collector.start(tag)
+
+    def end(self, tag):
+        self.collector.end(tag)
+
+    def data(self, data):
+        self.collector.data(data)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return None
+
+
+class HtmlTextExtractor:
+    """
+    Extracts readable text from HTML fed to it incrementally, e.g. chunk by chunk from the network.
+
+    Text inside script/style/nav (and similar) subtrees is skipped and whitespace is collapsed.
+    Once `max_chars` characters have been collected, `feed` returns True and further input is
+    ignored, so the rest of a large page is neither parsed nor (when used as a fetch `on_chunk`
+    callback) downloaded. Uses lxml's C parser when it is installed and the stdlib `html.parser`
+    otherwise; both are incremental.
+    """
+
+    def __init__(self, max_chars=20_000, backend=None):
+        """
+        Args:
+            max_chars (int, optional): Character budget for the extracted text; None for no limit. Defaults to 20,000.
+            backend (str, optional): "lxml" or "html.parser". Defaults to lxml when available.
+        """
+        self.backend = backend or DEFAULT_BACKEND
+        self._collector = _TextCollector(max_chars)
+        if self.backend == "lxml":
+            if _lxml_etree is None:
+                raise ImportError("The lxml backend needs lxml: pip install lxml")
+            self._parser = _lxml_etree.HTMLParser(target=_LxmlTarget(self._collector), remove_comments=True)
+        elif self.backend == "html.parser":
+            self._parser = _StdlibParser(self._collector)
+        else:
+            raise ValueError(f"Unknown HTML parser backend: {self.backend}")
+        self._decoder = None
+        self._closed = False
+
+    @property
+    def done(self):
+        return self._collector.done
+
+    def feed(self, data, charset=None):
+        """
+        Parses the next piece of the document.
+
+        Args:
+            data (str | bytes): Text, or raw bytes decoded incrementally with `charset`.
+            charset (str, optional): Encoding of byte input. Defaults to UTF-8.
+
+        Returns:
+            bool: True once the character budget has been reached.
+        """
+        if self.done or self._closed:
+            return self.done
+        if isinstance(data, bytes):
+            if self._decoder is None:
+                try:
+                    self._decoder = codecs.getincrementaldecoder(charset or "utf-8")(errors="replace")
+                except LookupError:
+                    self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            data = self._decoder.decode(data)
+        for start in range(0, len(data), _SLICE):
+            self._parser.feed(data[start:start + _SLICE])
+            if self.done:
+                break
+        return self.done
+
+    def feed_chunk(self, chunk, headers):
+        """`Fetcher.fetch` `on_chunk` callback: feeds a body chunk using the response's charset."""
+        return self.feed(chunk, charset_from_content_type(headers.get("Content-Type")))
+
+    def close(self):
+        """Finishes parsing and returns the extracted text, at most `max_chars` characters long."""
+        if not self._closed:
+            self._closed = True
+            if not self.done:
+                try:
+                    if self._decoder is not None:
+                        self._parser.feed(self._decoder.decode(b"", final=True))
+                    self._parser.close()
+                except Exception:
+                    # lxml complains about documents cut off part way (or empty); keep what was parsed.
+                    pass
+            self._collector.flush()
+        text = " ".join(self._collector.parts)
+        max_chars = self._collector.max_chars
+        return text if max_chars is None else text[:max_chars]
+
+
+def extract_text(html, max_chars=20_000, backend=None):
+    """Returns the readable text of a complete HTML document (str or bytes); see `HtmlTextExtractor`."""
+    extractor = HtmlTextExtractor(max_chars, backend)
+    extractor.feed(html)
+    return extractor.close()
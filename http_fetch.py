@@ -0,0 +1,360 @@
+import json
+import time
+import sqlite3
+import asyncio
+import functools
+import threading
+from email.utils import parsedate_to_datetime
+import aiohttp
+from multidict import CIMultiDict
+from yarl import URL
+from http_session import discard_session, close_session
+
+# Response headers kept with a cached body.
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Expires", "Date")
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def charset_from_content_type(value, default="utf-8"):
+    """Returns the `charset` parameter of a Content-Type header value, or `default`."""
+    for part in (value or "").split(";")[1:]:
+        name, _, charset = part.strip().partition("=")
+        if name.lower() == "charset" and charset:
+            return charset.strip('"')
+    return default
+
+
+def parse_cache_control(value):
+    """Parses a Cache-Control header into a dict of lower-cased directives (valueless ones map to True)."""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else True
+    return directives
+
+
+def freshness_lifetime(headers, default_ttl=0):
+    """
+    Returns how many seconds a response may be served from cache without revalidation, or None
+    if it must not be stored at all.
+
+    `Cache-Control` (no-store, no-cache, max-age) wins over `Expires`; `default_ttl` applies only
+    when the server gave neither.
+    """
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if "no-store" in directives or headers.get("Vary", "").strip() == "*":
+        return None
+    if "no-cache" in directives:
+        return 0
+    if "max-age" in directives:
+        try:
+            return max(0, int(directives["max-age"]))
+        except ValueError:
+            return 0
+    if headers.get("Expires"):
+        try:
+            expires = parsedate_to_datetime(headers["Expires"]).timestamp()
+            date = parsedate_to_datetime(headers["Date"]).timestamp() if headers.get("Date") else time.time()
+        except (TypeError, ValueError):
+            return 0  # An invalid Expires means "already expired".
+        return max(0, expires - date)
+    return default_ttl
+
+
+class HttpCache:
+    """
+    A size-bounded on-disk HTTP cache (sqlite), keyed by URL.
+
+    Entries keep the body, the validators (ETag, Last-Modified) and an expiry computed from the
+    response's caching headers. Stale entries are kept so they can be revalidated with a
+    conditional request. An entry can be `partial`, holding only the beginning of a body whose
+    reader stopped early. When the stored bodies exceed `max_bytes`, least-recently-used entries
+    are evicted. Thread-safe.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        """
+        Args:
+            path (str): sqlite file to store entries in.
+            max_bytes (int, optional): Most body bytes kept on disk. Defaults to 256 MB.
+        """
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS http_cache ("
+            "url TEXT PRIMARY KEY, status INTEGER NOT NULL, headers TEXT NOT NULL, body BLOB NOT NULL, "
+            "size INTEGER NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+            "partial INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(http_cache)")}
+        if "partial" not in columns:
+            self._db.execute("ALTER TABLE http_cache ADD COLUMN partial INTEGER NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS http_cache_accessed ON http_cache (accessed_at)")
+        self._db.commit()
+        (total,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()
+        self._total_bytes = total
+
+    def get(self, url):
+        """
+        Returns the entry for `url` as a dict (`status`, `headers`, `body`, `expires_at`,
+        `partial`), or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, body, expires_at, partial FROM http_cache WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE http_cache SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+        return {"status": row[0], "headers": CIMultiDict(json.loads(row[1])), "body": row[2], "expires_at": row[3],
+                "partial": bool(row[4])}
+
+    def store(self, url, status, headers, body, ttl, partial=False):
+        """
+        Stores a response that stays fresh for `ttl` seconds; `partial` marks `body` as only the
+        beginning of the response. Bodies larger than the cache are skipped.
+        """
+        if len(body) > self.max_bytes:
+            return
+        now = time.time()
+        kept = {name: headers[name] for name in _STORED_HEADERS if name in headers}
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM http_cache WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO http_cache (url, status, headers, body, size, expires_at, accessed_at, partial) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, status, json.dumps(kept), body, len(body), now + ttl, now, int(partial)),
+            )
+            self._total_bytes += len(body) - (previous[0] if previous else 0)
+            self._evict()
+            self._db.commit()
+
+    def refresh(self, url, headers, ttl):
+        """Extends the life of an entry after a 304 Not Modified, taking the validators it sent."""
+        with self._lock:
+            row = self._db.execute("SELECT headers FROM http_cache WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return
+            kept = json.loads(row[0])
+            kept.update({name: headers[name] for name in _STORED_HEADERS if name in headers})
+            now = time.time()
+            self._db.execute(
+                "UPDATE http_cache SET headers = ?, expires_at = ?, accessed_at = ? WHERE url = ?",
+                (json.dumps(kept), now + ttl, now, url),
+            )
+            self._db.commit()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            row = self._db.execute("SELECT url, size FROM http_cache ORDER BY accessed_at LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM http_cache WHERE url = ?", (row[0],))
+            self._total_bytes -= row[1]
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class FetchResult:
+    """A fetched (or cached) response. `headers` is case-insensitive."""
+
+    def __init__(self, url, status, headers, body, from_cache=False, revalidated=False, truncated=False):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.from_cache = from_cache
+        self.revalidated = revalidated
+        self.truncated = truncated
+
+    @property
+    def charset(self):
+        return charset_from_content_type(self.headers.get("Content-Type"))
+
+    def text(self):
+        try:
+            return self.body.decode(self.charset, errors="replace")
+        except LookupError:
+            return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class Fetcher:
+    """
+    Shared async HTTP GET layer for the web tools.
+
+    One pooled aiohttp session (created lazily, per event loop) with a total connection cap and a
+    per-host cap, so one slow site cannot take every connection. Every request has connect, read
+    and total timeouts. With a `cache`, fresh responses are served without a request, and stale
+    ones are revalidated with `If-None-Match` / `If-Modified-Since`, so an unchanged page costs a
+    304 instead of a full download.
+    """
+
+    def __init__(self, cache=None, connection_limit=64, connection_limit_per_host=4, timeout=None,
+                 user_agent="Gemini2Flash-tools/1.0"):
+        """
+        Args:
+            cache (HttpCache, optional): Response cache. Disabled when None.
+            connection_limit (int, optional): Total pooled connections. Defaults to 64.
+            connection_limit_per_host (int, optional): Concurrent connections per host. Defaults to 4.
+            timeout (aiohttp.ClientTimeout, optional): Defaults to 15s total, 5s connect, 10s between reads.
+            user_agent (str, optional): User-Agent header sent with every request.
+        """
+        self.cache = cache
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.timeout = timeout or aiohttp.ClientTimeout(total=15, sock_connect=5, sock_read=10)
+        self.user_agent = user_agent
+        self._session = None
+        self._session_loop = None
+
+    def _get_session(self):
+        """
+        Returns the pooled session, creating it on first use (or on a new event loop, in which
+        case the old one is closed rather than leaked).
+        Private method.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            discard_session(self._session, self._session_loop)
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, limit_per_host=self.connection_limit_per_host)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout, headers={"User-Agent": self.user_agent}
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def aclose(self):
+        await close_session(self._session, self._session_loop)
+        self._session = None
+        self._session_loop = None
+
+    async def fetch(self, url, params=None, headers=None, max_bytes=None, default_ttl=0, on_chunk=None):
+        """
+        GETs `url`, going through the cache when there is one.
+
+        Args:
+            url (str): The URL to fetch.
+            params (dict, optional): Query parameters added to the URL.
+            headers (dict, optional): Extra request headers.
+            max_bytes (int, optional): Stop reading the body after this many bytes. Truncated
+                                       responses are marked `truncated` and never cached.
+            default_ttl (float, optional): Freshness for responses without Cache-Control/Expires.
+                                           Defaults to 0 (revalidate every time).
+            on_chunk (callable, optional): Called as `on_chunk(chunk, headers)` with each piece of the
+                                           body as it is read (cached bodies are passed in slices).
+                                           Returning True stops reading; the result is then marked
+                                           `truncated`, and the part read so far is cached as a
+                                           partial entry. A later fetch replays that part and only
+                                           reads the rest from the network if `on_chunk` wants more.
+
+        Returns:
+            FetchResult: The response. HTTP error statuses are returned, not raised.
+
+        Raises:
+            aiohttp.ClientError, asyncio.TimeoutError: On connection failures and timeouts.
+        """
+        if params:
+            url = str(URL(url).update_query(params))
+        # The cache is sqlite; its reads and writes of whole bodies run off the event loop.
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(None, self.cache.get, url) if self.cache is not None else None
+        skip = 0
+        if entry is not None and entry["partial"]:
+            # Only the beginning of the body is cached. If it is fresh and enough for `on_chunk`,
+            # serve it; otherwise read the body from the network, passing `on_chunk` only the
+            # bytes it has not already seen.
+            if entry["expires_at"] > time.time() and on_chunk is not None:
+                if self._replay(entry, on_chunk):
+                    return FetchResult(url, entry["status"], entry["headers"], entry["body"], from_cache=True, truncated=True)
+                skip = len(entry["body"])
+            entry = None  # A 304 for a partial entry would not give us the rest of the body.
+        elif entry is not None and entry["expires_at"] > time.time():
+            return self._cached_result(url, entry, on_chunk)
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry["headers"].get("ETag"):
+                request_headers["If-None-Match"] = entry["headers"]["ETag"]
+            if entry["headers"].get("Last-Modified"):
+                request_headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+
+        async with self._get_session().get(url, headers=request_headers) as response:
+            if response.status == 304 and entry is not None:
+                ttl = freshness_lifetime(response.headers, default_ttl)
+                await loop.run_in_executor(None, self.cache.refresh, url, response.headers, ttl or 0)
+                return self._cached_result(url, entry, on_chunk, revalidated=True)
+            response_headers = CIMultiDict(response.headers)
+            body, truncated, stopped = await self._read_body(response, response_headers, max_bytes, on_chunk, skip)
+
+        result = FetchResult(url, response.status, response_headers, body, truncated=truncated or stopped)
+        if self.cache is not None and response.status == 200 and not truncated:
+            ttl = freshness_lifetime(response.headers, default_ttl)
+            has_validators = "ETag" in response.headers or "Last-Modified" in response.headers
+            if ttl is not None and (ttl > 0 or has_validators):
+                await loop.run_in_executor(
+                    None, functools.partial(self.cache.store, url, response.status, response_headers, body, ttl, partial=stopped)
+                )
+        return result
+
+    @staticmethod
+    def _cached_result(url, entry, on_chunk, revalidated=False):
+        """
+        Builds the result for a cache hit, passing the body to `on_chunk` like a network read would.
+        Private method.
+        """
+        if on_chunk is not None:
+            Fetcher._replay(entry, on_chunk)
+        return FetchResult(url, entry["status"], entry["headers"], entry["body"], from_cache=True, revalidated=revalidated)
+
+    @staticmethod
+    def _replay(entry, on_chunk):
+        """
+        Passes a cached body to `on_chunk` in slices, as a network read would.
+        Returns True if `on_chunk` asked to stop.
+        Private method.
+        """
+        body = entry["body"]
+        for start in range(0, len(body), _CHUNK_SIZE):
+            if on_chunk(body[start:start + _CHUNK_SIZE], entry["headers"]):
+                return True
+        return False
+
+    @staticmethod
+    async def _read_body(response, headers, max_bytes, on_chunk, skip=0):
+        """
+        Reads the body in chunks, stopping at `max_bytes` or when `on_chunk` asks to. The first
+        `skip` bytes are kept in the body but not passed to `on_chunk`, which has already seen them.
+        Returns `(body, truncated, stopped)`: `truncated` if `max_bytes` cut the body short,
+        `stopped` if `on_chunk` did.
+        Private method.
+        """
+        if max_bytes is None and on_chunk is None:
+            return await response.read(), False, False
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+            if max_bytes is not None and size + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - size]
+            chunks.append(chunk)
+            size += len(chunk)
+            unseen = chunk[max(0, skip - size + len(chunk)):]
+            stop = bool(on_chunk is not None and unseen and on_chunk(unseen, headers))
+            if stop or (max_bytes is not None and size >= max_bytes):
+                # A body that ends exactly where reading stopped is complete.
+                if response.content.at_eof():
+                    return b"".join(chunks), False, False
+                return b"".join(chunks), not stop, stop
+        return b"".join(chunks), False, False
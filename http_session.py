@@ -0,0 +1,79 @@
+import asyncio
+
+# Close tasks are referenced until they finish, so they are not garbage-collected mid-way.
+_closing = set()
+
+
+def _abort_connections(session):
+    """
+    Closes the sockets of a session whose event loop has already been closed.
+
+    aiohttp closes pooled connections through their loop, and does nothing once that loop is
+    closed, so the sockets would only be reclaimed (with a ResourceWarning) by the garbage
+    collector. Private function.
+    """
+    connector = session.connector
+    if connector is None or connector.closed:
+        return
+    protocols = [protocol for connections in connector._conns.values() for protocol, _ in connections]
+    protocols.extend(connector._acquired)
+    for protocol in protocols:
+        transport = protocol.transport
+        if transport is None:
+            continue
+        try:
+            transport.abort()
+        except RuntimeError:
+            # abort() hands the final close to the transport's loop, which is gone, so do it here.
+            # For TLS, the socket belongs to the transport underneath the SSL layer.
+            ssl_protocol = getattr(transport, "_ssl_protocol", None)
+            raw = ssl_protocol._transport if ssl_protocol is not None else transport
+            try:
+                raw._call_connection_lost(None)
+            except RuntimeError:
+                pass  # The socket is closed before the protocol tries to reach the dead loop.
+
+
+def discard_session(session, session_loop):
+    """
+    Closes a pooled aiohttp session that is being replaced because the caller moved to another
+    event loop (e.g. a second `asyncio.run`), so its connector and sockets are not leaked.
+
+    Must be called from the new, running loop. If the session's own loop is still running (in
+    another thread), the session is closed there. If that loop is closed, the session's sockets
+    are closed directly and the session is then marked closed on the current loop.
+
+    Args:
+        session (aiohttp.ClientSession | None): The session being replaced.
+        session_loop (asyncio.AbstractEventLoop | None): The loop it was created on.
+    """
+    if session is None or session.closed:
+        return
+    if session_loop is not None and session_loop.is_running():
+        asyncio.run_coroutine_threadsafe(session.close(), session_loop)
+        return
+    if session_loop is not None and session_loop.is_closed():
+        _abort_connections(session)
+    task = asyncio.get_running_loop().create_task(session.close())
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+
+async def close_session(session, session_loop):
+    """
+    Closes a pooled aiohttp session from any event loop, e.g. in an `aclose` called from a later
+    `asyncio.run` than the one the session was created in.
+
+    Args:
+        session (aiohttp.ClientSession | None): The session to close.
+        session_loop (asyncio.AbstractEventLoop | None): The loop it was created on.
+    """
+    if session is None or session.closed:
+        return
+    loop = asyncio.get_running_loop()
+    if session_loop is not None and session_loop is not loop and session_loop.is_running():
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), session_loop))
+        return
+    if session_loop is not None and session_loop.is_closed():
+        _abort_connections(session)
+    await session.close()
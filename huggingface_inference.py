@@ -1,6 +1,8 @@
 import os
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from rate_limiter import limiter, estimate_tokens
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,12 +14,24 @@ HUGGINGFACE_TOKEN = os.getenv("HUGGINGFACE_TOKEN")
 if not HUGGINGFACE_TOKEN:
     raise ValueError("Hugging Face token not found in .env file")
 
-def generate_text(prompt, model_name="HarleyCooper/GRPOtuned", max_length=50):
+# Base URL of the Inference API; override to target a dedicated endpoint or a local server.
+HF_API_BASE = os.getenv("HF_API_BASE", "https://api-inference.huggingface.co/models").rstrip("/")
+
+# One pooled, keep-alive session shared by every call in the process (requests sessions are safe
+# to share between threads for plain request/response use like this).
+_session = requests.Session()
+_session.headers.update({"Authorization": f"Bearer {HUGGINGFACE_TOKEN}"})
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+def generate_text(prompt, model_name="HarleyCooper/GRPOtuned", max_length=50, timeout=(5, 60)):
     """
     Generate text using Hugging Face's Inference API with Qwen2 parameters
+
+    Requests reuse a pooled HTTP session, so repeated calls skip the TCP/TLS handshake.
+    `timeout` is a requests-style (connect, read) timeout in seconds.
     """
-    API_URL = f"https://api-inference.huggingface.co/models/{model_name}"
-    headers = {"Authorization": f"Bearer {HUGGINGFACE_TOKEN}"}
+    API_URL = f"{HF_API_BASE}/{model_name}"
     
     # Proper formatting for Qwen2 model
     payload = {
@@ -33,7 +47,8 @@ def generate_text(prompt, model_name="HarleyCooper/GRPOtuned", max_length=50):
     }
 
     try:
-        response = requests.post(API_URL, headers=headers, json=payload)
+        with limiter.limit_sync("huggingface", tokens=estimate_tokens(prompt) + max_length):
+            response = _session.post(API_URL, json=payload, timeout=timeout)
         response.raise_for_status()
         result = response.json()
         
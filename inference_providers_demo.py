@@ -3,6 +3,8 @@ import json
 import os
 from dotenv import load_dotenv
 from huggingface_hub import InferenceClient
+from rate_limiter import limiter, estimate_tokens
+from log_sink import get_sink
 
 # Load environment variables from .env file
 load_dotenv()
@@ -34,12 +36,15 @@ def generate_with_provider(prompt, provider="sambanova", max_tokens=6000):
     # Set up the chat message for the prompt.
     messages = [{"role": "user", "content": prompt}]
     
-    # Call the provider's chat completion endpoint.
-    response = client.chat.completions.create(
-        model="HarleyCooper/GRPOtuned",
-        messages=messages,
-        max_tokens=max_tokens
-    )
+    # Call the provider's chat completion endpoint, admitted through the shared per-provider quota.
+    with limiter.limit_sync(provider, tokens=estimate_tokens(prompt) + max_tokens) as call:
+        response = client.chat.completions.create(
+            model="HarleyCooper/GRPOtuned",
+            messages=messages,
+            max_tokens=max_tokens
+        )
+        usage = getattr(response, "usage", None)
+        call.actual_tokens = getattr(usage, "total_tokens", None)
     return response
 
 if __name__ == "__main__":
@@ -57,6 +62,5 @@ if __name__ == "__main__":
         "prompt": prompt,
         "inference_provider_response": output
     }
-    with open("provider_math_results.jsonl", "a", encoding="utf-8") as f:
-        f.write(json.dumps(result) + "\n")
+    get_sink("provider_math_results.jsonl").write(result)
     print("Result saved to provider_math_results.jsonl")
@@ -0,0 +1,187 @@
+import os
+import gzip
+import json
+import time
+import queue
+import atexit
+import shutil
+import threading
+from datetime import datetime
+
+_STOP = object()
+
+
+class JsonlLogSink:
+    """
+    Appends JSON records to a JSONL file from a dedicated background thread.
+
+    `write` only serializes the record and puts the line on a queue, so callers (including
+    coroutines on an event loop) never wait on disk I/O. The writer thread drains the queue in
+    batches, writes each batch with one `write` call, and is the only writer of the file, so lines
+    from concurrent callers never interleave. The file can be rotated by size and/or age; rotated
+    files are renamed with a timestamp and optionally gzip-compressed.
+    """
+
+    def __init__(self, path, max_bytes=None, rotate_interval=None, compress=False, batch_size=256, flush_interval=1.0):
+        """
+        Args:
+            path (str): The JSONL file to append to.
+            max_bytes (int, optional): Rotate before the file would grow past this size. Defaults to no limit.
+            rotate_interval (float, optional): Rotate files older than this many seconds. Defaults to never.
+            compress (bool, optional): gzip rotated files. Defaults to False.
+            batch_size (int, optional): Most records written per batch. Defaults to 256.
+            flush_interval (float, optional): Longest a record waits in the queue before being written. Defaults to 1s.
+        """
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.compress = compress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.records_written = 0
+        self.rotations = 0
+        self._queue = queue.Queue()
+        self._file = None
+        self._opened_at = None
+        self._closed = False
+        # Held while checking `_closed` and queueing, so nothing is queued behind the stop marker.
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"log-sink:{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        """Queues `record` (a JSON-serializable dict) to be appended. Never blocks on I/O."""
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"Log sink for {self.path} is closed")
+            self._queue.put(line)
+
+    def flush(self):
+        """Blocks until every record queued so far has been written and flushed to the OS."""
+        done = threading.Event()
+        with self._lock:
+            if self._closed:
+                return
+            self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """Writes everything still queued, closes the file and stops the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, waiters, stop = [], [], False
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                # Flush requests and shutdown write what is already queued without waiting for more.
+                if stop or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                if self._file is not None:
+                    self._file.close()
+                return
+
+    def _write_batch(self, lines):
+        data = "".join(lines).encode("utf-8")
+        try:
+            self._open()
+            if self._should_rotate(len(data)):
+                self._rotate()
+                self._open()
+            self._file.write(data)
+            self._file.flush()
+            self.records_written += len(lines)
+        except OSError as e:
+            # Logging must never take the process down; report and drop the batch.
+            print(f"Failed to write {len(lines)} records to {self.path}: {e}")
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+            self._opened_at = time.time()
+            if self._file.tell() and self.rotate_interval:
+                # An existing file counts from its last modification, not from when we reopened it.
+                self._opened_at = min(self._opened_at, os.path.getmtime(self.path))
+
+    def _should_rotate(self, incoming):
+        size = self._file.tell()
+        if not size:
+            return False
+        if self.max_bytes is not None and size + incoming > self.max_bytes:
+            return True
+        return self.rotate_interval is not None and time.time() - self._opened_at >= self.rotate_interval
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        root, extension = os.path.splitext(self.path)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        target = f"{root}.{stamp}{extension}"
+        counter = 1
+        while os.path.exists(target) or os.path.exists(target + ".gz"):
+            target = f"{root}.{stamp}-{counter}{extension}"
+            counter += 1
+        os.replace(self.path, target)
+        if self.compress:
+            with open(target, "rb") as source, gzip.open(target + ".gz", "wb") as compressed:
+                shutil.copyfileobj(source, compressed)
+            os.remove(target)
+        self.rotations += 1
+
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def get_sink(path, **options):
+    """
+    Returns the process-wide sink for `path`, creating it with `options` on first use, so every
+    caller appending to the same file shares one writer thread. Sinks are flushed and closed at exit.
+    """
+    key = os.path.abspath(path)
+    with _sinks_lock:
+        sink = _sinks.get(key)
+        if sink is None or sink._closed:
+            sink = _sinks[key] = JsonlLogSink(path, **options)
+        return sink
+
+
+def flush_all():
+    """Flushes every sink created by `get_sink`."""
+    with _sinks_lock:
+        sinks = list(_sinks.values())
+    for sink in sinks:
+        if not sink._closed:
+            sink.flush()
+
+
+@atexit.register
+def close_all():
+    """Flushes and closes every sink created by `get_sink`."""
+    with _sinks_lock:
+        sinks = list(_sinks.values())
+        _sinks.clear()
+    for sink in sinks:
+        sink.close()
@@ -0,0 +1,319 @@
+import os
+import re
+import sys
+import glob
+import gzip
+import json
+import argparse
+from datetime import datetime
+
+# Logs compacted when no paths are given, including files rotated by the log sink.
+DEFAULT_LOG_PATTERNS = [
+    "deepseek_calls*.jsonl*",
+    "math_results*.jsonl*",
+    "provider_math_results*.jsonl*",
+]
+
+# Model recorded for logs whose records do not name one.
+DEFAULT_MODELS = {
+    "math_results": "HarleyCooper/GRPOtuned",
+    "provider_math_results": "HarleyCooper/GRPOtuned",
+}
+
+FORMATS = {"parquet": "parquet", "arrow": "ipc"}
+EXTENSIONS = {"parquet": "parquet", "arrow": "arrow"}
+
+
+def _require_pyarrow():
+    """
+    Imports pyarrow, which is only needed for compaction and queries.
+    Private function.
+    """
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.fs
+    except ImportError as e:
+        raise ImportError("Columnar log storage needs pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def _schema(pa):
+    return pa.schema([
+        ("source", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("date", pa.string()),
+        ("model", pa.string()),
+        ("success", pa.bool_()),
+        ("latency_ms", pa.float64()),
+        ("prompt_tokens", pa.int64()),
+        ("completion_tokens", pa.int64()),
+        ("total_tokens", pa.int64()),
+        ("error", pa.string()),
+        # The original record, for anything the typed columns do not cover.
+        ("record", pa.string()),
+    ])
+
+
+def _partitioning(pa):
+    return pa.dataset.partitioning(pa.schema([("date", pa.string()), ("model", pa.string())]), flavor="hive")
+
+
+def source_name(path):
+    """The log a file belongs to, e.g. "deepseek_calls" for "deepseek_calls.20250206T015240.jsonl.gz"."""
+    return os.path.basename(path).split(".")[0]
+
+
+def _output_stem(path):
+    """
+    Prefix of the dataset files written for the log file `path`, so its rows can be replaced
+    without touching rows that came from other files. Private function.
+    """
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", os.path.basename(path))
+
+
+def _parse_timestamp(value):
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def normalize_record(record, source, default_timestamp):
+    """
+    Maps one log record of any of our logs onto the flat columns of the compacted store.
+
+    Args:
+        record (dict): The parsed JSONL record.
+        source (str): The log it came from (see `source_name`).
+        default_timestamp (datetime): Used when the record has no timestamp, e.g. the file's mtime.
+
+    Returns:
+        dict: One row matching the store's schema.
+    """
+    request = record.get("input") if isinstance(record.get("input"), dict) else {}
+    usage = record.get("usage") if isinstance(record.get("usage"), dict) else {}
+    timestamp = _parse_timestamp(record.get("timestamp")) or default_timestamp
+    error = record.get("error")
+    success = record.get("success")
+    if success is None:
+        success = not error
+    latency = record.get("latency_ms")
+    return {
+        "source": source,
+        "timestamp": timestamp,
+        "date": timestamp.date().isoformat(),
+        "model": str(record.get("model") or request.get("model") or record.get("backend") or DEFAULT_MODELS.get(source, "unknown")),
+        "success": bool(success),
+        "latency_ms": float(latency) if isinstance(latency, (int, float)) else None,
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "total_tokens": usage.get("total_tokens"),
+        "error": str(error) if error else None,
+        "record": json.dumps(record),
+    }
+
+
+def iter_log_rows(path, batch_size=50_000):
+    """
+    Streams normalized rows from a JSONL log (plain or gzip-compressed) in lists of up to
+    `batch_size`, so a large log is never held in memory whole. Unparseable lines are skipped.
+    """
+    source = source_name(path)
+    default_timestamp = datetime.fromtimestamp(os.path.getmtime(path))
+    opener = gzip.open if path.endswith(".gz") else open
+    batch = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                batch.append(normalize_record(record, source, default_timestamp))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def compact(paths, output_dir, format="parquet", batch_size=50_000):
+    """
+    Converts JSONL logs into a columnar dataset under `output_dir`, partitioned by date and model
+    (`date=YYYY-MM-DD/model=.../*.parquet`).
+
+    Logs are read and written in record batches. Each log file's rows go to dataset files named
+    after it, and compacting a file again replaces only those, so recompacting is idempotent and
+    rows from files not passed in this run (e.g. already rotated logs) are kept. Files are
+    identified by name: compact a rotated log together with the live log it came from, or its rows
+    are stored twice.
+
+    Args:
+        paths (list[str]): JSONL or .jsonl.gz log files.
+        output_dir (str): Dataset directory.
+        format (str, optional): "parquet" or "arrow" (Arrow IPC). Defaults to "parquet".
+        batch_size (int, optional): Records per batch. Defaults to 50,000.
+
+    Returns:
+        int: The number of records written.
+    """
+    pa = _require_pyarrow()
+    schema = _schema(pa)
+    extension = EXTENSIONS[format]
+    written = 0
+
+    def batches(path):
+        nonlocal written
+        for rows in iter_log_rows(path, batch_size):
+            written += len(rows)
+            yield pa.RecordBatch.from_pylist(rows, schema=schema)
+
+    for path in paths:
+        stem = _output_stem(path)
+        pattern = os.path.join(glob.escape(output_dir), "**", f"{glob.escape(stem)}-*.{extension}")
+        for previous in glob.glob(pattern, recursive=True):
+            os.remove(previous)
+        pa.dataset.write_dataset(
+            batches(path),
+            output_dir,
+            schema=schema,
+            format=FORMATS[format],
+            partitioning=_partitioning(pa),
+            basename_template=f"{stem}-{{i}}.{extension}",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+    return written
+
+
+class LogStore:
+    """
+    Read-only queries over a dataset written by `compact`.
+
+    Files are opened memory-mapped and only the columns a query needs are read; filters on date
+    and model skip whole partitions without opening them.
+    """
+
+    def __init__(self, root, format="parquet"):
+        pa = _require_pyarrow()
+        self._pa = pa
+        self.root = root
+        self.dataset = pa.dataset.dataset(
+            root,
+            format=FORMATS[format],
+            partitioning=_partitioning(pa),
+            filesystem=pa.fs.LocalFileSystem(use_mmap=True),
+        )
+
+    def _filter(self, date_from=None, date_to=None, model=None, source=None):
+        field = self._pa.dataset.field
+        conditions = []
+        if date_from is not None:
+            conditions.append(field("date") >= date_from)
+        if date_to is not None:
+            conditions.append(field("date") <= date_to)
+        if model is not None:
+            conditions.append(field("model") == model)
+        if source is not None:
+            conditions.append(field("source") == source)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def table(self, columns=None, date_from=None, date_to=None, model=None, source=None):
+        """
+        Returns the matching rows as a `pyarrow.Table` with only `columns` (all but `record` by default).
+        Dates are "YYYY-MM-DD" strings and both ends are inclusive.
+        """
+        if columns is None:
+            columns = [name for name in self.dataset.schema.names if name != "record"]
+        return self.dataset.to_table(columns=columns, filter=self._filter(date_from, date_to, model, source))
+
+    def summary(self, group_by=("model",), date_from=None, date_to=None, model=None, source=None):
+        """
+        Aggregates calls per group: call count, success rate, latency (mean, p50, p95) and token totals.
+
+        Args:
+            group_by (tuple, optional): Columns to group by, e.g. ("date", "model"). Defaults to ("model",).
+            date_from, date_to, model, source: Optional filters, as for `table`.
+
+        Returns:
+            list[dict]: One dict per group, sorted by the group columns.
+        """
+        pa = self._pa
+        compute = pa.compute
+        group_by = list(group_by)
+        table = self.table(group_by + ["success", "latency_ms", "prompt_tokens", "completion_tokens", "total_tokens"],
+                           date_from, date_to, model, source)
+        table = table.append_column("succeeded", compute.cast(table["success"], pa.int64()))
+        aggregated = table.group_by(group_by).aggregate([
+            ("succeeded", "count"),
+            ("succeeded", "sum"),
+            ("latency_ms", "mean"),
+            ("latency_ms", "tdigest", compute.TDigestOptions(q=[0.5, 0.95])),
+            ("prompt_tokens", "sum"),
+            ("completion_tokens", "sum"),
+            ("total_tokens", "sum"),
+        ]).sort_by([(name, "ascending") for name in group_by])
+        results = []
+        for row in aggregated.to_pylist():
+            calls = row["succeeded_count"]
+            quantiles = row["latency_ms_tdigest"] or [None, None]
+            results.append({
+                **{name: row[name] for name in group_by},
+                "calls": calls,
+                "success_rate": row["succeeded_sum"] / calls if calls else None,
+                "latency_ms_mean": row["latency_ms_mean"],
+                "latency_ms_p50": quantiles[0],
+                "latency_ms_p95": quantiles[1],
+                "prompt_tokens": row["prompt_tokens_sum"],
+                "completion_tokens": row["completion_tokens_sum"],
+                "total_tokens": row["total_tokens_sum"],
+            })
+        return results
+
+
+def _expand(paths):
+    files = []
+    for pattern in paths or DEFAULT_LOG_PATTERNS:
+        files.extend(sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern])
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact JSONL call logs into a columnar dataset and query it.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact_parser = commands.add_parser(
+        "compact",
+        help="Convert JSONL logs into a partitioned dataset.",
+        description="Convert JSONL logs into a partitioned dataset. Recompacting a file replaces the rows it "
+                    "added before; rows from files not given are kept. Pass rotated logs together with the "
+                    "live log they were rotated from, or their rows are stored twice.",
+    )
+    compact_parser.add_argument("paths", nargs="*", help="Log files or globs (default: our known logs).")
+    compact_parser.add_argument("--output", default="log_store")
+    compact_parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    summary_parser = commands.add_parser("summary", help="Print per-group call statistics as JSON lines.")
+    summary_parser.add_argument("--store", default="log_store")
+    summary_parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    summary_parser.add_argument("--by", default="model", help="Comma-separated group columns, e.g. date,model.")
+    summary_parser.add_argument("--date-from")
+    summary_parser.add_argument("--date-to")
+    summary_parser.add_argument("--model")
+    summary_parser.add_argument("--source")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        files = _expand(args.paths)
+        if not files:
+            sys.exit("No log files found.")
+        count = compact(files, args.output, args.format)
+        print(f"Compacted {count} records from {len(files)} files into {args.output}")
+    else:
+        store = LogStore(args.store, args.format)
+        for row in store.summary(args.by.split(","), args.date_from, args.date_to, args.model, args.source):
+            print(json.dumps(row))
@@ -0,0 +1,141 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BatchMetrics:
+    """
+    Running throughput/latency counters for a `MicroBatcher`, used to tune batch size and wait time.
+    """
+
+    def __init__(self):
+        self.batches = 0
+        self.items = 0
+        self.max_batch_size_seen = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.total_batch_time = 0.0
+
+    def record(self, batch_size, queue_waits, batch_time):
+        self.batches += 1
+        self.items += batch_size
+        self.max_batch_size_seen = max(self.max_batch_size_seen, batch_size)
+        self.total_queue_wait += sum(queue_waits)
+        self.max_queue_wait = max([self.max_queue_wait] + list(queue_waits))
+        self.total_batch_time += batch_time
+
+    def snapshot(self):
+        """Returns the metrics as a JSON-friendly dict (times in milliseconds)."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size_seen,
+            "avg_queue_wait_ms": 1000 * self.total_queue_wait / self.items if self.items else 0.0,
+            "max_queue_wait_ms": 1000 * self.max_queue_wait,
+            "avg_batch_ms": 1000 * self.total_batch_time / self.batches if self.batches else 0.0,
+            "items_per_second": self.items / self.total_batch_time if self.total_batch_time else 0.0,
+        }
+
+
+class MicroBatcher:
+    """
+    Collects individually submitted requests into batches for a batched backend.
+
+    A batch is dispatched as soon as `max_batch_size` requests are waiting, or `max_wait_ms` after
+    the first request of the batch arrived, whichever comes first. Requests are only batched with
+    others that use the same generation parameters. `batch_fn` is synchronous and runs on a
+    single worker thread, so the event loop keeps accepting requests while a batch is generating.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=20):
+        """
+        Args:
+            batch_fn (callable): `batch_fn(inputs, **params)` returning one result per input, in order.
+            max_batch_size (int, optional): Most requests per batch. Defaults to 8.
+            max_wait_ms (float, optional): Longest a request waits for the batch to fill. Defaults to 20.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.metrics = BatchMetrics()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="micro-batch")
+        self._queue = None
+        self._worker = None
+
+    async def submit(self, item, **params):
+        """
+        Queues `item` and waits for its result. Exceptions raised by `batch_fn` are re-raised here
+        for every request of the failed batch.
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, params, future, time.monotonic()))
+        return await future
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _collect(self):
+        """Waits for the first request, then gathers more until the batch is full or the wait is over."""
+        pending = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return pending
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = await self._collect()
+            groups = {}
+            for request in pending:
+                key = tuple(sorted(request[1].items()))
+                groups.setdefault(key, []).append(request)
+            for requests in groups.values():
+                # Skip requests whose caller has gone away (e.g. a cancelled HTTP handler).
+                requests = [r for r in requests if not r[2].cancelled()]
+                if requests:
+                    await self._dispatch(loop, requests)
+
+    async def _dispatch(self, loop, requests):
+        items = [r[0] for r in requests]
+        params = requests[0][1]
+        started = time.monotonic()
+        queue_waits = [started - r[3] for r in requests]
+        try:
+            results = await loop.run_in_executor(self._executor, lambda: self.batch_fn(items, **params))
+            if len(results) != len(items):
+                raise RuntimeError(f"batch_fn returned {len(results)} results for {len(items)} inputs")
+        except Exception as e:
+            for _, _, future, _ in requests:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.metrics.record(len(items), queue_waits, time.monotonic() - started)
+        for (_, _, future, _), result in zip(requests, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def aclose(self):
+        """Stops the worker task and its thread. Requests still queued are cancelled."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            while not self._queue.empty():
+                self._queue.get_nowait()[2].cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,241 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+# Rough characters-per-token ratio for English text across the providers we call. Only used to
+# size requests against token-per-minute quotas before the real usage is known.
+CHARS_PER_TOKEN = 4
+
+# Per-provider quotas. None means "no limit" for that dimension. Override any value with the
+# environment variables <PROVIDER>_RPM, <PROVIDER>_TPM and <PROVIDER>_MAX_CONCURRENCY
+# (e.g. GEMINI_RPM=15 for the free tier).
+DEFAULT_LIMITS = {
+    "gemini": {"rpm": 2000, "tpm": 4_000_000, "max_concurrency": 64},
+    "deepseek": {"rpm": None, "tpm": None, "max_concurrency": 16},
+    "huggingface": {"rpm": 300, "tpm": None, "max_concurrency": 8},
+    "sambanova": {"rpm": 60, "tpm": None, "max_concurrency": 8},
+}
+
+# How often a queued caller that is not at the head of the queue re-checks its turn, and the
+# longest the head sleeps before re-checking (new, higher-priority arrivals may overtake it).
+_POLL_INTERVAL = 0.01
+_MAX_HEAD_SLEEP = 0.25
+
+
+def estimate_tokens(text):
+    """
+    Cheap estimate of the number of tokens in `text` for quota accounting.
+    """
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+class TokenBucket:
+    """
+    A bucket holding up to `per_minute` units that refills continuously at `per_minute / 60`
+    units per second. Not thread-safe on its own; `ProviderLimiter` guards it with its lock.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._last = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` units are available (0 if they are available now)."""
+        self._refill(now)
+        # A single request larger than the whole bucket would otherwise wait forever.
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta):
+        """Debits (positive) or credits (negative) units after the fact. The level may go negative."""
+        self.level = min(self.capacity, self.level - delta)
+
+
+class ProviderLimiter:
+    """
+    Request-per-minute and token-per-minute buckets plus a concurrency cap for one provider.
+
+    Callers queue in priority order (lower number first, FIFO within a priority) and only the head
+    of the queue may take capacity, so a stream of small requests cannot starve a large one.
+    State is guarded by a thread lock so async callers and sync callers running in worker threads
+    share the same quota.
+    """
+
+    def __init__(self, name, rpm=None, tpm=None, max_concurrency=None):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self._requests = TokenBucket(rpm) if rpm else None
+        self._tokens = TokenBucket(tpm) if tpm else None
+        self._lock = threading.Lock()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+
+    def _enqueue(self, priority):
+        ticket = (priority, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _dequeue(self, ticket):
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+
+    def _try_acquire(self, ticket, tokens):
+        """Returns 0 if capacity was taken for `ticket`, otherwise how long to wait before trying again."""
+        with self._lock:
+            if self._queue[0] != ticket:
+                return _POLL_INTERVAL
+            if self.max_concurrency is not None and self._in_flight >= self.max_concurrency:
+                return _POLL_INTERVAL
+            now = time.monotonic()
+            wait = 0.0
+            if self._requests is not None:
+                wait = max(wait, self._requests.wait_time(1, now))
+            if self._tokens is not None and tokens:
+                wait = max(wait, self._tokens.wait_time(tokens, now))
+            if wait > 0:
+                return min(wait, _MAX_HEAD_SLEEP)
+            if self._requests is not None:
+                self._requests.take(1)
+            if self._tokens is not None and tokens:
+                self._tokens.take(tokens)
+            heapq.heappop(self._queue)
+            self._in_flight += 1
+            return 0.0
+
+    async def acquire(self, tokens=0, priority=0):
+        """Waits for a request slot and `tokens` of TPM quota. Cancelling the wait leaves the queue."""
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+
+    def acquire_sync(self, tokens=0, priority=0):
+        """Blocking variant of `acquire` for synchronous call paths."""
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if not wait:
+                    return
+                time.sleep(wait)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+
+    def release(self, estimated_tokens=0, actual_tokens=None):
+        """
+        Frees the concurrency slot taken by `acquire`. If the real token usage is known, the TPM
+        bucket is corrected by the difference from the estimate.
+        """
+        with self._lock:
+            self._in_flight -= 1
+            if self._tokens is not None and actual_tokens is not None:
+                self._tokens.adjust(actual_tokens - min(estimated_tokens, self._tokens.capacity))
+
+
+class RateLimitedCall:
+    """Handle yielded by `RateLimiter.limit`; set `actual_tokens` once the provider reports usage."""
+
+    def __init__(self, estimated_tokens):
+        self.estimated_tokens = estimated_tokens
+        self.actual_tokens = None
+
+
+class RateLimiter:
+    """
+    Process-wide registry of per-provider limiters. Providers without a configuration are not limited.
+    """
+
+    def __init__(self, limits=None):
+        self._limiters = {}
+        for provider, config in (limits or {}).items():
+            self.configure(provider, **config)
+
+    @classmethod
+    def from_env(cls, defaults=DEFAULT_LIMITS):
+        """Builds a limiter from `defaults`, overridden by <PROVIDER>_RPM/_TPM/_MAX_CONCURRENCY."""
+        limits = {}
+        for provider, config in defaults.items():
+            limits[provider] = {}
+            for key, value in config.items():
+                override = os.environ.get(f"{provider.upper()}_{key.upper()}")
+                if override is not None:
+                    value = int(override) if override.strip() else None
+                limits[provider][key] = value
+        return cls(limits)
+
+    def configure(self, provider, rpm=None, tpm=None, max_concurrency=None):
+        """Sets (or replaces) the quotas for `provider`."""
+        self._limiters[provider] = ProviderLimiter(provider, rpm=rpm, tpm=tpm, max_concurrency=max_concurrency)
+
+    def get(self, provider):
+        """Returns the limiter for `provider`, or None if it is not limited."""
+        return self._limiters.get(provider)
+
+    @asynccontextmanager
+    async def limit(self, provider, tokens=0, priority=0):
+        """
+        Async context manager that holds a slot for one call to `provider`.
+
+        Args:
+            provider (str): Provider name, e.g. "gemini".
+            tokens (int, optional): Estimated total (input + output) tokens for the call.
+            priority (int, optional): Lower values are served first. Defaults to 0.
+        """
+        call = RateLimitedCall(tokens)
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            yield call
+            return
+        await limiter.acquire(tokens, priority)
+        try:
+            yield call
+        finally:
+            limiter.release(tokens, call.actual_tokens)
+
+    @contextmanager
+    def limit_sync(self, provider, tokens=0, priority=0):
+        """Blocking counterpart of `limit` for synchronous call paths."""
+        call = RateLimitedCall(tokens)
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            yield call
+            return
+        limiter.acquire_sync(tokens, priority)
+        try:
+            yield call
+        finally:
+            limiter.release(tokens, call.actual_tokens)
+
+
+# Shared instance used by every outbound LLM call path.
+limiter = RateLimiter.from_env()
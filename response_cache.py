@@ -0,0 +1,145 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# How many disk writes happen between size checks of the on-disk tier.
+_DISK_TRIM_EVERY = 64
+
+
+def make_cache_key(model_name, payload):
+    """
+    Returns a content address for a request: the SHA-256 of the model name and the canonical JSON
+    of the full payload (contents, generationConfig, tools, ...). Key order does not matter.
+    """
+    canonical = json.dumps({"model": model_name, "payload": payload}, sort_keys=True,
+                           separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    A two-tier cache for API responses: an in-memory LRU in front of an optional sqlite file.
+
+    Entries expire `ttl` seconds after they were stored. Each tier is bounded by entry count and
+    evicts least-recently-used entries first. Values must be JSON-serializable. Thread-safe.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, disk_path=None, max_disk_entries=100_000):
+        """
+        Args:
+            max_entries (int, optional): Capacity of the in-memory tier. Defaults to 1024.
+            ttl (float, optional): Seconds an entry stays valid, or None for no expiry. Defaults to one hour.
+            disk_path (str, optional): sqlite file for the persistent tier. Disabled when None.
+            max_disk_entries (int, optional): Capacity of the on-disk tier. Defaults to 100,000.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._disk.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            self._disk.commit()
+
+    def _expired(self, stored_at, now):
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._memory[key]
+            if self._disk is not None:
+                row = self._disk.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self._expired(row[1], now):
+                        self._disk.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._disk.commit()
+                        value = json.loads(row[0])
+                        self._remember(key, row[1], value)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._disk.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._disk.commit()
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Stores `value` under `key` in every enabled tier."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now),
+                )
+                self._disk_writes += 1
+                if self._disk_writes % _DISK_TRIM_EVERY == 0:
+                    self._trim_disk(now)
+                self._disk.commit()
+
+    def _remember(self, key, stored_at, value):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _trim_disk(self, now):
+        if self.ttl is not None:
+            self._disk.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl,))
+        (count,) = self._disk.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_disk_entries:
+            self._disk.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_disk_entries,),
+            )
+
+    def clear(self):
+        """Drops every entry from both tiers. Counters are kept."""
+        with self._lock:
+            self._memory.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM responses")
+                self._disk.commit()
+
+    def stats(self):
+        """Returns hit/miss counters and the current in-memory size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self):
+        """Closes the on-disk tier, trimming it to size first."""
+        with self._lock:
+            if self._disk is not None:
+                self._trim_disk(time.time())
+                self._disk.commit()
+                self._disk.close()
+                self._disk = None
@@ -0,0 +1,168 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Status codes that indicate a transient condition worth retrying. Everything else in the
+# 4xx range is a problem with the request itself and will fail the same way again.
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class RetryBudget:
+    """
+    A token bucket that caps retries to a fraction of overall traffic.
+
+    Every first attempt deposits `ratio` tokens and every retry withdraws one, so in steady state
+    at most `ratio` retries are issued per request.  A small per-second allowance keeps retries
+    possible at low traffic.  When an upstream is failing hard the bucket drains and callers fail
+    fast instead of multiplying load on it.  Thread-safe; one instance is normally shared by the
+    whole process (see `DEFAULT_RETRY_BUDGET`).
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=1.0, max_tokens=50.0):
+        """
+        Args:
+            ratio (float, optional): Retry tokens earned per request. Defaults to 0.2.
+            min_per_second (float, optional): Retry tokens earned per second regardless of traffic. Defaults to 1.0.
+            max_tokens (float, optional): Bucket capacity, bounding retry bursts. Defaults to 50.
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._last_refill) * self.min_per_second)
+        self._last_refill = now
+
+    def record_request(self):
+        """Credits the budget for a first attempt."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self):
+        """Withdraws one retry token. Returns False if the budget is exhausted."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    @property
+    def tokens(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+DEFAULT_RETRY_BUDGET = RetryBudget()
+
+
+def parse_retry_after(value):
+    """
+    Parses a `Retry-After` header value into seconds.
+
+    Accepts both the delta-seconds and HTTP-date forms. Returns None if the value is missing or
+    cannot be parsed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """
+    Decides whether and when a failed request is retried.
+
+    Delays use exponential backoff with full jitter (a uniform draw between 0 and the capped
+    exponential delay), which spreads retries from many clients instead of synchronizing them.
+    A server-provided `Retry-After` takes precedence over the computed delay.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=20.0, max_retry_after=60.0,
+                 retry_statuses=TRANSIENT_STATUS_CODES, budget=DEFAULT_RETRY_BUDGET, rng=None):
+        """
+        Args:
+            max_attempts (int, optional): Total attempts including the first one. Defaults to 3.
+            base_delay (float, optional): Backoff delay cap for the first retry, in seconds. Defaults to 0.5.
+            max_delay (float, optional): Upper bound on any computed backoff delay. Defaults to 20.
+            max_retry_after (float, optional): Give up rather than wait if the server asks for longer than this.
+            retry_statuses (collection of int, optional): HTTP statuses considered transient.
+            budget (RetryBudget, optional): Budget shared with other policies, or None to disable it.
+            rng (random.Random, optional): Source of jitter, mainly for tests.
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.retry_statuses = frozenset(retry_statuses)
+        self.budget = budget
+        self._rng = rng or random.Random()
+
+    def on_request(self):
+        """Call once per logical request, before the first attempt."""
+        if self.budget is not None:
+            self.budget.record_request()
+
+    def is_retryable(self, status=None, idempotent=True):
+        """
+        Returns True if a failure is transient and safe to repeat.
+
+        Args:
+            status (int, optional): HTTP status of the failed attempt, or None for a connection-level
+                                    error or timeout.
+            idempotent (bool, optional): Whether repeating the request has no additional side effects.
+        """
+        if not idempotent:
+            return False
+        return status is None or status in self.retry_statuses
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Returns the delay in seconds before retry number `attempt` (0 for the first retry).
+        """
+        if retry_after is not None:
+            return retry_after
+        return self._rng.uniform(0.0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def next_delay(self, attempt, status=None, retry_after=None, idempotent=True):
+        """
+        Decides what to do after a failed attempt.
+
+        Args:
+            attempt (int): Zero-based index of the attempt that just failed.
+            status (int, optional): HTTP status, or None for connection errors and timeouts.
+            retry_after (str | float, optional): The `Retry-After` header, raw or already in seconds.
+            idempotent (bool, optional): Whether the request may be repeated safely.
+
+        Returns:
+            float: Seconds to wait before retrying, or None if the request should not be retried.
+        """
+        if attempt + 1 >= self.max_attempts or not self.is_retryable(status, idempotent):
+            return None
+        if isinstance(retry_after, str):
+            retry_after = parse_retry_after(retry_after)
+        if retry_after is not None and retry_after > self.max_retry_after:
+            return None
+        if self.budget is not None and not self.budget.try_spend():
+            return None
+        return self.backoff(attempt, retry_after)
@@ -12,10 +12,20 @@ trace_provider.add_span_processor(SimpleSpanProcessor(OTLPSpanExporter(endpoint)
 
 SmolagentsInstrumentor().instrument(tracer_provider=trace_provider)
 
+import json
 import asyncio
-from typing import List, Dict, Any, Optional
+import inspect
+import contextlib
+from typing import List, Dict, Any, Optional, Callable
 from gemini_api import GeminiAPIWrapper
 from function_registry import registry
+from rate_limiter import estimate_tokens
+from tools import summarize_text
+
+# Tool results longer than this are summarized when the history has to be shrunk.
+SUMMARIZE_RESULT_CHARS = 1000
+# Token budget of those summaries.
+SUMMARY_TOKENS = 128
 
 class SmolAgent:
     """
@@ -23,90 +33,196 @@ class SmolAgent:
     Optimized for Gemini 2 Flash and designed for efficient tool use.
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, gemini: Optional[GeminiAPIWrapper] = None,
+                 max_steps: int = 5, step_timeout: float = 60.0,
+                 history_token_budget: int = 8000, tool_result_token_budget: Optional[int] = 2000,
+                 max_tools: Optional[int] = None):
         """
         Initialize the agent with a Gemini API wrapper and access to registered tools.
         
         Args:
             api_key: Optional API key for Gemini. If not provided, will use environment variable.
+            gemini: Optional existing GeminiAPIWrapper to share, so several agents reuse one
+                    pooled HTTP session. A new wrapper is created when omitted.
+            max_steps: Maximum number of model turns per request. The last turn is not offered
+                       tools, so the model has to answer with what it has gathered.
+            step_timeout: Seconds allowed for each model call and for each round of tool calls
+                          (tools may have shorter timeouts of their own in the registry).
+            history_token_budget: Estimated input tokens the conversation may grow to before old
+                                  tool results are summarized and the oldest exchanges dropped.
+            tool_result_token_budget: Tool results estimated above this many tokens (e.g. scraped
+                                      pages) are replaced by an extractive summary of this size
+                                      before they are sent to the model. None sends them whole.
+            max_tools: Opt-in limit on the tool declarations sent with the first model call,
+                       chosen by relevance to the request (all tools are sent when none look
+                       relevant). Later steps always get every tool, since a follow-up often needs
+                       one the request did not mention. None (the default) always sends every tool.
+        """
+        self.gemini = gemini or GeminiAPIWrapper(api_key=api_key)
+        self.max_steps = max_steps
+        self.step_timeout = step_timeout
+        self.history_token_budget = history_token_budget
+        self.tool_result_token_budget = tool_result_token_budget
+        self.max_tools = max_tools
+
+    @property
+    def available_tools(self) -> List[Dict[str, Any]]:
+        """
+        Declarations of every registered tool in Gemini's format, as one tool object. The
+        registry builds and serializes them once and reuses them until a tool is registered.
+        """
+        return registry.tool_declarations()
+
+    def _tools_for(self, user_request: str) -> List[Dict[str, Any]]:
+        """
+        Declarations to send for `user_request`: with `max_tools`, only the registered tools most
+        relevant to the request (all of them when none match), otherwise every tool.
+        """
+        if self.max_tools is None:
+            return registry.tool_declarations()
+        return registry.tool_declarations(registry.select_tools(user_request, self.max_tools))
+
+    async def aclose(self) -> None:
+        """Release the pooled HTTP connections held by the underlying Gemini wrapper."""
+        await self.gemini.aclose()
+
+    async def _generate(self, contents: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None,
+                        tool_config: Optional[Dict[str, Any]] = None,
+                        stream_callback: Optional[Callable[[str], Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Call Gemini once and return the model's reply turn with all of its parts.
+        With a `stream_callback`, the response is streamed and each text delta is passed to the
+        callback (sync or async) as soon as it arrives.
+        """
+        # Use 0.0 for more predictable tool selection
+        if stream_callback is None:
+            return await self.gemini.generate_content(contents, tools=tools, temperature=0.0, tool_config=tool_config)
+
+        parts: List[Dict[str, Any]] = []
+        stream = self.gemini.stream_gemini_api(contents, tools=tools, temperature=0.0, tool_config=tool_config)
+        async with contextlib.aclosing(stream):
+            async for delta in stream:
+                if isinstance(delta, dict):
+                    parts.append(delta)
+                    continue
+                # Merge consecutive text deltas back into a single text part.
+                if parts and "text" in parts[-1]:
+                    parts[-1] = {"text": parts[-1]["text"] + delta}
+                else:
+                    parts.append({"text": delta})
+                callback_result = stream_callback(delta)
+                if inspect.isawaitable(callback_result):
+                    await callback_result
+        return {"role": "model", "parts": parts} if parts else None
+
+    async def _run_tool(self, function_call: Dict[str, Any]) -> Dict[str, Any]:
         """
-        self.gemini = GeminiAPIWrapper(api_key=api_key)
-        self.available_tools = self._get_tool_descriptions()
-
-    def _get_tool_descriptions(self) -> List[Dict[str, Any]]:
-        """
-        Generate tool descriptions in Gemini's expected format from the function registry.
-        """
-        tools = []
-        for name, func in registry.functions.items():
-            tool = {
-                "functionDeclarations": [{
-                    "name": name,
-                    "description": getattr(func, '__description__', ''),
-                    "parameters": {
-                        "type": "OBJECT",
-                        "properties": {
-                            param_name: {
-                                "type": "STRING",
-                                "description": param_desc
-                            }
-                            for param_name, param_desc in getattr(func, '__parameters__', {}).items()
-                        },
-                        "required": list(getattr(func, '__parameters__', {}).keys())
-                    }
-                }]
+        Execute one functionCall through the registry and wrap its result as a functionResponse part.
+        The registry awaits async tools and offloads sync ones, so the event loop is never blocked.
+        """
+        tool_name = function_call.get('name', '')
+        tool_args = function_call.get('args') or {}
+        tool_result = await registry.acall_function(tool_name, tool_args, timeout=self.step_timeout)
+        budget = self.tool_result_token_budget
+        if budget is not None and isinstance(tool_result, str) and estimate_tokens(tool_result) > budget:
+            # Summarizing is CPU-bound; keep it off the event loop.
+            loop = asyncio.get_running_loop()
+            tool_result = await loop.run_in_executor(None, summarize_text, tool_result, budget)
+        return {
+            "functionResponse": {
+                "name": tool_name,
+                "response": {"name": tool_name, "content": tool_result}
             }
-            tools.append(tool)
-        return tools
+        }
 
-    async def process_request(self, user_request: str) -> str:
+    async def _execute_tool_calls(self, function_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Execute every functionCall of a model turn concurrently. Responses keep the call order.
         """
-        Process a user request through the following steps:
-        1. Send request to Gemini with available tools
-        2. If Gemini suggests a tool, execute it
-        3. Send tool results back to Gemini for final response
+        return list(await asyncio.gather(*(self._run_tool(call) for call in function_calls)))
+
+    async def _fit_history(self, contents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Keep the conversation within `history_token_budget`.
+
+        First, long tool results of all but the latest exchange are replaced by summaries. If that
+        is not enough, the oldest model/function exchanges are dropped. The user's request and the
+        latest exchange are always kept.
+        """
+        if estimate_tokens(json.dumps(contents)) <= self.history_token_budget:
+            return contents
+
+        responses = []
+        for turn in contents[1:-2]:
+            for part in turn.get("parts", []):
+                response = part.get("functionResponse", {}).get("response", {})
+                content = response.get("content")
+                if isinstance(content, str) and len(content) > SUMMARIZE_RESULT_CHARS:
+                    responses.append(response)
+        if responses:
+            # Summarizing is CPU-bound; keep it off the event loop, as _run_tool does.
+            loop = asyncio.get_running_loop()
+            summaries = await asyncio.gather(*(
+                loop.run_in_executor(None, summarize_text, response["content"], SUMMARY_TOKENS)
+                for response in responses
+            ))
+            for response, summary in zip(responses, summaries):
+                response["content"] = summary
+
+        while len(contents) > 3 and estimate_tokens(json.dumps(contents)) > self.history_token_budget:
+            del contents[1:3]
+        return contents
+
+    async def process_request(self, user_request: str,
+                              stream_callback: Optional[Callable[[str], Any]] = None) -> str:
+        """
+        Process a user request as a multi-step conversation:
+        1. Send the conversation to Gemini with available tools
+        2. If Gemini asks for one or more tools, execute them concurrently and append the model's
+           turn and the functionResponse parts to the conversation
+        3. Repeat until Gemini answers in text or `max_steps` is reached
         
         Args:
             user_request: The user's natural language request
+            stream_callback: Optional callable (sync or async) that receives the answer text as it
+                             is generated, so callers can show it before the response completes.
             
         Returns:
             Final response incorporating tool results if applicable
         """
-        # First Gemini call to understand request and potentially select a tool
-        result = await self.gemini.call_gemini_api(
-            prompt=f"User Request: {user_request}\nPlease help fulfill this request using available tools if needed.",
-            tools=self.available_tools,
-            temperature=0.0  # Use 0.0 for more predictable tool selection
-        )
-
-        if not result:
-            return "I apologize, but I was unable to process your request."
-
-        # Check if Gemini wants to use a tool
-        if isinstance(result, dict) and result.get('functionCall'):
-            function_call = result['functionCall']
-            tool_name = function_call['name']
-            tool_args = function_call.get('args', {})
-
-            # Execute the tool
-            tool_result = registry.call_function(tool_name, tool_args)
-
-            # Send results back to Gemini for final response
-            final_prompt = (
-                f"Tool '{tool_name}' returned the following result: {tool_result}\n"
-                f"Based on the original request: {user_request}\n"
-                "Please provide a final response incorporating this information."
-            )
-            
-            final_result = await self.gemini.call_gemini_api(
-                prompt=final_prompt,
-                temperature=0.0
-            )
-            
-            return final_result if final_result else "I apologize, but I was unable to process the tool results."
-        
-        # If no tool was needed, return Gemini's direct response
-        return result if isinstance(result, str) else "I apologize, but I was unable to generate a response."
+        contents = [{
+            "role": "user",
+            "parts": [{"text": f"User Request: {user_request}\nPlease help fulfill this request using available tools if needed."}]
+        }]
+        for step in range(self.max_steps):
+            # Only the first call is narrowed to the tools the request looks like it needs.
+            tools = self._tools_for(user_request) if step == 0 else registry.tool_declarations()
+            # On the last step the model must answer with what it has, so further tool calls are disabled
+            tool_config = {"functionCallingConfig": {"mode": "NONE"}} if step == self.max_steps - 1 else None
+            try:
+                model_turn = await asyncio.wait_for(
+                    self._generate(contents, tools=tools, tool_config=tool_config,
+                                   stream_callback=stream_callback),
+                    self.step_timeout,
+                )
+            except asyncio.TimeoutError:
+                return "I apologize, but the request timed out."
+
+            if not model_turn:
+                if step == 0:
+                    return "I apologize, but I was unable to process your request."
+                return "I apologize, but I was unable to process the tool results."
+
+            # Check if Gemini wants to use tools; a single turn may ask for several at once
+            function_calls = GeminiAPIWrapper.extract_function_calls(model_turn)
+            if not function_calls:
+                return GeminiAPIWrapper.extract_text(model_turn) or "I apologize, but I was unable to generate a response."
+
+            function_responses = await self._execute_tool_calls(function_calls)
+            contents += [model_turn, {"role": "user", "parts": function_responses}]
+            contents = await self._fit_history(contents)
+
+        return "I apologize, but I was unable to complete the request within the allowed number of steps."
 
 async def main():
     """Example usage of the SmolAgent"""
@@ -117,10 +233,14 @@ async def main():
         "Use Hugging Face to generate a story about a cat",  # Test Hugging Face inference
     ]
     
-    for request in requests:
-        print(f"\nProcessing request: {request}")
-        response = await agent.process_request(request)
-        print(f"Response: {response}")
+    try:
+        # Requests are independent, so run them concurrently over the agent's shared session.
+        responses = await asyncio.gather(*(agent.process_request(request) for request in requests))
+        for request, response in zip(requests, responses):
+            print(f"\nProcessing request: {request}")
+            print(f"Response: {response}")
+    finally:
+        await agent.aclose()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,88 @@
+class SSEParser:
+    """
+    Incremental parser for `text/event-stream` bodies.
+
+    Feed it raw bytes as they arrive and it returns the events completed so far; a partial line
+    is kept until the rest of it arrives, so the body is never buffered as a whole.  Each event is
+    a dict with `event` (defaults to "message"), `data` (multiple data lines joined with "\\n")
+    and `id` (or None).  Comment lines and unknown fields are ignored, per the SSE specification.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self._data = []
+        self._event = None
+        self._id = None
+
+    def feed(self, chunk):
+        """
+        Parses `chunk` (bytes) and returns the list of events it completed.
+        """
+        buffer = self._buffer + chunk if self._buffer else chunk
+        events = []
+        # Scan with a moving offset and cut the consumed part off once, so a chunk holding many
+        # lines is parsed in linear time.
+        start = 0
+        while True:
+            newline = buffer.find(b"\n", start)
+            if newline < 0:
+                break
+            end = newline - 1 if newline > start and buffer[newline - 1] == 13 else newline  # 13 is "\r"
+            event = self._process_line(buffer[start:end].decode("utf-8"))
+            start = newline + 1
+            if event is not None:
+                events.append(event)
+        self._buffer = buffer[start:]
+        return events
+
+    def close(self):
+        """
+        Flushes an event left unterminated at the end of the stream. Returns a list of 0 or 1 events.
+        """
+        events = []
+        if self._buffer:
+            event = self._process_line(self._buffer.decode("utf-8").rstrip("\r"))
+            self._buffer = b""
+            if event is not None:
+                events.append(event)
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _process_line(self, line):
+        if not line:
+            return self._dispatch()
+        if line.startswith(":"):
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            self._id = value
+        return None
+
+    def _dispatch(self):
+        if not self._data:
+            self._event = None
+            return None
+        event = {"event": self._event or "message", "data": "\n".join(self._data), "id": self._id}
+        self._data = []
+        self._event = None
+        return event
+
+
+async def iter_sse_events(stream):
+    """
+    Yields SSE events from an aiohttp `StreamReader` (e.g. `response.content`) as they arrive.
+    """
+    parser = SSEParser()
+    async for chunk in stream.iter_any():
+        for event in parser.feed(chunk):
+            yield event
+    for event in parser.close():
+        yield event
@@ -0,0 +1,180 @@
+import re
+from array import array
+from collections import Counter
+import numpy as np
+from rate_limiter import CHARS_PER_TOKEN
+
+# Sentence boundary: terminal punctuation (plus closing quotes/brackets) followed by whitespace
+# and an upper-case letter or digit, or a blank line. The whitespace is group 1 or group 2.
+_BOUNDARY = re.compile(r"""[.!?]+["')\]]*(\s+)(?=["'(\[]?[A-Z0-9])|(\n[ \t]*\n\s*)""")
+
+_WORD = re.compile(r"[^\W_]+")
+
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been before being but by can could did do does
+for from had has have he her here his how i if in into is it its just more most no not of on
+only or other our out over she should so some such than that the their them then there these
+they this those to too up very was we were what when where which who will with would you your
+""".split())
+
+
+def _cut(text, limit):
+    """
+    Index to split `text` at so the first part has at most `limit` characters, at whitespace if possible.
+    Private function.
+    """
+    cut = text.rfind(" ", 0, limit)
+    return cut if cut > 0 else limit
+
+
+def _clean(text):
+    return " ".join(text.split())
+
+
+def _pieces(text, limit):
+    """
+    Yields `text` whitespace-normalized, split into pieces of at most `limit` characters.
+    Private function.
+    """
+    while len(text) > limit:
+        cut = _cut(text, limit)
+        piece = _clean(text[:cut])
+        if piece:
+            yield piece
+        text = text[cut:]
+    piece = _clean(text)
+    if piece:
+        yield piece
+
+
+def iter_sentences(chunks, max_sentence_chars=1000):
+    """
+    Splits text into sentences as it arrives.
+
+    Only the unfinished tail of the text is buffered between chunks, and a "sentence" that runs
+    past `max_sentence_chars` (a table, a list without punctuation) is split at whitespace, so
+    the buffer stays small however large the document is.
+
+    Args:
+        chunks (str | Iterable[str]): The text, whole or in pieces.
+        max_sentence_chars (int, optional): Longest sentence yielded. Defaults to 1000.
+
+    Yields:
+        str: Whitespace-normalized sentences in document order.
+    """
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        position = 0
+        for match in _BOUNDARY.finditer(buffer):
+            if match.end() == len(buffer):
+                break  # The boundary may continue in the next chunk.
+            start, end = match.span(1) if match.group(1) is not None else match.span(2)
+            yield from _pieces(buffer[position:start], max_sentence_chars)
+            position = end
+        buffer = buffer[position:]
+        while len(buffer) > max_sentence_chars:
+            cut = _cut(buffer, max_sentence_chars)
+            yield from _pieces(buffer[:cut], max_sentence_chars)
+            buffer = buffer[cut:]
+    yield from _pieces(buffer, max_sentence_chars)
+
+
+def _terms(sentence):
+    return Counter(word for word in _WORD.findall(sentence.lower()) if len(word) > 1 and word not in STOPWORDS)
+
+
+def score_sentences(term_rows, term_cols, term_counts, sentence_count, vocabulary_size):
+    """
+    Scores sentences by TF-IDF cosine similarity to the centroid of the other sentences, so a
+    sentence sharing no terms with the rest of the document scores 0.
+
+    The sentence-term matrix is given in coordinate form (one entry per distinct term of a
+    sentence), and everything is computed with `np.bincount` over those entries, so the cost is
+    linear in the size of the document rather than quadratic in the number of sentences as with
+    pairwise-similarity methods like TextRank.
+
+    Args:
+        term_rows (np.ndarray): Sentence index of each entry.
+        term_cols (np.ndarray): Term index of each entry.
+        term_counts (np.ndarray): Occurrences of the term in the sentence.
+        sentence_count (int): Number of sentences (rows).
+        vocabulary_size (int): Number of distinct terms (columns).
+
+    Returns:
+        np.ndarray: One score per sentence; sentences without terms score 0.
+    """
+    if not len(term_rows):
+        return np.zeros(sentence_count)
+    document_frequency = np.bincount(term_cols, minlength=vocabulary_size)
+    idf = np.log((1 + sentence_count) / (1 + document_frequency)) + 1
+    weights = (1 + np.log(term_counts)) * idf[term_cols]
+    norms = np.sqrt(np.bincount(term_rows, weights * weights, minlength=sentence_count))
+    weights /= norms[term_rows]
+    total = np.bincount(term_cols, weights, minlength=vocabulary_size)
+    # Each non-empty row has unit norm, so removing the sentence's own contribution subtracts 1.
+    own = norms > 0
+    similarity = np.bincount(term_rows, weights * total[term_cols], minlength=sentence_count) - own
+    similarity[similarity < 1e-9] = 0  # Rounding left over from the subtraction.
+    return similarity / max(1, sentence_count - 1)
+
+
+def summarize(text, max_tokens=256, max_sentences=20_000, max_sentence_chars=1000):
+    """
+    Extractive summary: the sentences most central to the text, in their original order,
+    within an estimated `max_tokens` tokens.
+
+    Sentences are streamed from `text` and only their terms (as compact integer arrays) and text
+    are kept; repeated sentences such as page boilerplate are kept once. At most `max_sentences`
+    sentences are read, which bounds memory for arbitrarily large input.
+
+    Args:
+        text (str | Iterable[str]): The document, whole or in chunks.
+        max_tokens (int, optional): Token budget of the summary (estimated at CHARS_PER_TOKEN characters per token). Defaults to 256.
+        max_sentences (int, optional): Most sentences read from the document. Defaults to 20,000.
+        max_sentence_chars (int, optional): Longer sentences are split. Defaults to 1000.
+
+    Returns:
+        str: The summary; the text itself (whitespace-normalized) if it already fits the budget.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    sentences = []
+    seen = set()
+    vocabulary = {}
+    rows, cols, counts = array("q"), array("q"), array("d")
+    total_chars = 0
+    for sentence in iter_sentences(text, max_sentence_chars):
+        if len(sentences) >= max_sentences:
+            break
+        if sentence in seen:
+            continue
+        seen.add(sentence)
+        index = len(sentences)
+        sentences.append(sentence)
+        total_chars += len(sentence) + 1
+        for term, count in _terms(sentence).items():
+            rows.append(index)
+            cols.append(vocabulary.setdefault(term, len(vocabulary)))
+            counts.append(count)
+
+    if total_chars - 1 <= max_chars:
+        return " ".join(sentences)
+
+    scores = score_sentences(np.frombuffer(rows, dtype=np.int64), np.frombuffer(cols, dtype=np.int64),
+                             np.frombuffer(counts, dtype=np.float64), len(sentences), len(vocabulary))
+    # Sentences unrelated to the rest of the text are only used when nothing else is.
+    candidates = np.flatnonzero(scores > 0) if scores.any() else np.arange(len(sentences))
+    chosen = []
+    used = -1  # No separator before the first sentence.
+    for index in candidates[np.argsort(-scores[candidates], kind="stable")]:
+        length = len(sentences[index]) + 1
+        if used + length <= max_chars:
+            chosen.append(index)
+            used += length
+    if not chosen:
+        # Even the best sentence is over budget; keep its beginning.
+        best = sentences[candidates[int(np.argmax(scores[candidates]))]]
+        return best[:_cut(best, max_chars)]
+    return " ".join(sentences[index] for index in sorted(chosen))
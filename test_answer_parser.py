@@ -0,0 +1,33 @@
+from answer_parser import AnswerParser, parse_answer, result_record
+
+OUTPUT = "Let me think.\n<reasoning>\n3x = 16, so x = 16/3.\n</reasoning>\n<answer>\n16/3\n</answer>\nExtra text"
+
+
+def test_parse_complete_output():
+    assert parse_answer(OUTPUT) == {"reasoning": "3x = 16, so x = 16/3.", "answer": "16/3"}
+
+
+def test_incremental_feed_handles_tags_split_across_chunks():
+    parser = AnswerParser()
+    finished_at = None
+    for i, char in enumerate(OUTPUT):
+        if parser.feed(char) and finished_at is None:
+            finished_at = i
+    assert OUTPUT[:finished_at + 1].endswith("</answer>")
+    assert parser.reasoning == "3x = 16, so x = 16/3."
+    assert parser.answer == "16/3"
+    assert parser.text == OUTPUT
+
+
+def test_answer_without_reasoning_and_incomplete_output():
+    assert parse_answer("<answer>7</answer>") == {"reasoning": None, "answer": "7"}
+    assert parse_answer("<reasoning>still thinking") == {"reasoning": None, "answer": None}
+    assert parse_answer("<reasoning>done</reasoning><answer>8") == {"reasoning": "done", "answer": None}
+
+
+def test_result_record_keeps_raw_completion_only_when_unparsed():
+    assert result_record("Solve", OUTPUT, id="q1") == {
+        "prompt": "Solve", "id": "q1", "reasoning": "3x = 16, so x = 16/3.", "answer": "16/3"
+    }
+    record = result_record("Solve", "x = 5")
+    assert record["answer"] is None and record["completion"] == "x = 5"
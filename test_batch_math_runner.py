@@ -0,0 +1,83 @@
+import json
+import asyncio
+import pytest
+from batch_math_runner import run_batch, load_completed_ids, iter_problems
+
+
+class FakeBackend:
+    name = "fake"
+
+    def __init__(self, fail=(), delay=0.01):
+        self.fail = set(fail)
+        self.delay = delay
+        self.seen = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def solve(self, prompt):
+        self.seen.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if prompt in self.fail:
+                raise RuntimeError("backend down")
+            return f"<reasoning>{prompt} is easy</reasoning><answer>42</answer> trailing"
+        finally:
+            self.in_flight -= 1
+
+
+def write_problems(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"id": f"q{i}", "prompt": f"problem {i}"}) + "\n")
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.asyncio
+async def test_run_batch_bounds_concurrency_and_records_every_problem(tmp_path):
+    problems, output = tmp_path / "problems.jsonl", tmp_path / "results.jsonl"
+    write_problems(problems, 20)
+    backend = FakeBackend()
+    counts = await run_batch(str(problems), str(output), backend, concurrency=4, fsync_every=5)
+    assert counts == {"skipped": 0, "succeeded": 20, "failed": 0}
+    assert backend.max_in_flight == 4
+    records = read_records(output)
+    assert sorted(r["id"] for r in records) == sorted(f"q{i}" for i in range(20))
+    assert all(r["answer"] == "42" and r["reasoning"].endswith("is easy") for r in records)
+    assert all("completion" not in r for r in records)
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_completed_and_retries_failed(tmp_path):
+    problems, output = tmp_path / "problems.jsonl", tmp_path / "results.jsonl"
+    write_problems(problems, 6)
+    first = await run_batch(str(problems), str(output), FakeBackend(fail={"problem 2"}), concurrency=3)
+    assert first == {"skipped": 0, "succeeded": 5, "failed": 1}
+
+    backend = FakeBackend()
+    second = await run_batch(str(problems), str(output), backend, concurrency=3)
+    assert second == {"skipped": 5, "succeeded": 1, "failed": 0}
+    assert backend.seen == ["problem 2"]
+    assert load_completed_ids(str(output)) == {f"q{i}" for i in range(6)}
+
+
+def test_torn_last_line_is_truncated_on_resume(tmp_path):
+    output = tmp_path / "results.jsonl"
+    output.write_text(json.dumps({"id": "q0", "generated_output": "ok"}) + "\n" + '{"id": "q1", "gener')
+    assert load_completed_ids(str(output)) == {"q0"}
+    assert output.read_text().endswith("\n")
+    assert len(output.read_text().splitlines()) == 1
+
+
+def test_malformed_input_lines_are_skipped_with_their_line_number(tmp_path, capsys):
+    path = tmp_path / "problems.jsonl"
+    path.write_text('{"id": "a", "prompt": "1+1"}\n{"prompt": "2+\n[1, 2]\n{"problem": "3+3"}\n', encoding="utf-8")
+    assert list(iter_problems(path)) == [("a", "1+1"), ("4", "3+3")]
+    errors = capsys.readouterr().err
+    assert "Skipping line 2: invalid JSON" in errors
+    assert "Skipping line 3: not a JSON object" in errors
@@ -0,0 +1,182 @@
+import json
+import gc
+import warnings
+import asyncio
+import pytest
+from aiohttp import web
+import tools
+import log_sink
+from deepseek_api import DeepSeekClient
+
+
+async def sse_response(request, chunks):
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    for chunk in chunks:
+        await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+    await response.write(b"data: [DONE]\n\n")
+    return response
+
+
+def delta(**fields):
+    return {"choices": [{"index": 0, "delta": fields, "finish_reason": None}]}
+
+
+@pytest.mark.asyncio
+async def test_stream_chat_collects_reasoning_and_content(stub_server):
+    async def handler(request):
+        body = await request.json()
+        assert body["stream"] is True
+        return await sse_response(request, [
+            delta(role="assistant"),
+            delta(reasoning_content="2 + 2 "), delta(reasoning_content="is 4."),
+            delta(content="4"),
+            {"choices": [], "usage": {"total_tokens": 12}},
+        ])
+
+    base_url = await stub_server({"/v1/chat/completions": handler}) + "/v1"
+    seen = []
+    async with DeepSeekClient(api_key="test", base_url=base_url, rate_limiter=None) as client:
+        result = await client.stream_chat([{"role": "user", "content": "2+2?"}], model="deepseek-reasoner",
+                                          on_delta=lambda kind, text: seen.append(kind))
+
+    assert result["reasoning_content"] == "2 + 2 is 4."
+    assert result["content"] == "4"
+    assert result["usage"] == {"total_tokens": 12}
+    assert seen == ["reasoning", "reasoning", "content"]
+
+
+@pytest.mark.asyncio
+async def test_deepseek_chat_reasoner_makes_a_single_request(monkeypatch, tmp_path, stub_server):
+    requests_seen = []
+
+    async def handler(request):
+        requests_seen.append(await request.json())
+        return await sse_response(request, [delta(reasoning_content="Because."), delta(content="Paris")])
+
+    base_url = await stub_server({"/v1/chat/completions": handler}) + "/v1"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DeepSeek_API_Key", "test")
+    monkeypatch.setattr(tools, "_deepseek_client", DeepSeekClient(api_key="test", base_url=base_url, rate_limiter=None))
+    try:
+        answer = await tools.deepseek_chat("Capital of France?", model="deepseek-reasoner")
+    finally:
+        await tools._deepseek_client.aclose()
+
+    assert answer == "Paris"
+    assert len(requests_seen) == 1
+    log_sink.flush_all()
+    log = json.loads((tmp_path / "deepseek_calls.jsonl").read_text())
+    assert log["train_of_thought"] == "Because." and log["success"] is True
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunks", [
+    [delta(reasoning_content="Paris is the capital of France, because")],
+    [delta(reasoning_content="Paris is the capital"), {"choices": [{"index": 0, "delta": {"content": "Pa"}, "finish_reason": "length"}]}],
+])
+async def test_deepseek_chat_reasoner_asks_again_when_reasoning_used_up_the_tokens(monkeypatch, tmp_path, stub_server, chunks):
+    requests_seen = []
+
+    async def handler(request):
+        body = await request.json()
+        requests_seen.append(body)
+        if body["stream"]:
+            return await sse_response(request, chunks)
+        return web.json_response({"choices": [{"message": {"role": "assistant", "content": "Paris"}, "finish_reason": "stop"}]})
+
+    answer = await run_deepseek_chat(stub_server, monkeypatch, tmp_path, handler, model="deepseek-reasoner")
+    assert answer == "Paris"
+    assert [r["stream"] for r in requests_seen] == [True, False]
+    assert requests_seen[1]["messages"][2]["content"] == chunks[0]["choices"][0]["delta"]["reasoning_content"]
+
+@pytest.mark.asyncio
+async def test_deepseek_chat_reports_http_errors(monkeypatch, tmp_path, stub_server):
+    async def handler(request):
+        return web.json_response({"error": "bad key"}, status=401)
+
+    base_url = await stub_server({"/v1/chat/completions": handler}) + "/v1"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DeepSeek_API_Key", "test")
+    monkeypatch.setattr(tools, "_deepseek_client", DeepSeekClient(api_key="test", base_url=base_url, rate_limiter=None))
+    try:
+        answer = await tools.deepseek_chat("hi")
+    finally:
+        await tools._deepseek_client.aclose()
+
+    assert answer.startswith("Error calling DeepSeek API")
+    assert "401" in answer
+
+
+async def run_deepseek_chat(stub_server, monkeypatch, tmp_path, handler, **kwargs):
+    base_url = await stub_server({"/v1/chat/completions": handler}) + "/v1"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DeepSeek_API_Key", "test")
+    monkeypatch.delenv("DEEPSEEK_TWO_PASS", raising=False)
+    monkeypatch.setattr(tools, "_deepseek_client", DeepSeekClient(api_key="test", base_url=base_url, rate_limiter=None))
+    try:
+        return await tools.deepseek_chat("What is 6*7?", **kwargs)
+    finally:
+        await tools._deepseek_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_deepseek_chat_single_call_uses_json_output(monkeypatch, tmp_path, stub_server):
+    requests_seen = []
+
+    async def handler(request):
+        body = await request.json()
+        requests_seen.append(body)
+        reply = json.dumps({"reasoning": "6*7 is 42.", "answer": "42"})
+        return await sse_response(request, [delta(content=reply[:10]), delta(content=reply[10:])])
+
+    answer = await run_deepseek_chat(stub_server, monkeypatch, tmp_path, handler)
+    assert answer == "42"
+    assert len(requests_seen) == 1
+    assert requests_seen[0]["response_format"] == {"type": "json_object"}
+    log_sink.flush_all()
+    log = json.loads((tmp_path / "deepseek_calls.jsonl").read_text())
+    assert log["train_of_thought"] == "6*7 is 42."
+
+
+@pytest.mark.asyncio
+async def test_deepseek_chat_falls_back_to_second_request(monkeypatch, tmp_path, stub_server):
+    requests_seen = []
+
+    async def handler(request):
+        body = await request.json()
+        requests_seen.append(body)
+        if body["stream"]:
+            return await sse_response(request, [delta(content="6*7 is 42, so")])
+        return web.json_response({"choices": [{"message": {"role": "assistant", "content": "42"}, "finish_reason": "stop"}]})
+
+    # Unparseable JSON-mode reply: a second request asks for the answer.
+    assert await run_deepseek_chat(stub_server, monkeypatch, tmp_path, handler) == "42"
+    assert [r["stream"] for r in requests_seen] == [True, False]
+    assert requests_seen[1]["messages"][2] == {"role": "assistant", "content": "6*7 is 42, so"}
+
+    # The switch restores the old flow without JSON mode.
+    requests_seen.clear()
+    assert await run_deepseek_chat(stub_server, monkeypatch, tmp_path, handler, _two_pass=True) == "42"
+    assert [r["stream"] for r in requests_seen] == [True, False]
+    assert "response_format" not in requests_seen[0]
+
+
+def test_sessions_replaced_across_loops_close_their_connections(threaded_server):
+    client = DeepSeekClient(api_key="test")
+    sessions = []
+
+    async def use():
+        session = client._get_session()
+        sessions.append(session)
+        async with session.get(threaded_server) as response:
+            await response.read()
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ResourceWarning)
+        asyncio.run(use())
+        asyncio.run(use())
+        assert sessions[0].closed and not sessions[1].closed
+        asyncio.run(client.aclose())
+        gc.collect()
+    assert not [warning for warning in caught if issubclass(warning.category, ResourceWarning)]
\ No newline at end of file
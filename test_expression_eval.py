@@ -0,0 +1,68 @@
+import time
+import numpy as np
+import pytest
+from expression_eval import compile_expression, evaluate, ExpressionError
+from tools import calculate
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("2 + 3 * 4", 14),
+    ("2 ** 100", 2 ** 100),
+    ("-2 ** 2", -4),
+    ("7 // 2 + 7 % 2", 4),
+    ("sqrt(16) + max(2, 7)", 11.0),
+    ("1 < 2 <= 2 != 3", True),
+    ("round(pi * 100)", 314),
+])
+def test_evaluates_supported_expressions(expression, expected):
+    assert evaluate(expression) == expected
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("9 ** 9 ** 9", "Exponent"),
+    ("10 ** 5000", "bits"),
+    ("2.0 ** 5000", "too large"),
+    ("1 / 0", "division by zero"),
+    ("(-8) ** (1 / 3)", "not a real number"),
+    ("__import__('os')", "Unsupported function"),
+    ("(1).real", "Unsupported expression"),
+    ("x + 1", "Unknown name: x"),
+    ("1 +", "Invalid expression"),
+    ("+".join(["1"] * 400), "nodes"),
+])
+def test_rejects_unsafe_or_invalid_expressions(expression, message):
+    started = time.monotonic()
+    with pytest.raises(ExpressionError, match=message):
+        evaluate(expression)
+    assert time.monotonic() - started < 0.5
+
+
+def test_compiled_expressions_are_cached():
+    assert compile_expression("a * b + 1") is compile_expression("a * b + 1")
+    assert compile_expression("a * b + 1").variables == {"a", "b"}
+    assert evaluate("a * b + 1", {"a": 3, "b": 4}) == 13
+
+
+def test_evaluate_many_checks_candidates_in_bulk():
+    is_root = compile_expression("x ** 2 - 5 * x + 6 == 0")
+    assert is_root.evaluate_many({"x": range(6)}).tolist() == [False, False, True, True, False, False]
+    assert is_root.evaluate_many([{"x": 2}, {"x": 4}]).tolist() == [True, False]
+    # Math errors only affect their own element.
+    values = compile_expression("1 / x + sqrt(x)").evaluate_many({"x": [0, -1, 4], "unused": 1})
+    assert np.isinf(values[0]) and np.isnan(values[1]) and values[2] == 2.25
+
+
+def test_evaluate_many_reports_bad_bindings_as_expression_errors():
+    expression = compile_expression("x + y")
+    assert expression.evaluate_many([{"x": 1, "y": 2, "z": 0}]).tolist() == [3.0]
+    with pytest.raises(ExpressionError, match="Unknown name: y in binding 1"):
+        expression.evaluate_many([{"x": 1, "y": 2}, {"x": 3}])
+    with pytest.raises(ExpressionError, match="Binding 0"):
+        expression.evaluate_many([[1, 2]])
+    with pytest.raises(ExpressionError):
+        expression.evaluate_many({"x": ["a"], "y": [1]})
+
+
+def test_calculate_tool_reports_errors_as_text():
+    assert calculate("3 * (4 + 5) ** 2") == "243"
+    assert calculate("9**9**9").startswith("Error during calculation: Exponent")
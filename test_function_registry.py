@@ -0,0 +1,143 @@
+import json
+import time
+import asyncio
+import pytest
+from function_registry import FunctionRegistry, registry as real_registry
+
+
+def make_registry():
+    registry = FunctionRegistry(max_workers=4)
+
+    def slow_sync(x: str) -> str:
+        time.sleep(0.2)
+        return f"sync:{x}"
+
+    async def slow_async(x: str) -> str:
+        await asyncio.sleep(0.2)
+        return f"async:{x}"
+
+    async def hangs(x: str) -> str:
+        await asyncio.sleep(10)
+        return x
+
+    def fails(x: str) -> str:
+        raise RuntimeError("boom")
+
+    registry.register_function("slow_sync", slow_sync, description="", parameters={"x": "x"})
+    registry.register_function("slow_async", slow_async, description="", parameters={"x": "x"})
+    registry.register_function("hangs", hangs, description="", parameters={"x": "x"}, timeout=0.1)
+    registry.register_function("fails", fails, description="", parameters={"x": "x"})
+    return registry
+
+
+@pytest.mark.asyncio
+async def test_sync_and_async_tools_run_concurrently_without_blocking_the_loop():
+    registry = make_registry()
+    start = time.monotonic()
+    results = await asyncio.gather(
+        registry.acall_function("slow_sync", {"x": "a"}),
+        registry.acall_function("slow_sync", {"x": "b"}),
+        registry.acall_function("slow_async", {"x": "c"}),
+    )
+    assert results == ["sync:a", "sync:b", "async:c"]
+    assert time.monotonic() - start < 0.4
+
+
+@pytest.mark.asyncio
+async def test_registered_and_call_timeouts():
+    registry = make_registry()
+    assert "timed out after 0.1s" in await registry.acall_function("hangs", {"x": "a"})
+    assert "timed out after 0.05s" in await registry.acall_function("slow_async", {"x": "a"}, timeout=0.05)
+
+
+@pytest.mark.asyncio
+async def test_errors_are_returned_as_strings():
+    registry = make_registry()
+    assert "not found" in await registry.acall_function("missing", {})
+    assert "Missing required parameters: x" in await registry.acall_function("slow_sync", {})
+    assert "boom" in await registry.acall_function("fails", {"x": "a"})
+    assert "Missing required parameters: x" in await registry.acall_function("slow_sync", None)
+    assert "Missing required parameters: x" in registry.call_function("slow_sync", None)
+
+
+@pytest.mark.asyncio
+async def test_timeouts_raised_by_a_tool_are_reported_as_tool_errors():
+    registry = FunctionRegistry(max_workers=1)
+
+    def socket_timeout(x: str) -> str:
+        raise TimeoutError("timed out")
+
+    async def async_timeout(x: str) -> str:
+        raise asyncio.TimeoutError()
+
+    registry.register_function("socket_timeout", socket_timeout, description="", parameters={"x": "x"})
+    registry.register_function("async_timeout", async_timeout, description="", parameters={"x": "x"}, timeout=5)
+    assert await registry.acall_function("socket_timeout", {"x": "a"}) == \
+        "Error: An error occurred while calling function 'socket_timeout': timed out"
+    assert "An error occurred while calling function 'async_timeout'" in await registry.acall_function("async_timeout", {"x": "a"})
+
+
+def test_call_function_runs_async_tools_outside_a_loop():
+    registry = make_registry()
+    assert registry.call_function("slow_async", {"x": "a"}) == "async:a"
+    assert registry.call_function("slow_sync", {"x": "a"}) == "sync:a"
+
+
+def test_tool_declarations_are_cached_until_a_function_is_registered():
+    registry = make_registry()
+    declarations = registry.tool_declarations()
+    assert registry.tool_declarations() is declarations
+    assert [d["name"] for d in declarations[0]["functionDeclarations"]] == ["slow_sync", "slow_async", "hangs", "fails"]
+    assert json.loads(declarations.serialized) == declarations
+
+    subset = registry.tool_declarations(["fails", "slow_sync"])
+    assert subset.names == ["slow_sync", "fails"] and registry.tool_declarations(["slow_sync", "fails"]) is subset
+
+    registry.register_function("extra", lambda x: x, description="", parameters={"x": "x"})
+    assert registry.tool_declarations() is not declarations
+    assert "extra" in registry.tool_declarations().names
+
+
+def test_select_tools_ranks_by_relevance_and_falls_back_to_all():
+    registry = FunctionRegistry(max_workers=1)
+    registry.register_function("web_search", lambda query: query, description="Searches the web for information.",
+                               parameters={"query": "The search query"})
+    registry.register_function("calculate", lambda expression: expression,
+                               description="Calculates a mathematical expression.",
+                               parameters={"expression": "The mathematical expression to calculate"})
+    registry.register_function("summarize_text", lambda text: text, description="Summarizes the given text.",
+                               parameters={"text": "The text to be summarized"})
+    assert registry.select_tools("Please calculate 17 * 23") == ["calculate"]
+    assert set(registry.select_tools("Search the news and summarise it")) == {"web_search", "summarize_text"}
+    assert len(registry.select_tools("Search the news and summarise it", max_tools=1)) == 1
+    assert registry.select_tools("tell me a joke", max_tools=1) == ["web_search", "calculate", "summarize_text"]
+
+
+def test_arguments_are_coerced_before_dispatch():
+    registry = FunctionRegistry(max_workers=1)
+
+    def repeat(text: str, times: int = 1) -> str:
+        return text * times
+
+    registry.register_function("repeat", repeat, description="", parameters={"text": "Text"})
+    assert registry.call_function("repeat", {"text": "ab", "times": "3"}) == "ababab"
+    assert registry.call_function("repeat", {"text": "ab", "times": "x"}) == \
+        "Error: 'times' must be an integer, got 'x' for function repeat"
+    assert registry.tool_declarations()[0]["functionDeclarations"][0]["parameters"]["required"] == ["text"]
+
+
+@pytest.mark.parametrize("request_text, needed", [
+    ("Summarize https://example.com for me", {"web_scraper", "summarize_text"}),
+    ("Find the latest news about Python and summarize it", {"web_search", "summarize_text"}),
+    ("Search the web for the population of France and compute its square root", {"web_search", "calculate"}),
+    ("Read http://example.org/post and ask DeepSeek what it thinks", {"web_scraper", "deepseek_chat"}),
+    ("What is 2**10 + sqrt(49)?", {"calculate"}),
+])
+def test_select_tools_on_the_real_registry_keeps_every_tool_a_request_needs(request_text, needed):
+    assert needed <= set(real_registry.select_tools(request_text, max_tools=3))
+
+
+def test_deepseek_two_pass_switch_is_not_offered_to_the_model():
+    properties = real_registry.schemas["deepseek_chat"].parameters["properties"]
+    assert set(properties) == {"prompt", "model"}
+    assert real_registry.schemas["deepseek_chat"].validate({"prompt": "p", "_two_pass": True}) == {"prompt": "p"}
@@ -0,0 +1,66 @@
+import gc
+import warnings
+import asyncio
+import pytest
+from aiohttp import web
+from gemini_api import GeminiAPIWrapper
+from function_registry import ToolDeclarations
+
+
+@pytest.mark.asyncio
+async def test_call_gemini_api_many_preserves_order_and_reports_errors(stub_server):
+    """Results come back in input order and a failing prompt does not abort the batch"""
+    async def handler(request):
+        body = await request.json()
+        text = body["contents"][0]["parts"][0]["text"]
+        if text == "bad":
+            return web.json_response({"error": "bad request"}, status=400)
+        return web.json_response({"candidates": [{"content": {"parts": [{"text": text.upper()}]}}]})
+
+    base_url = await stub_server({"/v1beta/models/{model_action}": handler}) + "/v1beta"
+    async with GeminiAPIWrapper(api_key="test", base_url=base_url, max_retries=1) as gemini:
+        prompts = [f"p{i}" for i in range(20)] + ["bad"]
+        results = await gemini.call_gemini_api_many(prompts, concurrency=4)
+
+    assert [r["prompt"] for r in results] == prompts
+    assert [r["result"] for r in results[:-1]] == [p.upper() for p in prompts[:-1]]
+    assert all(r["error"] is None for r in results[:-1])
+    assert results[-1]["result"] is None
+    assert "400" in results[-1]["error"]
+
+
+@pytest.mark.asyncio
+async def test_preserialized_tool_declarations_are_sent_in_the_body(stub_server):
+    received = []
+
+    async def handler(request):
+        received.append(await request.json())
+        return web.json_response({"candidates": [{"content": {"parts": [{"text": "ok"}]}}]})
+
+    tools = ToolDeclarations([{"name": "calculate", "description": "Calculates.", "parameters": {"type": "OBJECT"}}])
+    base_url = await stub_server({"/v1beta/models/{model_action}": handler}) + "/v1beta"
+    async with GeminiAPIWrapper(api_key="test", base_url=base_url, max_retries=1) as gemini:
+        await gemini.generate_content([{"role": "user", "parts": [{"text": "hi"}]}], tools=tools)
+
+    assert received[0]["tools"] == [{"functionDeclarations": [tools[0]["functionDeclarations"][0]]}]
+    assert received[0]["contents"][0]["parts"][0]["text"] == "hi"
+
+
+def test_sessions_replaced_across_loops_close_their_connections(threaded_server):
+    gemini = GeminiAPIWrapper(api_key="test")
+    sessions = []
+
+    async def use():
+        session = gemini._get_session()
+        sessions.append(session)
+        async with session.get(threaded_server) as response:
+            await response.read()
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ResourceWarning)
+        asyncio.run(use())
+        asyncio.run(use())
+        assert sessions[0].closed and not sessions[1].closed
+        asyncio.run(gemini.aclose())
+        gc.collect()
+    assert not [warning for warning in caught if issubclass(warning.category, ResourceWarning)]
\ No newline at end of file
@@ -0,0 +1,90 @@
+import pytest
+from aiohttp import web
+import tools
+from http_fetch import Fetcher, HttpCache
+from html_extract import HtmlTextExtractor, extract_text, _lxml_etree
+
+BACKENDS = ["html.parser", pytest.param("lxml", marks=pytest.mark.skipif(_lxml_etree is None, reason="lxml not installed"))]
+
+PAGE = (
+    "<html><head><title>T</title><style>p{color:red}</style><script>var x = '<p>no</p>';</script></head>"
+    "<body><nav><a href='/'>Home</a></nav><h1>Hello   world</h1>"
+    "<p>Para &amp; one.</p><p>Line\n two café</p></body></html>"
+)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_skips_code_and_navigation(backend):
+    assert extract_text(PAGE, backend=backend) == "T Hello world Para & one. Line two café"
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_byte_by_byte_feeding_decodes_charset(backend):
+    data = PAGE.encode("latin-1")
+    extractor = HtmlTextExtractor(backend=backend)
+    for i in range(len(data)):
+        extractor.feed(data[i:i + 1], "latin-1")
+    assert extractor.close() == "T Hello world Para & one. Line two café"
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_character_budget_stops_parsing(backend):
+    extractor = HtmlTextExtractor(max_chars=50, backend=backend)
+    body = "<html><body>" + "<p>lorem ipsum dolor sit amet</p>" * 1000
+    assert extractor.feed(body)
+    assert extractor.feed("<p>ignored</p>")
+    text = extractor.close()
+    assert len(text) == 50 and text.startswith("lorem ipsum")
+
+
+@pytest.mark.asyncio
+async def test_web_scraper_stops_downloading_at_budget(monkeypatch, stub_server):
+    page = "<html><body>" + ("<p>" + "word " * 200 + "</p>\n") * 2000  # ~2 MB
+
+    async def handler(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+        await response.prepare(request)
+        data = page.encode()
+        for start in range(0, len(data), 64 * 1024):
+            await response.write(data[start:start + 64 * 1024])
+        return response
+
+    base = await stub_server({"/page": handler})
+    fetcher = Fetcher()
+    monkeypatch.setattr(tools, "_fetcher", fetcher)
+    try:
+        extractor = HtmlTextExtractor(max_chars=1000)
+        result = await fetcher.fetch(base + "/page", on_chunk=extractor.feed_chunk)
+        assert result.truncated and len(result.body) < 256 * 1024
+
+        text = await tools.web_scraper(base + "/page")
+        assert len(text) == tools.SCRAPER_MAX_CHARS and text.startswith("word word")
+    finally:
+        await fetcher.aclose()
+
+
+@pytest.mark.asyncio
+async def test_web_scraper_serves_a_repeated_large_page_from_cache(monkeypatch, stub_server, tmp_path):
+    page = ("<html><body>" + ("<p>" + "word " * 200 + "</p>\n") * 2000).encode()  # ~2 MB
+    hits = 0
+
+    async def handler(request):
+        nonlocal hits
+        hits += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+        await response.prepare(request)
+        for start in range(0, len(page), 64 * 1024):
+            await response.write(page[start:start + 64 * 1024])
+        return response
+
+    base = await stub_server({"/page": handler})
+    fetcher = Fetcher(cache=HttpCache(str(tmp_path / "cache.sqlite")))
+    monkeypatch.setattr(tools, "_fetcher", fetcher)
+    try:
+        first = await tools.web_scraper(base + "/page")
+        second = await tools.web_scraper(base + "/page")
+        assert second == first and len(first) == tools.SCRAPER_MAX_CHARS
+        assert hits == 1
+        assert fetcher.cache.total_bytes < len(page) // 4  # Only the part the extractor read is kept.
+    finally:
+        await fetcher.aclose()
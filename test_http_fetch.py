@@ -0,0 +1,169 @@
+import gc
+import warnings
+import asyncio
+import threading
+import pytest
+from aiohttp import web
+from http_fetch import Fetcher, HttpCache, freshness_lifetime
+
+
+@pytest.mark.asyncio
+async def test_max_age_serves_from_cache_and_etag_revalidates(tmp_path, stub_server):
+    hits = {"fresh": 0, "etag": 0, "nostore": 0}
+
+    async def fresh(request):
+        hits["fresh"] += 1
+        return web.Response(text="fresh", headers={"Cache-Control": "max-age=60"})
+
+    async def etag(request):
+        hits["etag"] += 1
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        return web.Response(text="tagged", headers={"ETag": '"v1"', "Cache-Control": "no-cache"})
+
+    async def nostore(request):
+        hits["nostore"] += 1
+        return web.Response(text="secret", headers={"Cache-Control": "no-store"})
+
+    base = await stub_server({"/fresh": fresh, "/etag": etag, "/nostore": nostore})
+    fetcher = Fetcher(cache=HttpCache(str(tmp_path / "cache.sqlite")))
+    try:
+        first = await fetcher.fetch(base + "/fresh")
+        second = await fetcher.fetch(base + "/fresh")
+        assert (first.from_cache, second.from_cache, second.text()) == (False, True, "fresh")
+        assert hits["fresh"] == 1
+
+        await fetcher.fetch(base + "/etag")
+        revalidated = await fetcher.fetch(base + "/etag")
+        assert revalidated.revalidated and revalidated.text() == "tagged"
+        assert hits["etag"] == 2
+
+        await fetcher.fetch(base + "/nostore")
+        again = await fetcher.fetch(base + "/nostore")
+        assert not again.from_cache and hits["nostore"] == 2
+    finally:
+        await fetcher.aclose()
+
+
+@pytest.mark.asyncio
+async def test_per_host_cap_and_truncation(tmp_path, stub_server):
+    active = {"now": 0, "max": 0}
+
+    async def slow(request):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.05)
+        active["now"] -= 1
+        return web.Response(body=b"x" * 200_000)
+
+    base = await stub_server({"/slow": slow})
+    fetcher = Fetcher(connection_limit_per_host=2)
+    try:
+        results = await asyncio.gather(*(fetcher.fetch(base + "/slow", params={"i": i}) for i in range(6)))
+        assert active["max"] == 2
+        assert all(len(r.body) == 200_000 for r in results)
+        truncated = await fetcher.fetch(base + "/slow", max_bytes=1000)
+        assert truncated.truncated and len(truncated.body) == 1000
+    finally:
+        await fetcher.aclose()
+
+
+@pytest.mark.asyncio
+async def test_partial_body_is_cached_and_extended_when_a_reader_wants_more(tmp_path, stub_server):
+    body = bytes(range(256)) * 2000  # ~500 KB, several read chunks
+    hits = 0
+
+    async def page(request):
+        nonlocal hits
+        hits += 1
+        return web.Response(body=body, headers={"Cache-Control": "max-age=60"})
+
+    def reader(limit):
+        seen = bytearray()
+
+        def on_chunk(chunk, headers):
+            seen.extend(chunk)
+            return len(seen) >= limit
+        return seen, on_chunk
+
+    base = await stub_server({"/page": page})
+    fetcher = Fetcher(cache=HttpCache(str(tmp_path / "cache.sqlite")))
+    try:
+        seen, on_chunk = reader(1)
+        first = await fetcher.fetch(base + "/page", on_chunk=on_chunk)
+        assert first.truncated and not first.from_cache and len(first.body) < len(body)
+
+        seen, on_chunk = reader(1)
+        again = await fetcher.fetch(base + "/page", on_chunk=on_chunk)
+        assert again.from_cache and again.truncated and hits == 1
+
+        # A reader that wants the whole body gets the cached prefix, then the rest, each byte once.
+        seen, on_chunk = reader(len(body) + 1)
+        whole = await fetcher.fetch(base + "/page", on_chunk=on_chunk)
+        assert bytes(seen) == body and whole.body == body and not whole.truncated and hits == 2
+
+        complete = await fetcher.fetch(base + "/page")
+        assert complete.from_cache and complete.body == body and hits == 2
+    finally:
+        await fetcher.aclose()
+
+@pytest.mark.asyncio
+async def test_cache_is_read_and_written_off_the_event_loop(tmp_path, stub_server):
+    threads = []
+
+    class RecordingCache(HttpCache):
+        def get(self, url):
+            threads.append(threading.current_thread())
+            return super().get(url)
+
+        def store(self, *args, **kwargs):
+            threads.append(threading.current_thread())
+            return super().store(*args, **kwargs)
+
+    async def page(request):
+        return web.Response(body=b"x" * 1000, headers={"Cache-Control": "max-age=60"})
+
+    base = await stub_server({"/page": page})
+    fetcher = Fetcher(cache=RecordingCache(str(tmp_path / "cache.sqlite")))
+    try:
+        await fetcher.fetch(base + "/page")
+        assert (await fetcher.fetch(base + "/page")).from_cache
+    finally:
+        await fetcher.aclose()
+    assert len(threads) == 3 and threading.current_thread() not in threads
+
+def test_disk_cache_is_bounded(tmp_path):
+    cache = HttpCache(str(tmp_path / "cache.sqlite"), max_bytes=2500)
+    for i in range(5):
+        cache.store(f"http://example.com/{i}", 200, {"ETag": f'"{i}"'}, b"y" * 1000, ttl=60)
+    assert cache.total_bytes <= 2500
+    assert cache.get("http://example.com/0") is None
+    assert cache.get("http://example.com/4")["headers"]["etag"] == '"4"'
+    cache.close()
+
+
+def test_freshness_lifetime():
+    assert freshness_lifetime({"Cache-Control": "public, max-age=120"}) == 120
+    assert freshness_lifetime({"Cache-Control": "no-store"}) is None
+    assert freshness_lifetime({"Cache-Control": "no-cache, max-age=50"}) == 0
+    assert freshness_lifetime({"Expires": "Thu, 01 Jan 1970 00:00:00 GMT"}) == 0
+    assert freshness_lifetime({}, default_ttl=300) == 300
+
+
+def test_sessions_replaced_across_loops_close_their_connections(threaded_server):
+    fetcher = Fetcher()
+    sessions = []
+
+    async def use():
+        result = await fetcher.fetch(threaded_server)
+        sessions.append(fetcher._session)
+        assert result.status == 200
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ResourceWarning)
+        asyncio.run(use())
+        asyncio.run(use())
+        assert sessions[0].closed and not sessions[1].closed
+        asyncio.run(fetcher.aclose())
+        gc.collect()
+    assert not [warning for warning in caught if issubclass(warning.category, ResourceWarning)]
\ No newline at end of file
@@ -0,0 +1,85 @@
+import gzip
+import json
+import threading
+from log_sink import JsonlLogSink, get_sink, flush_all
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_concurrent_writers_produce_whole_lines(tmp_path):
+    path = tmp_path / "calls.jsonl"
+    sink = JsonlLogSink(str(path), batch_size=64)
+
+    def writer(n):
+        for i in range(500):
+            sink.write({"writer": n, "i": i, "text": "x" * 200})
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sink.close()
+
+    records = read_lines(path)
+    assert len(records) == 4000
+    for n in range(8):
+        assert [r["i"] for r in records if r["writer"] == n] == list(range(500))
+
+
+def test_flush_makes_queued_records_visible(tmp_path):
+    path = tmp_path / "calls.jsonl"
+    sink = JsonlLogSink(str(path), flush_interval=60)
+    sink.write({"a": 1})
+    sink.flush()
+    assert read_lines(path) == [{"a": 1}]
+    sink.close()
+
+
+def test_size_rotation_with_gzip(tmp_path):
+    path = tmp_path / "calls.jsonl"
+    sink = JsonlLogSink(str(path), max_bytes=1000, compress=True, batch_size=1)
+    for i in range(50):
+        sink.write({"i": i, "pad": "y" * 50})
+    sink.close()
+
+    rotated = sorted(tmp_path.glob("calls.*.jsonl.gz"))
+    assert sink.rotations == len(rotated) > 0
+    records = []
+    for archive in rotated:
+        with gzip.open(archive, "rt", encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f)
+    records.extend(read_lines(path))
+    assert sorted(r["i"] for r in records) == list(range(50))
+    assert path.stat().st_size <= 1000
+
+
+def test_get_sink_shares_one_writer_per_path(tmp_path):
+    path = str(tmp_path / "shared.jsonl")
+    assert get_sink(path) is get_sink(path)
+    get_sink(path).write({"ok": True})
+    flush_all()
+    assert read_lines(path) == [{"ok": True}]
+
+
+def test_flush_racing_close_never_hangs(tmp_path):
+    sink = JsonlLogSink(str(tmp_path / "race.jsonl"))
+    put = sink._queue.put
+    closer = threading.Thread(target=sink.close, daemon=True)
+
+    def put_after_close_starts(item):
+        # Let `close` run between flush's closed-check and its queueing of the flush marker.
+        if isinstance(item, threading.Event) and not closer.is_alive():
+            closer.start()
+            closer.join(timeout=0.2)
+        put(item)
+
+    sink._queue.put = put_after_close_starts
+    flusher = threading.Thread(target=sink.flush, daemon=True)
+    flusher.start()
+    flusher.join(timeout=2)
+    closer.join(timeout=2)
+    assert not flusher.is_alive() and not closer.is_alive()
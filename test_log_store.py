@@ -0,0 +1,81 @@
+import gzip
+import json
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from log_store import LogStore, compact, source_name
+
+
+def write_jsonl(path, records, compress=False):
+    opener = gzip.open if compress else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def deepseek_record(day, model, success, latency, tokens):
+    return {
+        "timestamp": f"2025-02-{day:02d}T10:00:00",
+        "input": {"prompt": "p", "model": model},
+        "success": success,
+        "latency_ms": latency,
+        "usage": {"prompt_tokens": 10, "completion_tokens": tokens - 10, "total_tokens": tokens},
+    }
+
+
+@pytest.mark.parametrize("format", ["parquet", "arrow"])
+def test_compact_and_summarize(tmp_path, format):
+    current = tmp_path / "deepseek_calls.jsonl"
+    rotated = tmp_path / "deepseek_calls.20250206T000000.jsonl.gz"
+    write_jsonl(current, [deepseek_record(7, "deepseek-chat", True, 100.0, 50),
+                          deepseek_record(7, "deepseek-chat", False, 300.0, 30)])
+    write_jsonl(rotated, [deepseek_record(6, "deepseek-reasoner", True, 900.0, 200)], compress=True)
+    math = tmp_path / "math_results.jsonl"
+    write_jsonl(math, [{"prompt": "1+1", "reasoning": "r", "answer": "2"}])
+
+    store_dir = tmp_path / "store"
+    assert compact([str(current), str(rotated), str(math)], str(store_dir), format=format) == 4
+    assert (store_dir / "date=2025-02-07" / "model=deepseek-chat").is_dir()
+
+    store = LogStore(str(store_dir), format=format)
+    rows = {row["model"]: row for row in store.summary(source="deepseek_calls")}
+    assert rows["deepseek-chat"]["calls"] == 2
+    assert rows["deepseek-chat"]["success_rate"] == 0.5
+    assert rows["deepseek-chat"]["latency_ms_mean"] == 200.0
+    assert rows["deepseek-chat"]["total_tokens"] == 80
+    assert rows["deepseek-reasoner"]["latency_ms_p50"] == 900.0
+
+    by_date = store.summary(group_by=("date",), date_from="2025-02-07", date_to="2025-02-07")
+    assert [(row["date"], row["calls"]) for row in by_date] == [("2025-02-07", 2)]
+    assert store.table(["model"], model="HarleyCooper/GRPOtuned").num_rows == 1
+
+
+def test_recompacting_replaces_partitions(tmp_path):
+    log = tmp_path / "deepseek_calls.jsonl"
+    write_jsonl(log, [deepseek_record(7, "deepseek-chat", True, 100.0, 50)])
+    store_dir = str(tmp_path / "store")
+    compact([str(log)], store_dir)
+    compact([str(log)], store_dir)
+    assert LogStore(store_dir).table().num_rows == 1
+
+
+def test_source_name_strips_rotation_suffix():
+    assert source_name("/logs/deepseek_calls.20250206T015240.jsonl.gz") == "deepseek_calls"
+    assert source_name("math_results.jsonl") == "math_results"
+
+
+def test_compacting_one_log_keeps_rows_from_other_logs(tmp_path):
+    rotated = tmp_path / "deepseek_calls.20250207T000000.jsonl.gz"
+    current = tmp_path / "deepseek_calls.jsonl"
+    write_jsonl(rotated, [deepseek_record(7, "deepseek-chat", True, 100.0, 50)], compress=True)
+    write_jsonl(current, [deepseek_record(7, "deepseek-chat", True, 200.0, 50)])
+    store_dir = str(tmp_path / "store")
+    compact([str(rotated), str(current)], store_dir)
+
+    # The live log grew; compacting it alone replaces its rows and keeps the rotated file's.
+    write_jsonl(current, [deepseek_record(7, "deepseek-chat", True, 200.0, 50),
+                          deepseek_record(7, "deepseek-chat", True, 300.0, 50)])
+    compact([str(current)], store_dir)
+    latencies = LogStore(store_dir).table(["latency_ms"], date_from="2025-02-07")["latency_ms"].to_pylist()
+    assert sorted(latencies) == [100.0, 200.0, 300.0]
@@ -0,0 +1,75 @@
+import time
+import asyncio
+import pytest
+from micro_batcher import MicroBatcher
+
+
+class RecordingBatchFn:
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+
+    def __call__(self, items, **params):
+        self.batches.append((list(items), params))
+        time.sleep(self.delay)
+        return [f"{item}:{params.get('temperature')}" for item in items]
+
+
+@pytest.mark.asyncio
+async def test_full_batches_dispatch_without_waiting():
+    batch_fn = RecordingBatchFn()
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=5000)
+    start = time.monotonic()
+    results = await asyncio.gather(*(batcher.submit(f"p{i}", temperature=0.0) for i in range(8)))
+    await batcher.aclose()
+    assert results == [f"p{i}:0.0" for i in range(8)]
+    assert [len(items) for items, _ in batch_fn.batches] == [4, 4]
+    assert time.monotonic() - start < 1.0
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_dispatches_after_max_wait():
+    batch_fn = RecordingBatchFn()
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=50)
+    start = time.monotonic()
+    results = await asyncio.gather(*(batcher.submit(f"p{i}") for i in range(3)))
+    elapsed = time.monotonic() - start
+    await batcher.aclose()
+    assert len(results) == 3
+    assert [len(items) for items, _ in batch_fn.batches] == [3]
+    assert 0.04 <= elapsed < 1.0
+
+
+@pytest.mark.asyncio
+async def test_requests_are_grouped_by_parameters():
+    batch_fn = RecordingBatchFn()
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=20)
+    results = await asyncio.gather(
+        batcher.submit("a", temperature=0.0),
+        batcher.submit("b", temperature=1.0),
+        batcher.submit("c", temperature=0.0),
+    )
+    await batcher.aclose()
+    assert results == ["a:0.0", "b:1.0", "c:0.0"]
+    assert sorted((items, params["temperature"]) for items, params in batch_fn.batches) == [
+        (["a", "c"], 0.0), (["b"], 1.0)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_errors_reach_every_caller_and_metrics_are_recorded():
+    def failing(items, **params):
+        raise ValueError("model exploded")
+
+    batcher = MicroBatcher(failing, max_batch_size=2, max_wait_ms=10)
+    results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+    batcher.batch_fn = RecordingBatchFn(delay=0.01)
+    await batcher.submit("c")
+    metrics = batcher.metrics.snapshot()
+    await batcher.aclose()
+    assert metrics["batches"] == 2
+    assert metrics["items"] == 3
+    assert metrics["avg_batch_size"] == 1.5
+    assert metrics["items_per_second"] > 0
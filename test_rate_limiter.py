@@ -0,0 +1,102 @@
+import time
+import asyncio
+import threading
+import pytest
+from rate_limiter import ProviderLimiter, RateLimiter, estimate_tokens
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hi") == 1
+    assert estimate_tokens("x" * 400) == 100
+
+
+@pytest.mark.asyncio
+async def test_tpm_bucket_delays_once_quota_is_spent():
+    limiter = ProviderLimiter("test", tpm=600)  # refills at 10 tokens per second
+    await limiter.acquire(tokens=600)
+    limiter.release(600)
+    start = time.monotonic()
+    await limiter.acquire(tokens=5)
+    limiter.release(5)
+    assert 0.3 < time.monotonic() - start < 1.5
+
+
+@pytest.mark.asyncio
+async def test_actual_usage_corrects_the_estimate():
+    limiter = ProviderLimiter("test", tpm=600)
+    await limiter.acquire(tokens=100)
+    limiter.release(100, actual_tokens=600)  # the call was much larger than estimated
+    start = time.monotonic()
+    await limiter.acquire(tokens=5)
+    limiter.release(5)
+    assert time.monotonic() - start > 0.3
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_is_admitted_first():
+    limiter = RateLimiter({"test": {"max_concurrency": 1}})
+    order = []
+
+    async def call(name, priority):
+        async with limiter.limit("test", priority=priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async with limiter.limit("test"):
+        low = asyncio.create_task(call("low", 10))
+        await asyncio.sleep(0.02)
+        high = asyncio.create_task(call("high", 0))
+        await asyncio.sleep(0.02)
+    await asyncio.gather(low, high)
+    assert order == ["high", "low"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    limiter = RateLimiter({"test": {"max_concurrency": 1}})
+    async with limiter.limit("test"):
+        waiter = asyncio.create_task(limiter.get("test").acquire())
+        await asyncio.sleep(0.02)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+    async with limiter.limit("test"):
+        pass  # would hang if the cancelled ticket were still at the head of the queue
+
+
+def test_sync_and_threaded_callers_share_the_concurrency_cap():
+    limiter = RateLimiter({"test": {"max_concurrency": 2}})
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with limiter.limit_sync("test"):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) == 2
+
+
+def test_unknown_provider_is_not_limited():
+    limiter = RateLimiter()
+    with limiter.limit_sync("nobody", tokens=10**9) as call:
+        assert call.estimated_tokens == 10**9
+
+
+def test_from_env_overrides_defaults(monkeypatch):
+    monkeypatch.setenv("GEMINI_RPM", "15")
+    monkeypatch.setenv("GEMINI_TPM", "")
+    limiter = RateLimiter.from_env()
+    assert limiter.get("gemini").rpm == 15
+    assert limiter.get("gemini").tpm is None
@@ -0,0 +1,79 @@
+import time
+import pytest
+from aiohttp import web
+from gemini_api import GeminiAPIWrapper
+from response_cache import ResponseCache, make_cache_key
+
+
+def test_key_is_content_addressed():
+    a = {"contents": [{"parts": [{"text": "hi"}]}], "generationConfig": {"temperature": 0, "topK": 1}}
+    b = {"generationConfig": {"topK": 1, "temperature": 0}, "contents": [{"parts": [{"text": "hi"}]}]}
+    assert make_cache_key("m", a) == make_cache_key("m", b)
+    assert make_cache_key("m", a) != make_cache_key("other", a)
+    assert make_cache_key("m", a) != make_cache_key("m", dict(a, tools=[{"functionDeclarations": []}]))
+
+
+def test_lru_eviction_and_counters():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_expiry():
+    cache = ResponseCache(ttl=0.05)
+    cache.set("a", {"x": 1})
+    assert cache.get("a") == {"x": 1}
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(disk_path=path)
+    cache.set("a", {"candidates": []})
+    cache.close()
+
+    reopened = ResponseCache(disk_path=path)
+    assert reopened.get("a") == {"candidates": []}
+    assert reopened.stats()["disk_hits"] == 1
+    reopened.close()
+
+
+def test_disk_tier_is_size_bounded(tmp_path):
+    cache = ResponseCache(max_entries=1, disk_path=str(tmp_path / "cache.sqlite"), max_disk_entries=10)
+    for i in range(100):
+        cache.set(str(i), i)
+    cache.close()
+    reopened = ResponseCache(disk_path=str(tmp_path / "cache.sqlite"))
+    assert reopened.get("99") == 99
+    assert reopened.get("0") is None
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_wrapper_serves_deterministic_requests_from_cache(stub_server):
+    calls = []
+
+    async def handler(request):
+        calls.append(await request.json())
+        return web.json_response({"candidates": [{"content": {"parts": [{"text": "ok"}]}}]})
+
+    base_url = await stub_server({"/v1beta/models/{model_action}": handler}) + "/v1beta"
+    cache = ResponseCache()
+    async with GeminiAPIWrapper(api_key="test", base_url=base_url, cache=cache) as gemini:
+        assert await gemini.call_gemini_api("same") == "ok"
+        assert await gemini.call_gemini_api("same") == "ok"
+        assert await gemini.call_gemini_api("same", temperature=0.7) == "ok"
+        assert await gemini.call_gemini_api("same", temperature=0.7) == "ok"
+        # Without an explicit temperature the server samples, so the response is not cached.
+        no_temperature = {"contents": [{"parts": [{"text": "same"}]}], "generationConfig": {"maxOutputTokens": 10}}
+        await gemini._send_request(no_temperature)
+        await gemini._send_request(no_temperature)
+    assert len(calls) == 5  # one cached temperature-0 call; sampled calls bypass the cache
+    assert cache.stats()["hits"] == 1
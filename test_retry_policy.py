@@ -0,0 +1,76 @@
+import random
+import pytest
+from aiohttp import web
+from gemini_api import GeminiAPIWrapper
+from retry_policy import RetryBudget, RetryPolicy, parse_retry_after
+
+
+def flaky_handler(failures, calls):
+    """Answers with each status in `failures` in turn, then succeeds."""
+    async def handler(request):
+        calls.append(request)
+        if len(calls) <= len(failures):
+            status, headers = failures[len(calls) - 1]
+            return web.json_response({"error": "injected"}, status=status, headers=headers)
+        return web.json_response({"candidates": [{"content": {"parts": [{"text": "ok"}]}}]})
+    return handler
+
+
+def test_backoff_uses_full_jitter_within_cap():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, budget=None, rng=random.Random(0))
+    for attempt in range(6):
+        cap = min(5.0, 2 ** attempt)
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        assert all(0.0 <= d <= cap for d in delays)
+        assert max(delays) > cap / 2  # spread over the whole range, not pinned at the cap
+
+
+def test_only_transient_statuses_are_retried():
+    policy = RetryPolicy(max_attempts=5, budget=None)
+    assert policy.next_delay(0, status=429) is not None
+    assert policy.next_delay(0, status=503) is not None
+    assert policy.next_delay(0, status=None) is not None  # connection error / timeout
+    assert policy.next_delay(0, status=400) is None
+    assert policy.next_delay(0, status=404) is None
+    assert policy.next_delay(0, status=503, idempotent=False) is None
+    assert policy.next_delay(4, status=503) is None  # out of attempts
+
+
+def test_retry_after_is_honoured_and_bounded():
+    policy = RetryPolicy(max_attempts=3, max_retry_after=10.0, budget=None)
+    assert policy.next_delay(0, status=429, retry_after="3") == 3.0
+    assert policy.next_delay(0, status=429, retry_after="120") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+
+
+def test_retry_budget_limits_retries():
+    budget = RetryBudget(ratio=0.0, min_per_second=0.0, max_tokens=2.0)
+    policy = RetryPolicy(max_attempts=10, budget=budget)
+    assert policy.next_delay(0, status=503) is not None
+    assert policy.next_delay(1, status=503) is not None
+    assert policy.next_delay(2, status=503) is None
+
+
+@pytest.mark.asyncio
+async def test_wrapper_retries_429_and_503_then_succeeds(stub_server):
+    calls = []
+    handler = flaky_handler([(429, {"Retry-After": "0"}), (503, {})], calls)
+    base_url = await stub_server({"/v1beta/models/{model_action}": handler}) + "/v1beta"
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01, budget=RetryBudget())
+    async with GeminiAPIWrapper(api_key="test", base_url=base_url, retry_policy=policy) as gemini:
+        result = await gemini.call_gemini_api("hello")
+    assert result == "ok"
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_wrapper_does_not_retry_client_errors(stub_server):
+    calls = []
+    handler = flaky_handler([(400, {})] * 3, calls)
+    base_url = await stub_server({"/v1beta/models/{model_action}": handler}) + "/v1beta"
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01, budget=RetryBudget())
+    async with GeminiAPIWrapper(api_key="test", base_url=base_url, retry_policy=policy) as gemini:
+        result = await gemini.call_gemini_api("hello")
+    assert result is None
+    assert len(calls) == 1
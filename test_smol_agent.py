@@ -0,0 +1,133 @@
+import copy
+import threading
+import time
+import asyncio
+import pytest
+import smol_agent
+from function_registry import FunctionRegistry
+from smol_agent import SmolAgent
+
+
+class FakeGemini:
+    """Plays back scripted model turns and records what each `generate_content` call was sent."""
+
+    def __init__(self, turns, delay=0.0):
+        self.turns = list(turns)
+        self.delay = delay
+        self.calls = []
+
+    async def generate_content(self, contents, tools=None, temperature=None, tool_config=None):
+        self.calls.append({"contents": copy.deepcopy(contents), "tools": tools, "tool_config": tool_config})
+        await asyncio.sleep(self.delay)
+        return self.turns.pop(0) if len(self.turns) > 1 else self.turns[0]
+
+    async def aclose(self):
+        pass
+
+
+def call_turn(*calls):
+    return {"role": "model", "parts": [{"functionCall": {"name": name, "args": args}} for name, args in calls]}
+
+
+def text_turn(text):
+    return {"role": "model", "parts": [{"text": text}]}
+
+
+@pytest.fixture
+def tool_registry(monkeypatch):
+    registry = FunctionRegistry(max_workers=4)
+
+    async def slow_async(x: str) -> str:
+        await asyncio.sleep(0.2)
+        return f"async:{x}"
+
+    def slow_sync(x: str) -> str:
+        time.sleep(0.2)
+        return f"sync:{x}"
+
+    def fast(x: str) -> str:
+        return f"fast:{x}"
+
+    registry.register_function("slow_async", slow_async, description="", parameters={"x": "x"})
+    registry.register_function("slow_sync", slow_sync, description="", parameters={"x": "x"})
+    registry.register_function("fast", fast, description="", parameters={"x": "x"})
+    monkeypatch.setattr(smol_agent, "registry", registry)
+    return registry
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_of_one_turn_run_concurrently_and_answer_in_call_order(tool_registry):
+    model_turn = call_turn(("slow_async", {"x": "a"}), ("slow_sync", {"x": "b"}), ("fast", {"x": "c"}))
+    gemini = FakeGemini([model_turn, text_turn("done")])
+    agent = SmolAgent(gemini=gemini)
+
+    start = time.monotonic()
+    assert await agent.process_request("do three things") == "done"
+    assert time.monotonic() - start < 0.35  # Two 0.2s tools, run side by side.
+
+    contents = gemini.calls[1]["contents"]
+    assert len(contents) == 3 and contents[1] == model_turn
+    responses = contents[2]
+    assert responses["role"] == "user"
+    assert [part["functionResponse"]["response"]["content"] for part in responses["parts"]] == [
+        "async:a", "sync:b", "fast:c"
+    ]
+    assert [part["functionResponse"]["name"] for part in responses["parts"]] == ["slow_async", "slow_sync", "fast"]
+
+
+@pytest.mark.asyncio
+async def test_last_step_disables_tools_and_max_steps_is_reported(tool_registry):
+    gemini = FakeGemini([call_turn(("fast", {"x": "again"}))])
+    agent = SmolAgent(gemini=gemini, max_steps=3)
+    answer = await agent.process_request("loop forever")
+    assert answer == "I apologize, but I was unable to complete the request within the allowed number of steps."
+    assert [call["tool_config"] for call in gemini.calls] == [None, None, {"functionCallingConfig": {"mode": "NONE"}}]
+
+
+@pytest.mark.asyncio
+async def test_step_timeout_is_reported(tool_registry):
+    agent = SmolAgent(gemini=FakeGemini([text_turn("too late")], delay=1.0), step_timeout=0.05)
+    assert await agent.process_request("hurry") == "I apologize, but the request timed out."
+
+
+# A budget that summaries alone can meet keeps every exchange; a tiny one leaves only the request
+# and the latest exchange.
+@pytest.mark.asyncio
+@pytest.mark.parametrize("budget, kept_turns", [(5000, 9), (100, 3)])
+async def test_history_is_shrunk_but_keeps_the_request_and_latest_exchange(tool_registry, monkeypatch, budget, kept_turns):
+    def page(x: str) -> str:
+        return f"Page {x}. " + " ".join(f"Sentence {i} of page {x} is about topic {i % 7}." for i in range(300))
+
+    tool_registry.register_function("page", page, description="", parameters={"x": "x"})
+    summary_threads = []
+
+    def summarize_text(text, max_tokens):
+        summary_threads.append(threading.current_thread())
+        return text[:max_tokens]
+
+    monkeypatch.setattr(smol_agent, "summarize_text", summarize_text)
+    turns = [call_turn(("page", {"x": str(step)})) for step in range(4)] + [text_turn("done")]
+    gemini = FakeGemini(turns)
+    agent = SmolAgent(gemini=gemini, max_steps=5, history_token_budget=budget, tool_result_token_budget=None)
+    assert await agent.process_request("read four pages") == "done"
+
+    contents = gemini.calls[-1]["contents"]
+    assert contents[0] == gemini.calls[0]["contents"][0]
+    assert contents[-2] == turns[3]
+    assert contents[-1]["parts"][0]["functionResponse"]["response"]["content"] == page("3")
+    # Older tool results are summarized, off the event loop, before exchanges are dropped.
+    assert len(contents) == kept_turns
+    assert all(len(turn["parts"][0]["functionResponse"]["response"]["content"]) <= smol_agent.SUMMARY_TOKENS
+               for turn in contents[2:-2:2])
+    assert summary_threads and threading.main_thread() not in summary_threads
+
+
+@pytest.mark.asyncio
+async def test_every_tool_is_offered_unless_selection_is_enabled_and_then_only_first(tool_registry):
+    gemini = FakeGemini([text_turn("done")])
+    assert await SmolAgent(gemini=gemini).process_request("fast please") == "done"
+    assert gemini.calls[0]["tools"].names == ["slow_async", "slow_sync", "fast"]
+
+    gemini = FakeGemini([call_turn(("fast", {"x": "a"})), text_turn("done")])
+    assert await SmolAgent(gemini=gemini, max_tools=1).process_request("fast please") == "done"
+    assert [call["tools"].names for call in gemini.calls] == [["fast"], ["slow_async", "slow_sync", "fast"]]
@@ -0,0 +1,56 @@
+import json
+import asyncio
+import pytest
+from aiohttp import web
+from gemini_api import GeminiAPIWrapper
+from sse import SSEParser
+
+
+def test_parser_handles_arbitrary_chunk_boundaries():
+    body = b'data: {"a": 1}\r\n\r\n: comment\nevent: update\ndata: line1\ndata: line2\nid: 7\n\ndata: tail'
+    for size in (1, 3, 7, len(body)):
+        parser = SSEParser()
+        events = []
+        for i in range(0, len(body), size):
+            events.extend(parser.feed(body[i:i + size]))
+        events.extend(parser.close())
+        assert events == [
+            {"event": "message", "data": '{"a": 1}', "id": None},
+            {"event": "update", "data": "line1\nline2", "id": "7"},
+            {"event": "message", "data": "tail", "id": "7"},  # the last event id persists
+        ]
+
+
+def test_parser_handles_multibyte_characters_split_across_chunks():
+    body = 'data: héllo\n\n'.encode("utf-8")
+    parser = SSEParser()
+    events = parser.feed(body[:8]) + parser.feed(body[8:])
+    assert events[0]["data"] == "héllo"
+
+
+@pytest.mark.asyncio
+async def test_stream_gemini_api_yields_text_and_function_calls_incrementally(stub_server):
+    release = asyncio.Event()
+    chunks = [
+        {"candidates": [{"content": {"parts": [{"text": "Hel"}]}}]},
+        {"candidates": [{"content": {"parts": [{"text": "lo"}, {"functionCall": {"name": "calculate", "args": {}}}]}}]},
+    ]
+
+    async def handler(request):
+        assert request.query["alt"] == "sse"
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(f"data: {json.dumps(chunks[0])}\r\n\r\n".encode())
+        await release.wait()  # hold the rest back until the client has seen the first delta
+        await response.write(f"data: {json.dumps(chunks[1])}\r\n\r\n".encode())
+        await response.write_eof()
+        return response
+
+    base_url = await stub_server({"/v1beta/models/{model_action}": handler}) + "/v1beta"
+
+    received = []
+    async with GeminiAPIWrapper(api_key="test", base_url=base_url) as gemini:
+        async for delta in gemini.stream_gemini_api("hi"):
+            received.append(delta)
+            release.set()
+    assert received == ["Hel", "lo", {"functionCall": {"name": "calculate", "args": {}}}]
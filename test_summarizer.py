@@ -0,0 +1,44 @@
+import pytest
+from summarizer import iter_sentences, summarize
+from rate_limiter import estimate_tokens
+
+TEXT = (
+    "Solar panels convert sunlight into electricity. "
+    "Solar electricity from panels is cheaper every year, and solar panels now power many homes. "
+    "My cousin likes jazz music. "
+    "Home solar panels reduce electricity bills.\n\n"
+    "The weather was nice on Tuesday."
+)
+
+
+def test_sentences_are_the_same_however_the_text_is_chunked():
+    whole = list(iter_sentences(TEXT))
+    assert whole[0] == "Solar panels convert sunlight into electricity."
+    assert len(whole) == 5
+    assert list(iter_sentences(iter(TEXT))) == whole
+    assert list(iter_sentences(TEXT[i:i + 7] for i in range(0, len(TEXT), 7))) == whole
+
+
+def test_long_runs_without_punctuation_are_split():
+    sentences = list(iter_sentences("word " * 1000, max_sentence_chars=100))
+    assert all(len(sentence) <= 100 for sentence in sentences)
+    assert sum(sentence.count("word") for sentence in sentences) == 1000
+
+
+def test_summary_keeps_central_sentences_in_order_within_budget():
+    summary = summarize(TEXT, max_tokens=50)
+    assert estimate_tokens(summary) <= 50
+    assert "jazz" not in summary and "weather" not in summary
+    assert summary.index("Solar electricity") < summary.index("Home solar")
+
+
+def test_short_text_is_returned_whole_and_duplicates_dropped():
+    assert summarize("One sentence.  Another one.") == "One sentence. Another one."
+    boilerplate = "Accept all cookies. " * 500 + "The launch was delayed by rain."
+    assert summarize(boilerplate, max_tokens=20) == "Accept all cookies. The launch was delayed by rain."
+
+
+@pytest.mark.parametrize("max_tokens", [5, 50, 500])
+def test_large_document_respects_budget(max_tokens):
+    document = " ".join(f"Sentence number {i} talks about topic {i % 7} and more." for i in range(50_000))
+    assert 0 < estimate_tokens(summarize(document, max_tokens=max_tokens)) <= max_tokens
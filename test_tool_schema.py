@@ -0,0 +1,53 @@
+from typing import Dict, List, Literal, Optional
+import pytest
+from tool_schema import ToolSchema, ToolArgumentError
+
+
+def lookup(city: str, days: int, units: Literal["metric", "imperial"] = "metric", detailed: bool = False,
+           threshold: Optional[float] = None, tags: List[int] = (), extra: Dict[str, str] = None, note=""):
+    return city
+
+
+def test_schema_types_enums_and_optional_fields():
+    schema = ToolSchema(lookup, {"city": "City name"})
+    properties = schema.parameters["properties"]
+    assert schema.parameters["required"] == ["city", "days"]
+    assert properties["city"] == {"type": "STRING", "description": "City name"}
+    assert properties["days"] == {"type": "INTEGER"}
+    assert properties["units"] == {"type": "STRING", "format": "enum", "enum": ["metric", "imperial"]}
+    assert properties["detailed"] == {"type": "BOOLEAN"}
+    assert properties["threshold"] == {"type": "NUMBER", "nullable": True}
+    assert properties["tags"] == {"type": "ARRAY", "items": {"type": "INTEGER"}}
+    assert properties["extra"] == {"type": "OBJECT", "nullable": True}
+    assert properties["note"] == {"type": "STRING"}
+
+
+def test_validate_coerces_model_arguments():
+    schema = ToolSchema(lookup)
+    args = schema.validate({"city": "Oslo", "days": "3", "detailed": "true", "threshold": 2,
+                            "tags": "[1, 2.0]", "extra": '{"a": "b"}', "unknown": 1})
+    assert args == {"city": "Oslo", "days": 3, "detailed": True, "threshold": 2.0, "tags": [1, 2], "extra": {"a": "b"}}
+    assert schema.validate({"city": "Oslo", "days": 1.0, "threshold": None})["days"] == 1
+
+
+@pytest.mark.parametrize("args, message", [
+    ({"city": "Oslo"}, "Missing required parameters: days"),
+    ({"city": "Oslo", "days": "soon"}, "'days' must be an integer"),
+    ({"city": "Oslo", "days": 1, "units": "kelvin"}, "'units' must be one of 'metric', 'imperial'"),
+    ({"city": "Oslo", "days": 1, "tags": [1, "x"]}, r"'tags\[1\]' must be an integer"),
+    ({"city": "Oslo", "days": True}, "'days' must be an integer"),
+])
+def test_validate_rejects_what_cannot_be_coerced(args, message):
+    with pytest.raises(ToolArgumentError, match=message):
+        ToolSchema(lookup).validate(args)
+
+
+def test_descriptions_must_name_real_parameters_unless_kwargs():
+    with pytest.raises(ValueError):
+        ToolSchema(lookup, {"missing": "Not a parameter"})
+
+    def flexible(**kwargs):
+        return kwargs
+    schema = ToolSchema(flexible, {"query": "Search terms"})
+    assert schema.parameters["required"] == ["query"]
+    assert schema.validate({"query": "q", "other": 1}) == {"query": "q", "other": 1}
@@ -0,0 +1,264 @@
+import json
+import types
+import typing
+import inspect
+import collections.abc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# A coercer takes a raw argument value and its name, and returns the value to pass to the tool
+# or raises ToolArgumentError.
+Coercer = Callable[[Any, str], Any]
+
+_TRUE = {"true", "yes", "1"}
+_FALSE = {"false", "no", "0"}
+
+
+class ToolArgumentError(ValueError):
+    """Raised when the arguments of a tool call cannot be made to fit the tool's signature."""
+
+
+def _fail(name, expected, value):
+    raise ToolArgumentError(f"'{name}' must be {expected}, got {value!r}")
+
+
+def _coerce_any(value, name):
+    return value
+
+
+def _coerce_string(value, name):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value).lower() if isinstance(value, bool) else str(value)
+    _fail(name, "a string", value)
+
+
+def _coerce_integer(value, name):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    _fail(name, "an integer", value)
+
+
+def _coerce_number(value, name):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    _fail(name, "a number", value)
+
+
+def _coerce_boolean(value, name):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (str, int)):
+        text = str(value).strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+    _fail(name, "a boolean", value)
+
+
+def _from_json(value, kind):
+    """Models sometimes send arrays and objects as JSON text; decode those."""
+    if isinstance(value, str):
+        try:
+            decoded = json.loads(value)
+        except ValueError:
+            return value
+        if isinstance(decoded, kind):
+            return decoded
+    return value
+
+
+_SCALARS = {
+    str: ({"type": "STRING"}, _coerce_string),
+    int: ({"type": "INTEGER"}, _coerce_integer),
+    float: ({"type": "NUMBER"}, _coerce_number),
+    bool: ({"type": "BOOLEAN"}, _coerce_boolean),
+}
+
+_ARRAY_TYPES = (list, tuple, set, frozenset, collections.abc.Sequence, collections.abc.Iterable)
+_OBJECT_TYPES = (dict, collections.abc.Mapping)
+
+
+def compile_type(annotation) -> Tuple[Dict[str, Any], Coercer]:
+    """
+    Maps a type annotation onto a Gemini schema and a coercer for values of that type.
+
+    Supports str/int/float/bool, Optional and other Unions, Literal (as a string enum), lists,
+    tuples and sets (ARRAY, with typed items) and dicts (OBJECT). Anything else, including a
+    missing annotation, is advertised as STRING and passed through unchanged.
+
+    Returns:
+        (schema, coercer)
+    """
+    if annotation in _SCALARS:
+        schema, coercer = _SCALARS[annotation]
+        return dict(schema), coercer
+
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin is typing.Union or origin is types.UnionType:
+        options = [arg for arg in args if arg is not type(None)]
+        compiled = [compile_type(option) for option in options]
+        schema = compiled[0][0]
+        coercers = [coercer for _, coercer in compiled]
+        nullable = len(options) < len(args)
+        if nullable:
+            schema["nullable"] = True
+
+        def coerce_union(value, name):
+            if value is None and nullable:
+                return None
+            error = None
+            for coercer in coercers:
+                try:
+                    return coercer(value, name)
+                except ToolArgumentError as e:
+                    error = error or e
+            raise error
+        return schema, (coerce_union if len(coercers) > 1 or nullable else coercers[0])
+
+    if origin is typing.Literal:
+        # Gemini enums are strings; map the advertised strings back onto the literal values.
+        by_text = {str(value): value for value in args}
+
+        def coerce_literal(value, name):
+            if value in args and type(value) in {type(arg) for arg in args}:
+                return value
+            if str(value) in by_text:
+                return by_text[str(value)]
+            _fail(name, f"one of {', '.join(repr(text) for text in by_text)}", value)
+        return {"type": "STRING", "format": "enum", "enum": list(by_text)}, coerce_literal
+
+    container = origin or annotation
+    if isinstance(container, type) and issubclass(container, _OBJECT_TYPES):
+        def coerce_object(value, name):
+            value = _from_json(value, dict)
+            if not isinstance(value, dict):
+                _fail(name, "an object", value)
+            return value
+        return {"type": "OBJECT"}, coerce_object
+
+    if isinstance(container, type) and issubclass(container, _ARRAY_TYPES) and not issubclass(container, (str, bytes)):
+        item_schema, coerce_item = compile_type(args[0] if args else str)
+        build = container if container in (list, tuple, set, frozenset) else list
+
+        def coerce_array(value, name):
+            value = _from_json(value, list)
+            if not isinstance(value, (list, tuple)):
+                _fail(name, "an array", value)
+            return build(coerce_item(item, f"{name}[{i}]") for i, item in enumerate(value))
+        return {"type": "ARRAY", "items": item_schema}, coerce_array
+
+    return {"type": "STRING"}, _coerce_any
+
+
+class ToolSchema:
+    """
+    The parameter schema of a tool, generated from its signature and type hints, with a
+    precompiled validator for its arguments.
+
+    Parameters without a default are required. A default of None makes a parameter nullable.
+    Unannotated parameters take their type from a str/int/float/bool default, and are otherwise
+    advertised as STRING and passed through unchanged.
+    """
+
+    def __init__(self, func: Callable, descriptions: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            func: The tool function.
+            descriptions: Parameter name to description. Names the signature does not have are an
+                          error, unless the function takes **kwargs (they are then required strings).
+
+        Raises:
+            ValueError: If `descriptions` names parameters `func` does not accept.
+        """
+        descriptions = dict(descriptions or {})
+        signature = inspect.signature(func)
+        try:
+            hints = typing.get_type_hints(func)
+        except Exception:
+            hints = {}
+        self.properties: Dict[str, Dict[str, Any]] = {}
+        self.required: List[str] = []
+        self._coercers: Dict[str, Coercer] = {}
+        self.accepts_extra = False
+
+        for name, parameter in signature.parameters.items():
+            if parameter.kind is parameter.VAR_KEYWORD:
+                self.accepts_extra = True
+                continue
+            if parameter.kind is parameter.VAR_POSITIONAL or name.startswith("_"):
+                continue
+            default = parameter.default
+            annotation = hints.get(name, parameter.annotation)
+            if annotation is parameter.empty:
+                annotation = type(default) if type(default) in _SCALARS else parameter.empty
+            schema, coercer = compile_type(annotation)
+            if default is None and not schema.get("nullable"):
+                schema["nullable"] = True
+                coercer = self._nullable(coercer)
+            if name in descriptions:
+                schema["description"] = descriptions.pop(name)
+            self.properties[name] = schema
+            self._coercers[name] = coercer
+            if default is parameter.empty:
+                self.required.append(name)
+
+        if descriptions:
+            if not self.accepts_extra:
+                raise ValueError(f"{getattr(func, '__name__', func)!s} has no parameter(s) {', '.join(descriptions)}")
+            for name, description in descriptions.items():
+                self.properties[name] = {"type": "STRING", "description": description}
+                self._coercers[name] = _coerce_any
+                self.required.append(name)
+
+    @staticmethod
+    def _nullable(coercer: Coercer) -> Coercer:
+        return lambda value, name: None if value is None else coercer(value, name)
+
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        """The Gemini `parameters` schema (an OBJECT with typed properties)."""
+        return {"type": "OBJECT", "properties": self.properties, "required": list(self.required)}
+
+    def validate(self, args: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Coerces `args` to the tool's parameter types, e.g. "3" to 3 for an int parameter.
+        Arguments the tool does not accept are dropped.
+
+        Raises:
+            ToolArgumentError: If required arguments are missing or a value cannot be coerced.
+        """
+        args = args or {}
+        missing = [name for name in self.required if name not in args]
+        if missing:
+            raise ToolArgumentError(f"Missing required parameters: {', '.join(missing)}")
+        coerced = {}
+        errors = []
+        for name, value in args.items():
+            coercer = self._coercers.get(name)
+            if coercer is None:
+                if self.accepts_extra:
+                    coerced[name] = value
+                continue
+            try:
+                coerced[name] = coercer(value, name)
+            except ToolArgumentError as e:
+                errors.append(str(e))
+        if errors:
+            raise ToolArgumentError("; ".join(errors))
+        return coerced
@@ -1,47 +1,80 @@
 import os
-import requests
-from bs4 import BeautifulSoup
+import time
+import asyncio
+import aiohttp
 from dotenv import load_dotenv
 import json
 from datetime import datetime
+from typing import Literal, Optional
+from deepseek_api import DeepSeekClient
+from log_sink import get_sink
+from http_fetch import Fetcher, HttpCache
+from html_extract import HtmlTextExtractor
+from summarizer import summarize
+from expression_eval import evaluate as evaluate_expression, ExpressionError
 
 load_dotenv()
 
-def process_stream(response):
-    """Process streaming response and return accumulated content."""
-    content_parts = []
-    try:
-        for line in response.iter_lines():
-            if line:
-                try:
-                    # Remove 'data: ' prefix if present
-                    line_text = line.decode('utf-8')
-                    if line_text.startswith('data: '):
-                        line_text = line_text[6:]
+# One pooled client for every deepseek_chat call in the process, created on first use.
+_deepseek_client = None
 
-                    # Skip [DONE] message
-                    if line_text == '[DONE]':
-                        continue
+def _get_deepseek_client(api_key):
+    global _deepseek_client
+    if _deepseek_client is None or _deepseek_client.api_key != api_key:
+        _deepseek_client = DeepSeekClient(api_key=api_key)
+    return _deepseek_client
 
-                    json_line = json.loads(line_text)
-                    if 'choices' in json_line and json_line['choices']:
-                        content = json_line['choices'][0].get('delta', {}).get('content', '')
-                        if content:
-                            print(content, end='', flush=True)  # Print each chunk as it comes
-                            content_parts.append(content)
-                except json.JSONDecodeError:
-                    continue
-    except Exception as e:
-        print(f"\nError during streaming: {str(e)}")
-    return ''.join(content_parts)
+def _log_deepseek_call(log_entry):
+    """Queues one interaction record for deepseek_calls.jsonl (rotated at 100 MB, gzip-compressed)."""
+    get_sink('deepseek_calls.jsonl', max_bytes=100 * 1024 * 1024, compress=True).write(log_entry)
+
+REASONING_SYSTEM_PROMPT = "Think step by step and show your reasoning. Be thorough but concise."
+# JSON mode requires the word "json" in the prompt and a description of the expected object.
+JSON_SYSTEM_PROMPT = (
+    "Think step by step and show your reasoning. Be thorough but concise. Reply with a json object of the form "
+    '{"reasoning": "<your step-by-step reasoning>", "answer": "<a clear and concise final answer>"}.'
+)
+
+def _deepseek_two_pass_default():
+    return os.environ.get("DEEPSEEK_TWO_PASS", "").lower() in ("1", "true", "yes")
+
+def _add_usage(total, usage):
+    """Adds the token counts of one response's `usage` to `total`."""
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        if usage and usage.get(key) is not None:
+            total[key] = total.get(key, 0) + usage[key]
+
+def _split_reasoning_json(content):
+    """
+    Returns `(reasoning, answer)` from a JSON-mode reply, or `(content, None)` if it is not the
+    expected object (e.g. cut off at max_tokens), so the caller can fall back to a second request.
+    """
+    try:
+        reply = json.loads(content)
+    except ValueError:
+        return content, None
+    if not isinstance(reply, dict) or reply.get("answer") in (None, ""):
+        return content, None
+    answer = reply["answer"]
+    return reply.get("reasoning"), answer if isinstance(answer, str) else json.dumps(answer)
 
-def deepseek_chat(prompt: str, model: str = "deepseek-chat") -> str:
+async def deepseek_chat(prompt: str, model: Literal["deepseek-chat", "deepseek-reasoner"] = "deepseek-chat",
+                        *, _two_pass: Optional[bool] = None) -> str:
     """
     Makes a call to the DeepSeek API using OpenAI-compatible format and logs the interaction.
 
+    By default the reasoning and the final answer come from a single streamed response:
+    'deepseek-reasoner' returns them separately (`reasoning_content` and `content`), and other
+    models are asked for a `{"reasoning", "answer"}` JSON object. If that object cannot be parsed,
+    or with `_two_pass`, the previous behavior is used: the train of thought is streamed first and
+    a second request re-sends it to ask for the final answer.
+
     Args:
         prompt: The text prompt to send to DeepSeek
         model: The model to use ('deepseek-chat' for V3 or 'deepseek-reasoner' for R1)
+        _two_pass: Force the two-request flow, for either model. An operator fallback switch, so it
+                   is not offered to the model as a tool argument. Defaults to the
+                   DEEPSEEK_TWO_PASS environment variable.
 
     Returns:
         The model's response as a string
@@ -49,72 +82,65 @@ def deepseek_chat(prompt: str, model: str = "deepseek-chat") -> str:
     api_key = os.environ.get("DeepSeek_API_Key")
     if not api_key:
         return "Error: DEEPSEEK_API_KEY not found in environment variables"
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
+    client = _get_deepseek_client(api_key)
+    two_pass = _two_pass if _two_pass is not None else _deepseek_two_pass_default()
 
     train_of_thought = None
     final_answer = None
+    usage = {}
+    started = time.monotonic()
     try:
-        # First, get the streaming train of thought
-        print(f"\nGetting train of thought for: {prompt[:50]}...")
-        stream_data = {
-            "model": model,
-            "messages": [
-                {"role": "system", "content": "Think step by step and show your reasoning. Be thorough but concise."},
-                {"role": "user", "content": prompt}
-            ],
-            "stream": True,
-            "temperature": 0.7,  # Add some randomness for creative thinking
-            "max_tokens": 1000  # Ensure we get a full response
-        }
-
-        response = requests.post(
-            "https://api.deepseek.com/v1/chat/completions",
-            headers=headers,
-            json=stream_data,
-            timeout=90,  # Increased timeout
-            stream=True
-        )
-
-        train_of_thought = process_stream(response)
-        print("\n")  # Add newline after train of thought
-
-        # Now get the final answer
-        print("Getting final answer...")
-        final_data = {
-            "model": model,
-            "messages": [
-                {"role": "system", "content": "Based on the previous reasoning, provide a clear and concise final answer."},
-                {"role": "user", "content": prompt},
-                {"role": "assistant", "content": train_of_thought},
-                {"role": "user", "content": "Now provide a clear and concise final answer based on your reasoning."}
-            ],
-            "stream": False,
-            "temperature": 0.3,  # Lower temperature for more focused final answer
-            "max_tokens": 500  # Shorter limit for final answer
-        }
-
-        final_response = requests.post(
-            "https://api.deepseek.com/v1/chat/completions",
-            headers=headers,
-            json=final_data,
-            timeout=90  # Increased timeout
-        )
-
-        if final_response.status_code != 200:
-            error_detail = final_response.json() if final_response.text else "No error details available"
-            error_msg = f"Error calling DeepSeek API (Status {final_response.status_code}): {error_detail}"
-            final_answer = None
+        if two_pass or model == "deepseek-reasoner":
+            streamed = await client.stream_chat(
+                [
+                    {"role": "system", "content": REASONING_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                model=model,
+                temperature=0.7,  # Add some randomness for creative thinking
+                max_tokens=1000  # Ensure we get a full response
+            )
+            if streamed["reasoning_content"] and not two_pass:
+                # The reasoner returned its chain of thought and its answer in the same response
+                train_of_thought = streamed["reasoning_content"]
+                # If the reasoning used up max_tokens, the answer is missing or cut off; ask for it.
+                if streamed["content"].strip() and streamed["finish_reason"] != "length":
+                    final_answer = streamed["content"]
+            else:
+                train_of_thought = streamed["content"]
         else:
-            final_result = final_response.json()
-            final_answer = final_result["choices"][0]["message"]["content"]
+            streamed = await client.stream_chat(
+                [
+                    {"role": "system", "content": JSON_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                model=model,
+                temperature=0.7,
+                max_tokens=1500,  # Room for the reasoning and the answer of both former requests
+                response_format={"type": "json_object"}
+            )
+            train_of_thought, final_answer = _split_reasoning_json(streamed["content"])
+        _add_usage(usage, streamed["usage"])
+
+        if final_answer is None:
+            # Now get the final answer
+            final = await client.chat(
+                [
+                    {"role": "system", "content": "Based on the previous reasoning, provide a clear and concise final answer."},
+                    {"role": "user", "content": prompt},
+                    {"role": "assistant", "content": train_of_thought},
+                    {"role": "user", "content": "Now provide a clear and concise final answer based on your reasoning."}
+                ],
+                model=model,
+                temperature=0.3,  # Lower temperature for more focused final answer
+                max_tokens=500  # Shorter limit for final answer
+            )
+            final_answer = final["content"]
+            _add_usage(usage, final["usage"])
 
         # Only log as successful if we have both train of thought and final answer
         success = bool(train_of_thought and final_answer)
-        log_entry = {
+        _log_deepseek_call({
             "timestamp": datetime.now().isoformat(),
             "input": {
                 "prompt": prompt,
@@ -122,144 +148,117 @@ def deepseek_chat(prompt: str, model: str = "deepseek-chat") -> str:
             },
             "train_of_thought": train_of_thought if train_of_thought else None,
             "final_answer": final_answer if final_answer else None,
-            "success": success
-        }
-
-        with open('deepseek_calls.jsonl', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-
+            "success": success,
+            "latency_ms": round(1000 * (time.monotonic() - started), 1),
+            "usage": usage or None
+        })
         return final_answer
 
-    except requests.exceptions.RequestException as e:
-        error_msg = f"Error calling DeepSeek API: {str(e)}\nTrain of thought captured so far: {train_of_thought if train_of_thought else 'None'}"
-        # Log error to JSONL file
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "input": {
-                "prompt": prompt,
-                "model": model
-            },
-            "error": error_msg,
-            "train_of_thought": train_of_thought,  # Include partial train of thought if available
-            "final_answer": None,
-            "success": False
-        }
-        with open('deepseek_calls.jsonl', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-        return error_msg
-    except (KeyError, IndexError) as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        error_msg = f"Error calling DeepSeek API: {str(e) or type(e).__name__}\nTrain of thought captured so far: {train_of_thought if train_of_thought else 'None'}"
+    except (KeyError, IndexError, ValueError) as e:
         error_msg = f"Error parsing DeepSeek API response: {str(e)}"
-        # Log error to JSONL file
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "input": {
-                "prompt": prompt,
-                "model": model
-            },
-            "error": error_msg,
-            "train_of_thought": train_of_thought,  # Include partial train of thought if available
-            "final_answer": None,
-            "success": False
-        }
-        with open('deepseek_calls.jsonl', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-        return error_msg
-
-import subprocess
+    # Log error to JSONL file
+    _log_deepseek_call({
+        "timestamp": datetime.now().isoformat(),
+        "input": {
+            "prompt": prompt,
+            "model": model
+        },
+        "error": error_msg,
+        "train_of_thought": train_of_thought,  # Include partial train of thought if available
+        "final_answer": None,
+        "success": False,
+        "latency_ms": round(1000 * (time.monotonic() - started), 1),
+        "usage": usage or None
+    })
+    return error_msg
 
 def huggingface_tool(prompt: str) -> str:
     """
     Runs inference using a Hugging Face model.
+
+    Runs in-process on the pooled session of `huggingface_inference`, so it is safe to call from
+    several threads at once and pays no interpreter start-up or connection set-up per call.
     """
     try:
-        command = ["python", "huggingface_inference.py", prompt]
-        process = subprocess.run(command, capture_output=True, text=True, timeout=60)
-        process.check_returncode()
-        return process.stdout
-    except subprocess.CalledProcessError as e:
-        return f"Error running Hugging Face inference: {e.stderr}"
-    except subprocess.TimeoutExpired:
-        return "Error: Hugging Face inference timed out."
+        # Imported lazily: the module refuses to load without HUGGINGFACE_TOKEN, which should only
+        # fail this tool, not every tool.
+        from huggingface_inference import generate_text
+        generated_text = generate_text(prompt)
+        if generated_text is None:
+            return "Error running Hugging Face inference: no text was generated."
+        return generated_text if isinstance(generated_text, str) else json.dumps(generated_text)
     except Exception as e:
         return f"Error during Hugging Face inference: {e}"
 
-def web_search(query: str) -> str:
+# One fetcher (connection pool + on-disk HTTP cache) shared by the web tools, created on first use.
+_fetcher = None
+
+def _get_fetcher():
+    global _fetcher
+    if _fetcher is None:
+        cache = HttpCache(os.environ.get("HTTP_CACHE_PATH", ".http_cache.sqlite"))
+        _fetcher = Fetcher(cache=cache)
+    return _fetcher
+
+async def web_search(query: str) -> str:
     """Searches DuckDuckGo and returns a summarized snippet of results."""
     try:
-        response = requests.get("https://api.duckduckgo.com/", params={
+        # Repeated queries are answered from the HTTP cache for 5 minutes unless DuckDuckGo says otherwise.
+        response = await _get_fetcher().fetch("https://api.duckduckgo.com/", params={
             'q': query,
             'format': 'json'
-        })
-        response.raise_for_status()
+        }, default_ttl=300)
+        if response.status >= 400:
+            return f'Error during web search: HTTP {response.status}'
         ddg_data = response.json()
         summary = ddg_data.get("AbstractText")
         if not summary:
             return f"No results found for '{query}'."
         return summary
-    except requests.exceptions.RequestException as e:
-        return f'Error during web search: {e}'
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        return f'Error during web search: {str(e) or type(e).__name__}'
 
 def calculate(expression: str) -> str:
     """
-    Safely calculates the result of a mathematical expression using ast.
-    Supports basic arithmetic operations (+, -, *, /, **) and numbers only.
-    """
-    # Define allowed operators
-    operators = {
-        ast.Add: operator.add,
-        ast.Sub: operator.sub,
-        ast.Mult: operator.mul,
-        ast.Div: operator.truediv,
-        ast.Pow: operator.pow,
-        ast.USub: operator.neg,  # Unary minus
-    }
-
-    def eval_expr(node):
-        """Recursively evaluate an AST node."""
-        if isinstance(node, ast.Num):
-            return node.n
-        elif isinstance(node, ast.BinOp):
-            op_type = type(node.op)
-            if op_type not in operators:
-                raise ValueError(f"Unsupported operator: {op_type.__name__}")
-            left = eval_expr(node.left)
-            right = eval_expr(node.right)
-            return operators[op_type](left, right)
-        elif isinstance(node, ast.UnaryOp):
-            if not isinstance(node.op, ast.USub):
-                raise ValueError(f"Unsupported unary operator: {type(node.op).__name__}")
-            return operators[ast.USub](eval_expr(node.operand))
-        else:
-            raise ValueError(f"Unsupported expression type: {type(node).__name__}")
+    Safely calculates the result of a mathematical expression.
 
+    Supports arithmetic (+, -, *, /, //, %, **), comparisons, the constants pi/e/tau and functions
+    such as sqrt, log and sin. Expressions are compiled once and cached; exponents, result size
+    and evaluation time are bounded (see expression_eval).
+    """
     try:
-        # Parse the expression into an AST
-        tree = ast.parse(expression, mode='eval')
-        if not isinstance(tree.body, (ast.BinOp, ast.Num, ast.UnaryOp)):
-            raise ValueError("Invalid expression: only basic arithmetic operations are supported")
-
-        # Evaluate the expression
-        result = eval_expr(tree.body)
-        return str(result)
-    except Exception as e:
+        return str(evaluate_expression(expression))
+    except ExpressionError as e:
         return f'Error during calculation: {e}'
 
-def web_scraper(url: str) -> str:
-    """Scrapes content from a given URL and returns the text."""
+# Bounds for web_scraper: bytes read from the network and characters of text returned.
+SCRAPER_MAX_BYTES = 5 * 1024 * 1024
+SCRAPER_MAX_CHARS = 20_000
+
+async def web_scraper(url: str) -> str:
+    """
+    Scrapes content from a given URL and returns the text.
+
+    The page is parsed while it downloads, skipping script/style/nav content, and reading stops
+    once SCRAPER_MAX_CHARS characters of text have been extracted or SCRAPER_MAX_BYTES read.
+    """
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        # Extract all text from the webpage
-        text = ' '.join(soup.stripped_strings)
-        return text
-    except requests.exceptions.RequestException as e:
-        return f'Error during web scraping: {e}'
+        extractor = HtmlTextExtractor(max_chars=SCRAPER_MAX_CHARS)
+        response = await _get_fetcher().fetch(url, max_bytes=SCRAPER_MAX_BYTES, default_ttl=300, on_chunk=extractor.feed_chunk)
+        if response.status >= 400:
+            return f'Error during web scraping: HTTP {response.status}'
+        return extractor.close()
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        return f'Error during web scraping: {str(e) or type(e).__name__}'
 
-def summarize_text(text: str) -> str:
-    """Returns a simple summary of the text (simplified version without transformers)."""
+def summarize_text(text: str, max_tokens: int = 256) -> str:
+    """
+    Returns an extractive summary of the text: its most representative sentences (TF-IDF
+    centroid scoring, computed locally) in their original order, within about `max_tokens` tokens.
+    """
     try:
-        # Simple summary - just return first 200 characters for demonstration
-        return text[:200] + "..." if len(text) > 200 else text
+        return summarize(text, max_tokens=max_tokens)
     except Exception as e:
         return f'Error during summarization: {e}'